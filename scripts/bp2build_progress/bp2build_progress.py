@@ -16,18 +16,24 @@
 
 import argparse
 import collections
+import csv
 import dataclasses
 import datetime
 import functools
+import json
 import os.path
 import subprocess
 import sys
+import time
+from typing import TYPE_CHECKING
 from typing import DefaultDict, Dict, FrozenSet, List, Optional, Set, Tuple
 import xml
-from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics, UnconvertedReasonType
-import bp2build_pb2
 import dependency_analysis
 
+if TYPE_CHECKING:
+  # the protos are imported where they are used to keep startup cheap
+  from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics
+
 
 @dataclasses.dataclass(frozen=True, order=True)
 class GraphFilterInfo:
@@ -236,10 +242,12 @@ def generate_report_data(
     graph_filter: GraphFilterInfo,
     props_by_converted_module_type: DefaultDict[str, Set[str]],
     use_queryview: bool,
-    bp2build_metrics: Bp2BuildMetrics,
+    bp2build_metrics: "Bp2BuildMetrics",
     hide_unconverted_modules_reasons: bool = False,
     show_converted: bool = False,
 ) -> ReportData:
+  from bp2build_metrics_proto.bp2build_metrics_pb2 import UnconvertedReasonType
+
   # Map of [number of unconverted deps] to list of entries,
   # with each entry being the string: "<module>: <comma separated list of unconverted modules>"
   blocked_modules = collections.defaultdict(set)
@@ -357,44 +365,199 @@ def generate_report_data(
   )
 
 
-def generate_proto(report_data):
+@dataclasses.dataclass
+class DirTreeNode:
+  """Conversion counts for a blueprint directory, rolled up over its subdirs."""
+
+  converted: int = 0
+  unconverted: int = 0
+  # sum over unconverted modules in the subtree of how many modules each blocks
+  blocking: int = 0
+  children: Dict[str, "DirTreeNode"] = dataclasses.field(default_factory=dict)
+
+  @property
+  def total(self):
+    return self.converted + self.unconverted
+
+  def to_json(self):
+    ret = {
+        "converted": self.converted,
+        "unconverted": self.unconverted,
+        "total": self.total,
+        "blocking": self.blocking,
+    }
+    if self.children:
+      ret["dirs"] = {
+          name: child.to_json() for name, child in sorted(self.children.items())
+      }
+    return ret
+
+  @classmethod
+  def from_json(cls, data):
+    return cls(
+        converted=data["converted"],
+        unconverted=data["unconverted"],
+        blocking=data["blocking"],
+        children={
+            name: cls.from_json(child)
+            for name, child in data.get("dirs", {}).items()
+        },
+    )
+
+
+def _dir_components(dirname: str) -> List[str]:
+  return [c for c in os.path.normpath(dirname).split("/") if c not in ("", ".")]
+
+
+def generate_dir_tree(
+    modules: Dict[ModuleInfo, DepInfo],
+    converted: Dict[str, Set[str]],
+    all_unconverted_modules: Dict[ModuleInfo, Set[ModuleInfo]],
+) -> DirTreeNode:
+  """Aggregates conversion counts over the blueprint directory prefix tree.
+
+  Every module is visited once and its counts are added to each directory on
+  the path from the root to its own directory, so the returned tree holds the
+  rolled up numbers for any subtree.
+  """
+  root = DirTreeNode()
+  for module in modules:
+    if module.is_skipped():
+      continue
+    is_converted = module.is_converted(converted)
+    blocking = (
+        0 if is_converted else len(all_unconverted_modules.get(module, ()))
+    )
+    node = root
+    path = [node]
+    for component in _dir_components(module.dirname):
+      node = node.children.setdefault(component, DirTreeNode())
+      path.append(node)
+    for node in path:
+      if is_converted:
+        node.converted += 1
+      else:
+        node.unconverted += 1
+      node.blocking += blocking
+  return root
+
+
+def get_dir_tree_node(tree: DirTreeNode, dirname: str) -> Optional[DirTreeNode]:
+  """Returns the rolled up counts for dirname, or None if it has no modules."""
+  node = tree
+  for component in _dir_components(dirname):
+    node = node.children.get(component)
+    if node is None:
+      return None
+  return node
+
+
+def write_dir_tree(tree: DirTreeNode, path: str):
+  with open(path, "w") as f:
+    json.dump(tree.to_json(), f, separators=(",", ":"))
+
+
+# Number of unconverted modules serialized per proto chunk by write_proto.
+_PROTO_CHUNK_SIZE = 1000
+
+
+def _limit(items, max_entries: Optional[int]):
+  """Returns the first max_entries of items and the number of omitted items."""
+  items = list(items)
+  if max_entries is None or len(items) <= max_entries:
+    return items, 0
+  return items[:max_entries], len(items) - max_entries
+
+
+def _truncated_line(omitted: int, max_entries: int) -> str:
+  return f"... {omitted} more not shown (--max-entries={max_entries})"
+
+
+def _add_unconverted(message, module, unconverted_deps):
+  message.unconverted.add(
+      name=module.name,
+      directory=module.dirname,
+      type=module.kind,
+      unconverted_deps={d.name for d in unconverted_deps},
+      num_deps=module.num_deps,
+      # when the module is converted or queryview is being used, an empty list will be assigned
+      unconverted_reasons_from_heuristics=list(
+          module.reasons_from_heuristics
+      ),
+  )
+
+
+def generate_proto(report_data, max_entries: Optional[int] = None):
+  import bp2build_pb2
+
   message = bp2build_pb2.Bp2buildConversionProgress(
       root_modules=[m.module.name for m in report_data.input_modules],
       num_deps=len(report_data.total_deps),
   )
-  for (
-      module,
-      unconverted_deps,
-  ) in report_data.blocked_modules_transitive.items():
-    message.unconverted.add(
-        name=module.name,
-        directory=module.dirname,
-        type=module.kind,
-        unconverted_deps={d.name for d in unconverted_deps},
-        num_deps=module.num_deps,
-        # when the module is converted or queryview is being used, an empty list will be assigned
-        unconverted_reasons_from_heuristics=list(
-            module.reasons_from_heuristics
-        ),
-    )
+  entries, _ = _limit(
+      report_data.blocked_modules_transitive.items(), max_entries
+  )
+  for module, unconverted_deps in entries:
+    _add_unconverted(message, module, unconverted_deps)
   return message
 
 
-def generate_report(report_data):
-  report_lines = []
+def write_proto(
+    report_data,
+    f,
+    max_entries: Optional[int] = None,
+    chunk_size: int = _PROTO_CHUNK_SIZE,
+):
+  """Writes the conversion progress proto to f one chunk at a time.
+
+  Serialized protos concatenate as a merge, so the file parses as the same
+  Bp2buildConversionProgress message that generate_proto returns, without the
+  whole message ever being held in memory.
+  """
+  import bp2build_pb2
+
+  header = bp2build_pb2.Bp2buildConversionProgress(
+      root_modules=[m.module.name for m in report_data.input_modules],
+      num_deps=len(report_data.total_deps),
+  )
+  f.write(header.SerializeToString())
+  entries, _ = _limit(
+      report_data.blocked_modules_transitive.items(), max_entries
+  )
+  for i in range(0, len(entries), chunk_size):
+    chunk = bp2build_pb2.Bp2buildConversionProgress()
+    for module, unconverted_deps in entries[i : i + chunk_size]:
+      _add_unconverted(chunk, module, unconverted_deps)
+    f.write(chunk.SerializeToString())
+
+
+def _input_module_str(report_data):
   if len(report_data.input_types) > 0:
-    input_module_str = ", ".join(
-        str(i) for i in sorted(report_data.input_types)
-    )
-  else:
-    input_module_str = ", ".join(
-        str(i) for i in sorted(report_data.input_modules)
-    )
+    return ", ".join(str(i) for i in sorted(report_data.input_types))
+  return ", ".join(str(i) for i in sorted(report_data.input_modules))
 
-  report_lines.append("# bp2build progress report for: %s\n" % input_module_str)
+
+def _sorted_blockers(report_data):
+  return sorted(
+      (
+          (len(unconverted), dep)
+          for dep, unconverted in report_data.all_unconverted_modules.items()
+      ),
+      reverse=True,
+  )
+
+
+def generate_report_lines(report_data, max_entries: Optional[int] = None):
+  """Yields the lines of the text report, without line terminators.
+
+  At most max_entries entries are listed in each section of the report.
+  """
+  input_module_str = _input_module_str(report_data)
+
+  yield "# bp2build progress report for: %s\n" % input_module_str
 
   if report_data.show_converted:
-    report_lines.append(
+    yield (
         "# progress report includes data both for converted and unconverted"
         " modules"
     )
@@ -406,89 +569,283 @@ def generate_report(report_data):
     percent = converted / total * 100
   else:
     percent = 100
-  report_lines.append(f"Percent converted: {percent:.2f} ({converted}/{total})")
-  report_lines.append(f"Total unique unconverted dependencies: {unconverted}")
+  yield f"Percent converted: {percent:.2f} ({converted}/{total})"
+  yield f"Total unique unconverted dependencies: {unconverted}"
 
-  report_lines.append(
-      "Ignored module types: %s\n" % sorted(dependency_analysis.IGNORED_KINDS)
-  )
-  report_lines.append("# Transitive dependency closure:")
+  yield "Ignored module types: %s\n" % sorted(dependency_analysis.IGNORED_KINDS)
+  yield "# Transitive dependency closure:"
 
   current_count = -1
-  for module, unconverted_transitive_deps in sorted(
-      report_data.blocked_modules_transitive.items(), key=lambda x: len(x[1])
-  ):
+  entries, omitted = _limit(
+      sorted(
+          report_data.blocked_modules_transitive.items(),
+          key=lambda x: len(x[1]),
+      ),
+      max_entries,
+  )
+  for module, unconverted_transitive_deps in entries:
     count = len(unconverted_transitive_deps)
     if current_count != count:
-      report_lines.append(f"\n{count} unconverted transitive deps remaining:")
+      yield f"\n{count} unconverted transitive deps remaining:"
       current_count = count
     unconverted_deps = report_data.blocked_modules.get(module, set())
     unconverted_deps = set(
         d.short_string(report_data.converted) for d in unconverted_deps
     )
-    report_lines.append(f"{module}")
+    yield f"{module}"
     if not report_data.hide_unconverted_modules_reasons:
-      report_lines.append("\tunconverted due to:")
+      yield "\tunconverted due to:"
       reason_from_metric = module.get_reason_from_metric()
       reasons_from_heuristics = module.get_reasons_from_heuristics()
       if reason_from_metric != "":
-        report_lines.append(f"\t\t{reason_from_metric}")
+        yield f"\t\t{reason_from_metric}"
       if reasons_from_heuristics != "":
-        report_lines.append(f"\t\t{reasons_from_heuristics}")
+        yield f"\t\t{reasons_from_heuristics}"
     if len(unconverted_deps) == 0:
-      report_lines.append('\tdirect deps:')
+      yield "\tdirect deps:"
     else:
-      report_lines.append(
-        "\tdirect deps: {deps}".format(deps=", ".join(sorted(unconverted_deps)))
+      yield "\tdirect deps: {deps}".format(
+          deps=", ".join(sorted(unconverted_deps))
       )
-
-  report_lines.append("\n")
-  report_lines.append("# Unconverted deps of {}:\n".format(input_module_str))
-  for count, dep in sorted(
-      (
-          (len(unconverted), dep)
-          for dep, unconverted in report_data.all_unconverted_modules.items()
-      ),
-      reverse=True,
-  ):
-    report_lines.append(
-        "%s: blocking %d modules"
-        % (dep.short_string(report_data.converted), count)
+  if omitted:
+    yield _truncated_line(omitted, max_entries)
+
+  yield "\n"
+  yield "# Unconverted deps of {}:\n".format(input_module_str)
+  entries, omitted = _limit(_sorted_blockers(report_data), max_entries)
+  for count, dep in entries:
+    yield "%s: blocking %d modules" % (
+        dep.short_string(report_data.converted),
+        count,
     )
-
-  report_lines.append("\n")
-  report_lines.append(
-      "# Dirs with unconverted modules:\n\n{}".format(
-          "\n".join(sorted(report_data.dirs_with_unconverted_modules))
-      )
+  if omitted:
+    yield _truncated_line(omitted, max_entries)
+
+  def section(header, items):
+    yield f"{header}\n"
+    entries, omitted = _limit(sorted(items), max_entries)
+    if not entries:
+      yield ""
+    yield from entries
+    if omitted:
+      yield _truncated_line(omitted, max_entries)
+
+  yield "\n"
+  yield from section(
+      "# Dirs with unconverted modules:",
+      report_data.dirs_with_unconverted_modules,
   )
 
-  report_lines.append("\n")
-  report_lines.append(
-      "# Kinds with unconverted modules:\n\n{}".format(
-          "\n".join(sorted(report_data.kind_of_unconverted_modules))
-      )
+  yield "\n"
+  yield from section(
+      "# Kinds with unconverted modules:",
+      report_data.kind_of_unconverted_modules,
   )
 
-  report_lines.append("\n")
+  yield "\n"
   if report_data.show_converted:
-    report_lines.append(
-      "# Converted modules:\n\n%s" % "\n".join(sorted(report_data.converted))
-    )
+    yield from section("# Converted modules:", report_data.converted)
   else:
-    report_lines.append("# Converted modules not shown")
+    yield "# Converted modules not shown"
 
-  report_lines.append("\n")
-  report_lines.append(
+  yield "\n"
+  yield (
       "Generated by:"
       " https://cs.android.com/android/platform/superproject/+/master:build/bazel/scripts/bp2build_progress/bp2build_progress.py"
   )
-  report_lines.append(
-      "Generated at: %s"
-      % datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S %z")
+  yield "Generated at: %s" % datetime.datetime.now().strftime(
+      "%Y-%m-%dT%H:%M:%S %z"
+  )
+
+
+def generate_report(report_data, max_entries: Optional[int] = None):
+  return "\n".join(generate_report_lines(report_data, max_entries))
+
+
+def write_report(report_data, f, max_entries: Optional[int] = None):
+  """Writes the text report to f line by line, see generate_report."""
+  for i, line in enumerate(generate_report_lines(report_data, max_entries)):
+    if i > 0:
+      f.write("\n")
+    f.write(line)
+
+
+def generate_jsonl_records(report_data, max_entries: Optional[int] = None):
+  """Yields the report as json-serializable records, one per report entry.
+
+  Each record has a "record" key naming its kind: a single "summary" record is
+  followed by "module", "blocker", "dir" and "kind" records, and a "truncated"
+  record for each section that was capped by max_entries.
+  """
+  total = len(report_data.total_deps)
+  unconverted = len(report_data.unconverted_deps)
+  yield {
+      "record": "summary",
+      "input_modules": sorted(m.module.name for m in report_data.input_modules),
+      "input_types": sorted(report_data.input_types),
+      "num_deps": total,
+      "num_unconverted_deps": unconverted,
+      "percent_converted": (
+          (total - unconverted) / total * 100 if total > 0 else 100
+      ),
+  }
+
+  def truncated(section, omitted):
+    return {"record": "truncated", "section": section, "omitted": omitted}
+
+  entries, omitted = _limit(
+      sorted(
+          report_data.blocked_modules_transitive.items(),
+          key=lambda x: (len(x[1]), x[0].name),
+      ),
+      max_entries,
+  )
+  for module, unconverted_transitive_deps in entries:
+    yield {
+        "record": "module",
+        "name": module.name,
+        "kind": module.kind,
+        "dirname": module.dirname,
+        "converted": module.converted,
+        "num_deps": module.num_deps,
+        "num_unconverted_transitive_deps": len(unconverted_transitive_deps),
+        "direct_deps": sorted(
+            d.name for d in report_data.blocked_modules.get(module, ())
+        ),
+        "reason_from_metric": module.reason_from_metric,
+        "reasons_from_heuristics": sorted(module.reasons_from_heuristics),
+    }
+  if omitted:
+    yield truncated("module", omitted)
+
+  entries, omitted = _limit(_sorted_blockers(report_data), max_entries)
+  for count, dep in entries:
+    yield {
+        "record": "blocker",
+        "name": dep.name,
+        "kind": dep.kind,
+        "converted": dep.is_converted(report_data.converted),
+        "blocking": count,
+    }
+  if omitted:
+    yield truncated("blocker", omitted)
+
+  entries, omitted = _limit(
+      sorted(report_data.dirs_with_unconverted_modules), max_entries
+  )
+  for dirname in entries:
+    yield {"record": "dir", "dirname": dirname}
+  if omitted:
+    yield truncated("dir", omitted)
+
+  entries, omitted = _limit(
+      sorted(report_data.kind_of_unconverted_modules), max_entries
+  )
+  for kind_count in entries:
+    # entries of kind_of_unconverted_modules are formatted as "<kind>: <count>"
+    kind, count = kind_count.rsplit(": ", 1)
+    yield {"record": "kind", "kind": kind, "count": int(count)}
+  if omitted:
+    yield truncated("kind", omitted)
+
+
+def write_jsonl(report_data, f, max_entries: Optional[int] = None):
+  for record in generate_jsonl_records(report_data, max_entries):
+    f.write(json.dumps(record, separators=(",", ":")))
+    f.write("\n")
+
+
+# Columns of the columnar report export and the numpy dtype of each.
+REPORT_COLUMNS = [
+    ("module", "U"),
+    ("kind", "U"),
+    ("dirname", "U"),
+    ("converted", "bool"),
+    ("num_transitive_deps", "int64"),
+    ("num_unconverted_transitive_deps", "int64"),
+    ("reasons", "U"),
+    # number of modules this module blocks, i.e. how many modules would have
+    # one fewer unconverted transitive dependency if it were converted
+    ("leverage", "int64"),
+]
+
+
+def _module_identity(module: ModuleInfo) -> ModuleInfo:
+  """Returns the module without the fields that generate_report_data updates."""
+  return ModuleInfo(
+      module.name,
+      module.kind,
+      module.dirname,
+      module.created_by,
+      props=module.props,
   )
 
-  return "\n".join(report_lines)
+
+def generate_report_columns(report_data) -> Dict[str, list]:
+  """Returns the report entries as parallel column lists, see REPORT_COLUMNS."""
+  # the deps are the modules of the graph while the reported modules have
+  # transitive dep counts and reasons, so match them by identity
+  leverage = {
+      _module_identity(dep): len(blocked)
+      for dep, blocked in report_data.all_unconverted_modules.items()
+  }
+  columns = {name: [] for name, _ in REPORT_COLUMNS}
+  for module, unconverted_transitive_deps in sorted(
+      report_data.blocked_modules_transitive.items(), key=lambda x: x[0].name
+  ):
+    reasons = sorted(module.reasons_from_heuristics)
+    if module.reason_from_metric:
+      reasons.insert(0, module.reason_from_metric)
+    columns["module"].append(module.name)
+    columns["kind"].append(module.kind)
+    columns["dirname"].append(module.dirname)
+    columns["converted"].append(module.converted)
+    columns["num_transitive_deps"].append(module.num_deps)
+    columns["num_unconverted_transitive_deps"].append(
+        len(unconverted_transitive_deps)
+    )
+    columns["reasons"].append("; ".join(reasons))
+    columns["leverage"].append(leverage.get(_module_identity(module), 0))
+  return columns
+
+
+def _write_columns_csv(columns: Dict[str, list], path: str):
+  names = [name for name, _ in REPORT_COLUMNS]
+  with open(path, "w", newline="") as f:
+    writer = csv.writer(f)
+    writer.writerow(names)
+    writer.writerows(zip(*(columns[name] for name in names)))
+
+
+def write_report_columns(report_data, path: str) -> str:
+  """Writes the report columns to path and returns the path written.
+
+  A path ending in .npz is written as a numpy archive with one array per
+  column, loadable with numpy.load(path) without pickling. numpy is optional;
+  without it, or for any other extension, a csv file is written instead.
+  """
+  columns = generate_report_columns(report_data)
+  if path.endswith(".npz"):
+    try:
+      import numpy
+    except ImportError:
+      csv_path = path[: -len(".npz")] + ".csv"
+      print(
+          f"numpy is not available, writing {csv_path} instead of {path}",
+          file=sys.stderr,
+      )
+      path = csv_path
+    else:
+      numpy.savez_compressed(
+          path,
+          **{
+              name: numpy.asarray(columns[name], dtype=dtype)
+              for name, dtype in REPORT_COLUMNS
+          },
+      )
+      return path
+  _write_columns_csv(columns, path)
+  return path
 
 
 def adjacency_list_from_json(
@@ -613,44 +970,55 @@ def adjacency_list_from_queryview_xml(
   return module_adjacency_list
 
 
-# this function gets map of converted module types to set of properties for heuristics
-def get_props_by_converted_module_type(module_graph, converted, ignore_by_name):
-  props_by_converted_module_type = collections.defaultdict(set)
+# Map of module name to the (type, property names) of each of its variants
+ModulePropsIndex = Dict[str, List[Tuple[str, FrozenSet[str]]]]
 
-  def collect_module_props(module):
-    props = set(prop for prop in dependency_analysis.get_property_names(module))
-    if module["Type"] not in props_by_converted_module_type:
-      props_by_converted_module_type[module["Type"]] = props
-    else:
-      props_by_converted_module_type[module["Type"]].update(props)
 
+# this function gets the properties of every non-ignored module, so that the
+# heuristics inputs can be recomputed when only the converted modules change
+def get_module_props_index(module_graph, ignore_by_name) -> ModulePropsIndex:
+  module_props_index = collections.defaultdict(list)
   for module in module_graph:
-    if module[
-        "Name"
-    ] not in converted or dependency_analysis.ignore_json_module(
-        module, ignore_by_name
-    ):
+    if dependency_analysis.ignore_json_module(module, ignore_by_name):
       continue
-    collect_module_props(module)
+    module_props_index[module["Name"]].append((
+        module["Type"],
+        frozenset(dependency_analysis.get_property_names(module)),
+    ))
+  return module_props_index
+
 
+def props_by_converted_module_type_from_index(
+    module_props_index: ModulePropsIndex, converted
+) -> DefaultDict[str, Set[str]]:
+  props_by_converted_module_type = collections.defaultdict(set)
+  for name in converted:
+    for kind, props in module_props_index.get(name, ()):
+      props_by_converted_module_type[kind].update(props)
   return props_by_converted_module_type
 
 
-def get_module_adjacency_list_and_props_by_converted_module_type(
+# this function gets map of converted module types to set of properties for heuristics
+def get_props_by_converted_module_type(module_graph, converted, ignore_by_name):
+  return props_by_converted_module_type_from_index(
+      get_module_props_index(module_graph, ignore_by_name), converted
+  )
+
+
+def get_module_adjacency_list_and_module_props_index(
     graph_filter: GraphFilterInfo,
     use_queryview: bool,
     ignore_by_name: List[str],
-    converted: Set[str],
     target_product: dependency_analysis.TargetProduct,
     ignore_java_auto_deps: bool = False,
     collect_transitive_dependencies: bool = True,
-) -> Tuple[Dict[ModuleInfo, DepInfo], DefaultDict[str, Set[str]]]:
+) -> Tuple[Dict[ModuleInfo, DepInfo], ModulePropsIndex]:
   # The main module graph containing _all_ modules in the Soong build,
-  # and the list of converted modules.
+  # and the properties of each module.
 
-  # Map of converted modules types to the set of properties.
+  # Map of module names to their types and properties.
   # This is only used in heuristics implementation.
-  props_by_converted_module_type = collections.defaultdict(set)
+  module_props_index = {}
 
   try:
     if use_queryview:
@@ -678,9 +1046,7 @@ def get_module_adjacency_list_and_props_by_converted_module_type(
           graph_filter,
           collect_transitive_dependencies,
       )
-      props_by_converted_module_type = get_props_by_converted_module_type(
-          module_graph, converted, ignore_by_name
-      )
+      module_props_index = get_module_props_index(module_graph, ignore_by_name)
   except subprocess.CalledProcessError as err:
     sys.exit(f"""Error running: '{' '.join(err.cmd)}':"
 Stdout:
@@ -688,9 +1054,64 @@ Stdout:
 Stderr:
 {err.stderr.decode('utf-8') if err.stderr else ''}""")
 
+  return module_adjacency_list, module_props_index
+
+
+def get_module_adjacency_list_and_props_by_converted_module_type(
+    graph_filter: GraphFilterInfo,
+    use_queryview: bool,
+    ignore_by_name: List[str],
+    converted: Set[str],
+    target_product: dependency_analysis.TargetProduct,
+    ignore_java_auto_deps: bool = False,
+    collect_transitive_dependencies: bool = True,
+) -> Tuple[Dict[ModuleInfo, DepInfo], DefaultDict[str, Set[str]]]:
+  module_adjacency_list, module_props_index = (
+      get_module_adjacency_list_and_module_props_index(
+          graph_filter,
+          use_queryview,
+          ignore_by_name,
+          target_product,
+          ignore_java_auto_deps,
+          collect_transitive_dependencies,
+      )
+  )
+  # Map of converted modules types to the set of properties.
+  props_by_converted_module_type = props_by_converted_module_type_from_index(
+      module_props_index, converted
+  )
   return module_adjacency_list, props_by_converted_module_type
 
 
+def poll_for_changes(
+    paths: List[str], interval: float, max_polls: Optional[int] = None
+):
+  """Returns an iterator of changed paths, one entry per detected change."""
+
+  def mtimes():
+    ret = {}
+    for path in paths:
+      try:
+        ret[path] = os.stat(path).st_mtime_ns
+      except FileNotFoundError:
+        ret[path] = None
+    return ret
+
+  def poll(last):
+    polls = 0
+    while max_polls is None or polls < max_polls:
+      polls += 1
+      time.sleep(interval)
+      current = mtimes()
+      changed = [p for p in paths if current[p] != last[p]]
+      if changed:
+        last = current
+        yield changed
+
+  # record the initial state now rather than on the first iteration
+  return poll(mtimes())
+
+
 def add_manual_conversion_to_converted(
     converted: Dict[str, Set[str]], module_adjacency_list: Dict[ModuleInfo, DepInfo]
 ) -> Set[str]:
@@ -799,6 +1220,51 @@ def main():
       default="-",
       help="Path to write output, if omitted, writes to stdout",
   )
+  parser.add_argument(
+      "--jsonl-file",
+      help=(
+          "Path to write the report as json lines, one record per module,"
+          " blocker, directory and kind (report mode only)"
+      ),
+  )
+  parser.add_argument(
+      "--columns-file",
+      help=(
+          "Path to write one column per report field for dashboards (report"
+          " mode only). Written as a numpy .npz archive if the path ends in"
+          " .npz and numpy is available, as csv otherwise"
+      ),
+  )
+  parser.add_argument(
+      "--max-entries",
+      type=int,
+      help=(
+          "Maximum number of entries to write for each section of the text,"
+          " proto and json lines reports. By default all entries are written"
+      ),
+  )
+  parser.add_argument(
+      "--dir-tree-file",
+      help=(
+          "Path to write a json tree of converted, unconverted and blocking"
+          " module counts rolled up per blueprint directory (report mode only)"
+      ),
+  )
+  parser.add_argument(
+      "--watch",
+      action="store_true",
+      help=(
+          "Keep running after writing the report and regenerate it whenever"
+          " converted_modules.json or bp2build_metrics.pb change (report mode"
+          " only)"
+      ),
+  )
+  parser.add_argument(
+      "--watch-interval",
+      type=float,
+      default=2.0,
+      help="Seconds between checks for changes in --watch mode",
+  )
   parser.add_argument(
       "--show-converted",
       "-s",
@@ -812,7 +1278,7 @@ def main():
   parser.add_argument(
       # This flag is only relevant when used by the CI script. Don't use it when running b command independently.
       "--bp2build-metrics-location",
-      default=os.path.join(dependency_analysis.SRC_ROOT_DIR, "out"),
+      default=None,
       help=(
           "Path to get bp2build_metrics, if omitted, gets bp2build_metrics from"
           " the SRC_ROOT_DIR/out directory"
@@ -831,6 +1297,16 @@ def main():
 
   if args.proto_file and args.mode == "graph":
     sys.exit(f"Proto file only supported for report mode, not {args.mode}")
+  if args.jsonl_file and args.mode == "graph":
+    sys.exit(f"Json lines file only supported for report mode, not {args.mode}")
+  if args.columns_file and args.mode == "graph":
+    sys.exit(f"Columns file only supported for report mode, not {args.mode}")
+  if args.max_entries is not None and args.max_entries < 0:
+    sys.exit("--max-entries must not be negative")
+  if args.dir_tree_file and args.mode == "graph":
+    sys.exit(f"Dir tree file only supported for report mode, not {args.mode}")
+  if args.watch and args.mode == "graph":
+    sys.exit(f"--watch only supported for report mode, not {args.mode}")
 
   mode = args.mode
   use_queryview = args.use_queryview
@@ -848,7 +1324,10 @@ def main():
       if args.package_dir
       else args.package_dir
   )
-  bp2build_metrics_location = args.bp2build_metrics_location
+  # resolved after parsing so that e.g. --help works outside of a source tree
+  bp2build_metrics_location = args.bp2build_metrics_location or os.path.join(
+      dependency_analysis.get_src_root_dir(), "out"
+  )
   graph_filter = GraphFilterInfo(modules, types, package_dir, recursive)
 
   if package_dir is None:
@@ -885,12 +1364,11 @@ def main():
       bp2build_metrics_location
   )
 
-  module_adjacency_list, props_by_converted_module_type = (
-      get_module_adjacency_list_and_props_by_converted_module_type(
+  module_adjacency_list, module_props_index = (
+      get_module_adjacency_list_and_module_props_index(
           graph_filter,
           use_queryview,
           ignore_by_name,
-          converted,
           target_product,
           ignore_java_auto_deps,
           collect_transitive_dependencies=mode != "graph",
@@ -903,34 +1381,131 @@ def main():
         f" ({args.type}) or package {args.package_dir} you requested are valid."
     )
 
-  converted = add_manual_conversion_to_converted(converted, module_adjacency_list)
-
   output_file = args.out_file
   if mode == "graph":
+    converted = add_manual_conversion_to_converted(
+        converted, module_adjacency_list
+    )
     dot_file = generate_dot_file(
         module_adjacency_list, converted, args.show_converted
     )
     output_file.write(dot_file)
   elif mode == "report":
-    report_data = generate_report_data(
+    write_report_outputs(
+        args,
+        graph_filter,
         module_adjacency_list,
+        module_props_index,
         converted,
-        graph_filter,
-        props_by_converted_module_type,
-        args.use_queryview,
         bp2build_metrics,
-        args.hide_unconverted_modules_reasons,
-        args.show_converted,
     )
-    report = generate_report(report_data)
-    output_file.write(report)
-    if args.proto_file:
-      bp2build_conversion_progress_message = generate_proto(report_data)
-      with open(args.proto_file, "wb") as f:
-        f.write(bp2build_conversion_progress_message.SerializeToString())
+    if args.watch:
+      watch_report(
+          args,
+          graph_filter,
+          module_adjacency_list,
+          module_props_index,
+          bp2build_metrics_location,
+      )
   else:
     raise RuntimeError("unknown mode: %s" % mode)
 
 
+def write_report_outputs(
+    args,
+    graph_filter: GraphFilterInfo,
+    module_adjacency_list: Dict[ModuleInfo, DepInfo],
+    module_props_index: ModulePropsIndex,
+    converted: Dict[str, Set[str]],
+    bp2build_metrics: "Bp2BuildMetrics",
+):
+  props_by_converted_module_type = props_by_converted_module_type_from_index(
+      module_props_index, converted
+  )
+  converted = add_manual_conversion_to_converted(converted, module_adjacency_list)
+  report_data = generate_report_data(
+      module_adjacency_list,
+      converted,
+      graph_filter,
+      props_by_converted_module_type,
+      args.use_queryview,
+      bp2build_metrics,
+      args.hide_unconverted_modules_reasons,
+      args.show_converted,
+  )
+  write_report(report_data, args.out_file, args.max_entries)
+  args.out_file.flush()
+  if args.proto_file:
+    with open(args.proto_file, "wb") as f:
+      write_proto(report_data, f, args.max_entries)
+  if args.jsonl_file:
+    with open(args.jsonl_file, "w") as f:
+      write_jsonl(report_data, f, args.max_entries)
+  if args.columns_file:
+    write_report_columns(report_data, args.columns_file)
+  if args.dir_tree_file:
+    dir_tree = generate_dir_tree(
+        module_adjacency_list,
+        converted,
+        report_data.all_unconverted_modules,
+    )
+    write_dir_tree(dir_tree, args.dir_tree_file)
+
+
+def watch_report(
+    args,
+    graph_filter: GraphFilterInfo,
+    module_adjacency_list: Dict[ModuleInfo, DepInfo],
+    module_props_index: ModulePropsIndex,
+    bp2build_metrics_location: str,
+):
+  """Regenerates the report whenever bp2build writes new conversion results.
+
+  The module graph is kept from the initial run; only the parts that depend on
+  the set of converted modules (unconverted closures, reasons and rollups) are
+  recomputed.
+  """
+  from google.protobuf.message import DecodeError
+
+  paths = [
+      dependency_analysis.get_bp2build_converted_modules_path(),
+      dependency_analysis.get_bp2build_metrics_path(bp2build_metrics_location),
+  ]
+  print(
+      "Watching %s for changes, press Ctrl-C to stop" % ", ".join(paths),
+      file=sys.stderr,
+  )
+  try:
+    for changed in poll_for_changes(paths, args.watch_interval):
+      start = time.perf_counter()
+      try:
+        converted = dependency_analysis.read_bp2build_converted_modules()
+        bp2build_metrics = dependency_analysis.get_bp2build_metrics(
+            bp2build_metrics_location
+        )
+      except (OSError, ValueError, DecodeError) as err:
+        # bp2build may still be writing the files, wait for the next change
+        print(f"Skipping refresh, could not read inputs: {err}", file=sys.stderr)
+        continue
+      if args.out_file.seekable():
+        args.out_file.seek(0)
+        args.out_file.truncate()
+      write_report_outputs(
+          args,
+          graph_filter,
+          module_adjacency_list,
+          module_props_index,
+          converted,
+          bp2build_metrics,
+      )
+      print(
+          "Refreshed report after changes to %s in %.2fs"
+          % (", ".join(changed), time.perf_counter() - start),
+          file=sys.stderr,
+      )
+  except KeyboardInterrupt:
+    pass
+
+
 if __name__ == "__main__":
   main()
@@ -17,6 +17,11 @@
 
 import collections
 import datetime
+import importlib.util
+import io
+import json
+import os
+import tempfile
 import unittest
 import unittest.mock
 from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics
@@ -1556,6 +1561,356 @@ Generated at: {datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S %z")}"""
     message = bp2build_progress.generate_proto(report_data)
     self.assertEqual(message, expected_message)
 
+  def _make_report_data_for_writers(self):
+    a = bp2build_progress.ModuleInfo(
+        name='a', kind='type1', dirname='pkg', num_deps=3, created_by=None
+    )
+    b = bp2build_progress.ModuleInfo(
+        name='b', kind='type2', dirname='pkg', num_deps=1, created_by=None
+    )
+    c = bp2build_progress.ModuleInfo(
+        name='c', kind='type2', dirname='other', num_deps=0, created_by=None
+    )
+    d = bp2build_progress.ModuleInfo(
+        name='d', kind='type3', dirname='pkg2', num_deps=0, created_by=None
+    )
+
+    module_graph = {}
+    module_graph[a] = bp2build_progress.DepInfo(
+        direct_deps=set([b, d]), transitive_deps=set([c])
+    )
+    module_graph[b] = bp2build_progress.DepInfo(direct_deps=set([c]))
+    module_graph[c] = bp2build_progress.DepInfo()
+    module_graph[d] = bp2build_progress.DepInfo()
+
+    return bp2build_progress.generate_report_data(
+        module_graph,
+        {},
+        bp2build_progress.GraphFilterInfo(module_names={'a'}, package_dir=None),
+        props_by_converted_module_type=collections.defaultdict(set),
+        use_queryview=False,
+        hide_unconverted_modules_reasons=True,
+        bp2build_metrics=Bp2BuildMetrics(),
+    )
+
+  def test_write_report_matches_generate_report(self):
+    report_data = self._make_report_data_for_writers()
+    for max_entries in [None, 0, 1, 2]:
+      with self.subTest(max_entries=max_entries):
+        f = io.StringIO()
+        bp2build_progress.write_report(report_data, f, max_entries)
+        self.assertEqual(
+            f.getvalue(),
+            bp2build_progress.generate_report(report_data, max_entries),
+        )
+
+  def test_generate_report_max_entries(self):
+    report_data = self._make_report_data_for_writers()
+
+    report = bp2build_progress.generate_report(report_data, max_entries=1)
+
+    self.assertIn(
+        """# Transitive dependency closure:
+
+0 unconverted transitive deps remaining:
+c [type2] [other]
+\tdirect deps:
+... 3 more not shown (--max-entries=1)
+""",
+        report,
+    )
+    self.assertIn(
+        """# Dirs with unconverted modules:
+
+other
+... 2 more not shown (--max-entries=1)
+""",
+        report,
+    )
+
+  def test_write_jsonl(self):
+    report_data = self._make_report_data_for_writers()
+
+    f = io.StringIO()
+    bp2build_progress.write_jsonl(report_data, f, max_entries=2)
+    records = [json.loads(line) for line in f.getvalue().splitlines()]
+
+    self.assertEqual(
+        records[0],
+        {
+            'record': 'summary',
+            'input_modules': ['a'],
+            'input_types': [],
+            'num_deps': 3,
+            'num_unconverted_deps': 3,
+            'percent_converted': 0.0,
+        },
+    )
+    self.assertEqual(
+        [(r['record'], r.get('name')) for r in records[1:4]],
+        [('module', 'c'), ('module', 'd'), ('truncated', None)],
+    )
+    self.assertEqual(records[3]['omitted'], 2)
+    self.assertIn(
+        {
+            'record': 'blocker',
+            'name': 'c',
+            'kind': 'type2',
+            'converted': False,
+            'blocking': 2,
+        },
+        records,
+    )
+    self.assertIn({'record': 'kind', 'kind': 'type2', 'count': 2}, records)
+
+  def test_write_proto_matches_generate_proto(self):
+    report_data = self._make_report_data_for_writers()
+
+    f = io.BytesIO()
+    bp2build_progress.write_proto(report_data, f, chunk_size=1)
+    message = bp2build_pb2.Bp2buildConversionProgress()
+    message.ParseFromString(f.getvalue())
+
+    self.assertEqual(message, bp2build_progress.generate_proto(report_data))
+
+  def test_generate_report_columns(self):
+    report_data = self._make_report_data_for_writers()
+
+    columns = bp2build_progress.generate_report_columns(report_data)
+
+    self.assertEqual(
+        columns,
+        {
+            'module': ['a', 'b', 'c', 'd'],
+            'kind': ['type1', 'type2', 'type2', 'type3'],
+            'dirname': ['pkg', 'pkg', 'other', 'pkg2'],
+            'converted': [False, False, False, False],
+            'num_transitive_deps': [3, 1, 0, 0],
+            'num_unconverted_transitive_deps': [3, 1, 0, 0],
+            'reasons': ['', '', '', ''],
+            'leverage': [0, 1, 2, 1],
+        },
+    )
+
+  def test_generate_report_columns_leverage_by_module(self):
+    def module(name, kind, num_deps=0):
+      return bp2build_progress.ModuleInfo(
+          name=name,
+          kind=kind,
+          dirname='pkg',
+          num_deps=num_deps,
+          created_by=None,
+      )
+
+    a = module('a', 'type1', num_deps=1)
+    b = module('b', 'type1', num_deps=1)
+    c = module('c', 'type1', num_deps=1)
+    # same name, different kinds; num_deps differs from the reported count
+    x1 = module('x', 'type1', num_deps=5)
+    x2 = module('x', 'type2', num_deps=5)
+
+    module_graph = {
+        a: bp2build_progress.DepInfo(direct_deps=set([x1])),
+        b: bp2build_progress.DepInfo(direct_deps=set([x1])),
+        c: bp2build_progress.DepInfo(direct_deps=set([x2])),
+        x1: bp2build_progress.DepInfo(),
+        x2: bp2build_progress.DepInfo(),
+    }
+    report_data = bp2build_progress.generate_report_data(
+        module_graph,
+        {},
+        bp2build_progress.GraphFilterInfo(
+            module_names={'a', 'b', 'c'}, package_dir=None
+        ),
+        props_by_converted_module_type=collections.defaultdict(set),
+        use_queryview=False,
+        hide_unconverted_modules_reasons=True,
+        bp2build_metrics=Bp2BuildMetrics(),
+    )
+
+    columns = bp2build_progress.generate_report_columns(report_data)
+
+    self.assertEqual(
+        list(zip(columns['module'], columns['kind'], columns['leverage'])),
+        [
+            ('a', 'type1', 0),
+            ('b', 'type1', 0),
+            ('c', 'type1', 0),
+            ('x', 'type1', 2),
+            ('x', 'type2', 1),
+        ],
+    )
+
+  def test_write_report_columns_csv(self):
+    report_data = self._make_report_data_for_writers()
+
+    with tempfile.TemporaryDirectory() as tmp:
+      path = bp2build_progress.write_report_columns(
+          report_data, os.path.join(tmp, 'columns.csv')
+      )
+      with open(path) as f:
+        lines = f.read().splitlines()
+
+    self.assertEqual(
+        lines[0],
+        'module,kind,dirname,converted,num_transitive_deps,'
+        'num_unconverted_transitive_deps,reasons,leverage',
+    )
+    self.assertEqual(lines[3], 'c,type2,other,False,0,0,,2')
+
+  @unittest.skipUnless(
+      importlib.util.find_spec('numpy'), 'numpy is not available'
+  )
+  def test_write_report_columns_npz(self):
+    import numpy
+
+    report_data = self._make_report_data_for_writers()
+
+    with tempfile.TemporaryDirectory() as tmp:
+      path = bp2build_progress.write_report_columns(
+          report_data, os.path.join(tmp, 'columns.npz')
+      )
+      with numpy.load(path) as columns:
+        self.assertEqual(columns['leverage'].sum(), 4)
+        self.assertEqual(list(columns['module']), ['a', 'b', 'c', 'd'])
+
+  def test_generate_dir_tree(self):
+    a = bp2build_progress.ModuleInfo(
+        name='a', kind='type1', dirname='pkg', created_by=None
+    )
+    b = bp2build_progress.ModuleInfo(
+        name='b', kind='type2', dirname='pkg/sub', created_by=None
+    )
+    c = bp2build_progress.ModuleInfo(
+        name='c', kind='type2', dirname='pkg/sub', created_by=None
+    )
+    d = bp2build_progress.ModuleInfo(
+        name='d', kind='type3', dirname='other', created_by=None
+    )
+
+    module_graph = {}
+    module_graph[a] = bp2build_progress.DepInfo(direct_deps=set([b, d]))
+    module_graph[b] = bp2build_progress.DepInfo(direct_deps=set([c]))
+    module_graph[c] = bp2build_progress.DepInfo()
+    module_graph[d] = bp2build_progress.DepInfo()
+
+    converted = {c.name: {c.kind}}
+    report_data = bp2build_progress.generate_report_data(
+        module_graph,
+        converted,
+        bp2build_progress.GraphFilterInfo(module_names={'a'}, package_dir=None),
+        props_by_converted_module_type=collections.defaultdict(set),
+        use_queryview=False,
+        hide_unconverted_modules_reasons=True,
+        bp2build_metrics=Bp2BuildMetrics(),
+    )
+
+    tree = bp2build_progress.generate_dir_tree(
+        module_graph, converted, report_data.all_unconverted_modules
+    )
+
+    self.assertEqual(
+        tree.to_json(),
+        {
+            'converted': 1,
+            'unconverted': 3,
+            'total': 4,
+            'blocking': 2,
+            'dirs': {
+                'other': {
+                    'converted': 0,
+                    'unconverted': 1,
+                    'total': 1,
+                    'blocking': 1,
+                },
+                'pkg': {
+                    'converted': 1,
+                    'unconverted': 2,
+                    'total': 3,
+                    'blocking': 1,
+                    'dirs': {
+                        'sub': {
+                            'converted': 1,
+                            'unconverted': 1,
+                            'total': 2,
+                            'blocking': 1,
+                        },
+                    },
+                },
+            },
+        },
+    )
+    pkg_sub = bp2build_progress.get_dir_tree_node(tree, 'pkg/sub/')
+    self.assertEqual(pkg_sub.total, 2)
+    self.assertIsNone(bp2build_progress.get_dir_tree_node(tree, 'pkg2'))
+    self.assertEqual(
+        bp2build_progress.DirTreeNode.from_json(tree.to_json()), tree
+    )
+
+  def test_props_by_converted_module_type_from_index(self):
+    module_props_index = bp2build_progress.get_module_props_index(
+        _soong_module_graph, set()
+    )
+
+    for converted in [set(), {'b'}, {'b', 'c', 'f'}]:
+      with self.subTest(converted=converted):
+        self.assertEqual(
+            bp2build_progress.props_by_converted_module_type_from_index(
+                module_props_index, converted
+            ),
+            bp2build_progress.get_props_by_converted_module_type(
+                _soong_module_graph, converted, set()
+            ),
+        )
+
+  @unittest.mock.patch('time.sleep', autospec=True)
+  def test_poll_for_changes(self, _):
+    with tempfile.TemporaryDirectory() as tmp:
+      converted = os.path.join(tmp, 'converted_modules.json')
+      metrics = os.path.join(tmp, 'bp2build_metrics.pb')
+      with open(converted, 'w') as f:
+        f.write('[]')
+
+      changes = bp2build_progress.poll_for_changes(
+          [converted, metrics], interval=0, max_polls=3
+      )
+      with open(metrics, 'wb') as f:
+        f.write(b'')
+      self.assertEqual(next(changes), [metrics])
+      os.utime(converted, ns=(0, 0))
+      self.assertEqual(next(changes), [converted])
+      self.assertEqual(list(changes), [])
+
+  @unittest.mock.patch('bp2build_progress.write_report_outputs', autospec=True)
+  @unittest.mock.patch(
+      'dependency_analysis.read_bp2build_converted_modules',
+      autospec=True,
+      return_value=set(),
+  )
+  def test_watch_report_skips_partial_metrics(self, _, write_report_outputs):
+    metrics = Bp2BuildMetrics()
+    event = metrics.events.add()
+    event.name = 'bp2build' * 16
+    data = metrics.SerializeToString()
+    with tempfile.TemporaryDirectory() as tmp:
+      metrics_pb = dependency_analysis.get_bp2build_metrics_path(tmp)
+      with open(metrics_pb, 'wb') as f:
+        # as if bp2build were still writing it
+        f.write(data[: len(data) // 2])
+      with unittest.mock.patch(
+          'bp2build_progress.poll_for_changes',
+          autospec=True,
+          return_value=iter([[metrics_pb]]),
+      ), unittest.mock.patch(
+          'dependency_analysis.get_bp2build_converted_modules_path',
+          autospec=True,
+          return_value=os.path.join(tmp, 'converted_modules.json'),
+      ):
+        bp2build_progress.watch_report(
+            unittest.mock.Mock(), None, {}, None, tmp
+        )
+    write_report_outputs.assert_not_called()
+
   def test_generate_dot_file(self):
     self.maxDiff = None
     a = bp2build_progress.ModuleInfo(
@@ -17,6 +17,7 @@
 
 import collections
 import dataclasses
+import functools
 import json
 import os
 import os.path
@@ -24,7 +25,6 @@ import subprocess
 import sys
 from typing import Dict, Optional, Set
 import xml.etree.ElementTree
-from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics
 
 
 @dataclasses.dataclass(frozen=True, order=True)
@@ -92,10 +92,13 @@ _TOOLCHAIN_DEP_TYPES = frozenset([
     ),
 ])
 
+@functools.cache
 def get_src_root_dir() -> str:
   # Search up the directory tree until we find soong_ui.bash as a regular file, not a symlink.
   # This is so that we find the real source tree root, and not the bazel execroot which symlimks in
   # soong_ui.bash.
+  # The search is deferred until the root is first needed so that importing
+  # this module is cheap and works outside of a source tree.
   def soong_ui(path):
     return os.path.join(path, 'build/soong/soong_ui.bash')
 
@@ -106,7 +109,14 @@ def get_src_root_dir() -> str:
     path = os.path.join(path, '..')
   return os.path.abspath(path)
 
-SRC_ROOT_DIR = get_src_root_dir()
+
+def __getattr__(name):
+  # SRC_ROOT_DIR used to be computed at import time, keep it available as a
+  # lazily computed module attribute.
+  if name == "SRC_ROOT_DIR":
+    return get_src_root_dir()
+  raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 LUNCH_ENV = {
     # Use aosp_arm as the canonical target product.
@@ -142,7 +152,7 @@ def _build_with_soong(target, target_product):
           "--skip-soong-tests",
           target,
       ],
-      cwd=SRC_ROOT_DIR,
+      cwd=get_src_root_dir(),
       env=env,
   )
 
@@ -188,7 +198,7 @@ def get_queryview_module_info_by_type(types, target_product):
               f'deps(attr("soong_module_type", "^{t}$", //...))' for t in types
           ),
       ],
-      cwd=SRC_ROOT_DIR,
+      cwd=get_src_root_dir(),
   )
   try:
     return xml.etree.ElementTree.fromstring(queryview_xml)
@@ -215,7 +225,7 @@ def get_queryview_module_info(modules, target_product):
               for m in modules
           ),
       ],
-      cwd=SRC_ROOT_DIR,
+      cwd=get_src_root_dir(),
   )
   try:
     return xml.etree.ElementTree.fromstring(queryview_xml)
@@ -229,7 +239,7 @@ def get_json_module_info(target_product=None):
   """Returns the list of transitive dependencies of input module as provided by Soong's json module graph."""
   _build_with_soong("json-module-graph", target_product)
   try:
-    with open(os.path.join(SRC_ROOT_DIR, "out/soong/module-graph.json")) as f:
+    with open(os.path.join(get_src_root_dir(), "out/soong/module-graph.json")) as f:
       return json.load(f)
   except json.JSONDecodeError as err:
     sys.exit(f"""Could not decode json:
@@ -465,17 +475,23 @@ def visit_queryview_xml_module_graph_post_order(
     queryview_module_graph_post_traversal(name_with_variant)
 
 
+def get_bp2build_converted_modules_path() -> str:
+  return os.path.join(
+      get_src_root_dir(),
+      "out/soong/soong_injection/metrics/converted_modules.json",
+  )
+
+
 def get_bp2build_converted_modules(target_product) -> Dict[str, Set[str]]:
   """Returns the list of modules that bp2build can currently convert."""
   _build_with_soong("bp2build", target_product)
+  return read_bp2build_converted_modules()
+
+
+def read_bp2build_converted_modules() -> Dict[str, Set[str]]:
+  """Returns the converted modules recorded by the most recent bp2build run."""
   # Parse the list of converted module names from bp2build
-  with open(
-      os.path.join(
-          SRC_ROOT_DIR,
-          "out/soong/soong_injection/metrics/converted_modules.json",
-      ),
-      "r",
-  ) as f:
+  with open(get_bp2build_converted_modules_path(), "r") as f:
     converted_mods = json.loads(f.read())
     ret = collections.defaultdict(set)
     for m in converted_mods:
@@ -483,12 +499,16 @@ def get_bp2build_converted_modules(target_product) -> Dict[str, Set[str]]:
   return ret
 
 
+def get_bp2build_metrics_path(bp2build_metrics_location) -> str:
+  return os.path.join(bp2build_metrics_location, "bp2build_metrics.pb")
+
+
 def get_bp2build_metrics(bp2build_metrics_location):
   """Returns the bp2build metrics"""
+  from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics
+
   bp2build_metrics = Bp2BuildMetrics()
-  with open(
-      os.path.join(bp2build_metrics_location, "bp2build_metrics.pb"), "rb"
-  ) as f:
+  with open(get_bp2build_metrics_path(bp2build_metrics_location), "rb") as f:
     bp2build_metrics.ParseFromString(f.read())
     f.close()
   return bp2build_metrics
@@ -507,7 +527,7 @@ def get_json_module_type_info(module_type, target_product=None):
           "out/soong/module-graph.json",
           module_type,
       ],
-      cwd=SRC_ROOT_DIR,
+      cwd=get_src_root_dir(),
   )
   return json.loads(result)
 
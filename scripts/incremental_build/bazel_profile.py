@@ -0,0 +1,135 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Analysis of the JSON trace profiles written by the bazel invocations of a
+mixed build (see `--profile`), e.g. to attribute time to bazel's analysis
+versus execution phases.
+"""
+import dataclasses
+import datetime
+import gzip
+import json
+import logging
+from pathlib import Path
+from typing import Final, TextIO
+
+import build_trace
+import util
+
+BAZEL_PROFILE_JSON: Final[str] = "bazel_profile.json"
+TOP_N: Final[int] = 20
+# event categories, see bazel's ProfilerTask
+_PHASE_MARKER: Final[str] = "build phase marker"
+_ACTION: Final[str] = "action processing"
+_CRITICAL_PATH: Final[str] = "critical path component"
+
+
+@dataclasses.dataclass
+class ProfileStats:
+    """Times are in microseconds"""
+
+    phases: dict[str, int] = dataclasses.field(default_factory=dict)
+    """time from each build phase marker to the next, keyed by phase name"""
+    mnemonics: dict[str, int] = dataclasses.field(default_factory=dict)
+    """total time of the actions by mnemonic"""
+    action_count: int = 0
+    critical_path: list[tuple[str, int]] = dataclasses.field(default_factory=list)
+    """(description, duration) of each action on the critical path"""
+
+    def merge(self, other: "ProfileStats"):
+        for name, t in other.phases.items():
+            self.phases[name] = self.phases.get(name, 0) + t
+        for name, t in other.mnemonics.items():
+            self.mnemonics[name] = self.mnemonics.get(name, 0) + t
+        self.action_count += other.action_count
+        self.critical_path.extend(other.critical_path)
+
+
+def read_profile(f: TextIO) -> ProfileStats:
+    stats = ProfileStats()
+    markers: list[tuple[int, str]] = []
+    last_ts = 0
+    for event in build_trace.iter_events(f):
+        cat = event.get("cat")
+        ts = int(event.get("ts", 0))
+        dur = int(event.get("dur", 0))
+        last_ts = max(last_ts, ts + dur)
+        if cat == _PHASE_MARKER:
+            markers.append((ts, event.get("name", "")))
+        elif cat == _ACTION and event.get("ph") == "X":
+            mnemonic = event.get("args", {}).get("mnemonic", "<unknown>")
+            stats.mnemonics[mnemonic] = stats.mnemonics.get(mnemonic, 0) + dur
+            stats.action_count += 1
+        elif cat == _CRITICAL_PATH:
+            stats.critical_path.append((event.get("name", ""), dur))
+    markers.sort()
+    for (ts, name), (next_ts, _) in zip(markers, [*markers[1:], (last_ts, "")]):
+        stats.phases[name] = stats.phases.get(name, 0) + next_ts - ts
+    return stats
+
+
+def _open(profile: Path) -> TextIO:
+    with open(profile, "rb") as f:
+        is_gzip = f.read(2) == b"\x1f\x8b"
+    return gzip.open(profile, "rt") if is_gzip else open(profile, "rt")
+
+
+def _hhmmss(us: int) -> str:
+    return util.hhmmss(datetime.timedelta(microseconds=us), decimal_precision=True)
+
+
+def analyze(profiles: list[Path], top_n: int = TOP_N) -> dict[str, any]:
+    """
+    :return: a json-serializable analysis of all `profiles` together; its
+    "summary" holds the values that are tabulated in metrics.csv
+    """
+    stats = ProfileStats()
+    for profile in profiles:
+        try:
+            with _open(profile) as f:
+                stats.merge(read_profile(f))
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            logging.warning("could not read %s: %s", profile, e)
+    if not stats.phases and not stats.action_count:
+        return {"summary": {}}
+    summary = {
+        "bazel.actions": stats.action_count,
+        "bazel.critical_path": _hhmmss(sum(t for _, t in stats.critical_path)),
+    }
+    for name, t in stats.phases.items():
+        summary[f"bazel/{name}"] = _hhmmss(t)
+    mnemonics = sorted(stats.mnemonics.items(), key=lambda kv: kv[1], reverse=True)
+    critical_path = sorted(stats.critical_path, key=lambda kv: kv[1], reverse=True)
+    return {
+        "summary": summary,
+        "profiles": [p.name for p in profiles],
+        "mnemonics": {name: _hhmmss(t) for name, t in mnemonics},
+        "critical_path": [
+            {"action": name, "time": _hhmmss(t)} for name, t in critical_path[:top_n]
+        ],
+    }
+
+
+def write_analysis(profiles_dir: Path, run_dir: Path):
+    profiles = sorted(p for p in profiles_dir.rglob("*") if p.is_file())
+    with open(run_dir.joinpath(BAZEL_PROFILE_JSON), "w") as f:
+        json.dump(analyze(profiles), f, indent=True)
+
+
+def read_summary(run_dir: Path) -> dict[str, any]:
+    analysis_json = run_dir.joinpath(BAZEL_PROFILE_JSON)
+    if not analysis_json.exists():
+        return {}
+    with open(analysis_json) as f:
+        return json.load(f).get("summary", {})
@@ -0,0 +1,92 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import gzip
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import bazel_profile
+
+
+def marker(name: str, ts: int) -> dict:
+    return {"cat": "build phase marker", "name": name, "ph": "i", "ts": ts}
+
+
+def action(mnemonic: str, ts: int, dur: int) -> dict:
+    return {
+        "cat": "action processing",
+        "name": f"{mnemonic} action",
+        "ph": "X",
+        "ts": ts,
+        "dur": dur,
+        "args": {"mnemonic": mnemonic},
+    }
+
+
+PROFILE = {
+    "otherData": {"build_id": "1", "output_base": "/tmp/[x]"},
+    "traceEvents": [
+        {"name": "thread_name", "ph": "M", "pid": 1, "tid": 0},
+        marker("Launch Blaze", 0),
+        marker("Load and analyze dependencies", 1_000),
+        marker("Build artifacts", 3_000),
+        action("CppCompile", 3_000, 2_000),
+        action("CppCompile", 3_500, 1_000),
+        action("CppLink", 5_000, 1_000),
+        {
+            "cat": "critical path component",
+            "name": "action 'Linking libfoo.so'",
+            "ph": "X",
+            "ts": 5_000,
+            "dur": 1_000,
+        },
+    ],
+}
+
+
+class BazelProfileTest(unittest.TestCase):
+    def test_read_profile(self):
+        stats = bazel_profile.read_profile(io.StringIO(json.dumps(PROFILE)))
+        self.assertEqual(
+            stats.phases,
+            {
+                "Launch Blaze": 1_000,
+                "Load and analyze dependencies": 2_000,
+                "Build artifacts": 3_000,
+            },
+        )
+        self.assertEqual(stats.mnemonics, {"CppCompile": 3_000, "CppLink": 1_000})
+        self.assertEqual(stats.action_count, 3)
+        self.assertEqual(stats.critical_path, [("action 'Linking libfoo.so'", 1_000)])
+
+    def test_write_analysis(self):
+        with tempfile.TemporaryDirectory() as d:
+            run_dir = Path(d)
+            profiles_dir = run_dir.joinpath("bazel_metrics")
+            profiles_dir.mkdir()
+            with gzip.open(profiles_dir.joinpath("a_bazel_profile.gz"), "wt") as f:
+                json.dump(PROFILE, f)
+            with open(profiles_dir.joinpath("b_bazel_profile.json"), "w") as f:
+                json.dump(PROFILE, f)
+            bazel_profile.write_analysis(profiles_dir, run_dir)
+            summary = bazel_profile.read_summary(run_dir)
+        self.assertEqual(summary["bazel.actions"], 6)
+        self.assertEqual(summary["bazel/Build artifacts"], "00:00.006")
+        self.assertEqual(summary["bazel.critical_path"], "00:00.002")
+
+
+if __name__ == "__main__":
+    unittest.main()
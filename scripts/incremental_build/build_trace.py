@@ -0,0 +1,312 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Analysis of `build.trace.gz`, the Chrome trace written by soong_ui, which has
+the nested phases of a build (soong_ui, soong_build, kati, ninja, bazel etc.)
+as well as the imported ninja actions.
+"""
+import bisect
+import dataclasses
+import datetime
+import gzip
+import json
+import logging
+import re
+import zlib
+from pathlib import Path
+from typing import Final, Iterator, Optional, TextIO
+
+import util
+
+BUILD_TRACE_JSON: Final[str] = "build_trace.json"
+_READ_SIZE: Final[int] = 1 << 16
+# an event that can't be decoded from this many characters is malformed rather
+# than split across blocks
+_MAX_EVENT_SIZE: Final[int] = 1 << 20
+# the end of an event followed by the start of the next one
+_NEXT_EVENT: Final[re.Pattern] = re.compile(r"\}\s*,\s*(?=\{)")
+
+ThreadId = tuple[any, any]
+
+
+@dataclasses.dataclass
+class Span:
+    """A traced interval, times are in microseconds"""
+
+    name: str
+    start: int
+    end: int
+    children: list["Span"] = dataclasses.field(default_factory=list)
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    @property
+    def self_time(self) -> int:
+        return self.duration - sum(c.duration for c in self.children)
+
+
+def _events_start(buf: str) -> Optional[int]:
+    """:return: the index just past the `[` opening the array of events"""
+    stripped = buf.lstrip()
+    if stripped.startswith("["):
+        return len(buf) - len(stripped) + 1
+    if stripped.startswith("{"):
+        key = buf.find('"traceEvents"')
+        if key >= 0:
+            bracket = buf.find("[", key)
+            if bracket >= 0:
+                return bracket + 1
+    return None
+
+
+def iter_events(f: TextIO) -> Iterator[dict[str, any]]:
+    """
+    Incrementally decodes the events of a trace in either the JSON Array
+    Format, i.e. `[{...},{...},...]`, or the JSON Object Format, i.e.
+    `{"traceEvents": [{...},{...},...], ...}`, reading a block at a time.
+    The closing bracket is optional, as it is in a trace of an interrupted
+    build. Anything after the array of events is ignored, as are malformed
+    events, by skipping to the next event.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    started = False
+    eof = False
+    while not eof:
+        block = f.read(_READ_SIZE)
+        eof = not block
+        buf += block
+        if not started:
+            start = _events_start(buf)
+            if start is None:
+                continue
+            buf = buf[start:]
+            started = True
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in ", \t\r\n":
+                pos += 1
+            if pos == len(buf):
+                break
+            if buf[pos] == "]":
+                return
+            try:
+                event, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if not eof and len(buf) - pos < _MAX_EVENT_SIZE:
+                    # most likely an event split across blocks
+                    break
+                m = _NEXT_EVENT.search(buf, pos)
+                if m is None:
+                    if not eof:
+                        logging.warning("skipping malformed trace: %.80s", buf[pos:])
+                        pos = len(buf)
+                    break
+                logging.warning(
+                    "skipping malformed trace event: %.80s", buf[pos : m.start() + 1]
+                )
+                pos = m.end()
+                continue
+            yield event
+        buf = buf[pos:]
+    if not started:
+        logging.warning("no trace events found")
+    elif buf:
+        logging.warning("ignoring incomplete trailing trace event: %.80s", buf)
+
+
+def _nest(spans: list[Span]) -> list[Span]:
+    """
+    Nests the spans of a thread by containment.
+    :return: the top-level spans in chronological order
+    """
+    spans.sort(key=lambda s: (s.start, -s.end))
+    roots: list[Span] = []
+    stack: list[Span] = []
+    for s in spans:
+        while stack and stack[-1].end <= s.start:
+            stack.pop()
+        if stack and s.end <= stack[-1].end:
+            stack[-1].children.append(s)
+        else:
+            # overlapping spans on a thread shouldn't happen; don't nest them
+            stack.clear()
+            roots.append(s)
+        stack.append(s)
+    return roots
+
+
+def read_phases(f: TextIO) -> list[Span]:
+    """
+    Reconstructs the phase nesting from the "B"/"E" (begin/end) and "X"
+    (complete) events of the threads that have any begin/end events.
+    Threads with only complete events hold the imported ninja actions, which
+    are not phases and are skipped.
+    :return: the top-level phases in chronological order
+    """
+    open_spans: dict[ThreadId, list[Span]] = {}
+    spans: dict[ThreadId, list[Span]] = {}
+    complete: dict[ThreadId, list[Span]] = {}
+    last_ts = 0
+    for event in iter_events(f):
+        ph = event.get("ph")
+        if ph not in ("B", "E", "X"):
+            continue
+        tid: ThreadId = (event.get("pid"), event.get("tid"))
+        ts = int(event.get("ts", 0))
+        if ph == "X":
+            end = ts + int(event.get("dur", 0))
+            last_ts = max(last_ts, end)
+            complete.setdefault(tid, []).append(Span(event.get("name", ""), ts, end))
+            continue
+        last_ts = max(last_ts, ts)
+        stack = open_spans.setdefault(tid, [])
+        if ph == "B":
+            stack.append(Span(event.get("name", ""), ts, ts))
+        elif stack:
+            span = stack.pop()
+            span.end = ts
+            spans.setdefault(tid, []).append(span)
+    for tid, stack in open_spans.items():
+        if stack:
+            logging.warning("%d unfinished phases in the trace", len(stack))
+        for span in stack:
+            span.end = last_ts
+            spans.setdefault(tid, []).append(span)
+
+    phases = []
+    for tid in open_spans:
+        phases.extend(_nest(spans.get(tid, []) + complete.get(tid, [])))
+    phases.sort(key=lambda s: (s.start, -s.end))
+    return phases
+
+
+def self_times(
+    phases: list[Span], prefix: str = "", acc: Optional[dict[str, int]] = None
+) -> dict[str, int]:
+    """
+    :return: self time, summed over repeats, by `/`-joined path of phase names
+    e.g. `soong_ui/soong_build`
+    """
+    if acc is None:
+        acc = {}
+    for p in phases:
+        path = f"{prefix}{p.name}"
+        acc[path] = acc.get(path, 0) + p.self_time
+        self_times(p.children, f"{path}/", acc)
+    return acc
+
+
+def _latest_chain(spans: list[Span]) -> list[Span]:
+    """
+    :return: the chain ending with the span that finishes last where each
+    predecessor is the span that finished last before its successor started
+    """
+    by_end = sorted(spans, key=lambda s: (s.end, s.start))
+    ends = [s.end for s in by_end]
+    chain: list[Span] = []
+    i = len(by_end) - 1
+    while i >= 0:
+        current = by_end[i]
+        chain.append(current)
+        i = bisect.bisect_right(ends, current.start, hi=i) - 1
+    chain.reverse()
+    return chain
+
+
+def critical_path(phases: list[Span], prefix: str = "") -> list[tuple[str, Span]]:
+    """
+    The trace has no dependency information, so the critical path is
+    approximated by the chain of phases that each finished last before their
+    successor started, recursively expanded into their children.
+    :return: the (path, span) pairs of the innermost phases of the chain
+    """
+    path = []
+    for p in _latest_chain(phases):
+        name = f"{prefix}{p.name}"
+        if p.children:
+            path.extend(critical_path(p.children, f"{name}/"))
+        else:
+            path.append((name, p))
+    return path
+
+
+def idle_gaps(phases: list[Span]) -> list[tuple[int, int]]:
+    """:return: the (start, end) intervals between top-level phases"""
+    gaps = []
+    busy_until = None
+    for p in phases:
+        if busy_until is not None and p.start > busy_until:
+            gaps.append((busy_until, p.start))
+        busy_until = p.end if busy_until is None else max(busy_until, p.end)
+    return gaps
+
+
+def _hhmmss(us: int) -> str:
+    return util.hhmmss(datetime.timedelta(microseconds=us), decimal_precision=True)
+
+
+def analyze(phases: list[Span]) -> dict[str, any]:
+    """
+    :return: a json-serializable analysis; its "summary" holds the values that
+    are tabulated in metrics.csv
+    """
+    if not phases:
+        return {"summary": {}}
+    wall = max(p.end for p in phases) - phases[0].start
+    gaps = idle_gaps(phases)
+    path = critical_path(phases)
+    summary = {
+        "trace.wall": _hhmmss(wall),
+        "trace.idle": _hhmmss(sum(end - start for start, end in gaps)),
+        "trace.critical_path": _hhmmss(
+            sum(p.duration for p in _latest_chain(phases))
+        ),
+    }
+    for name, t in self_times(phases).items():
+        summary[f"trace/{name}"] = _hhmmss(t)
+    return {
+        "summary": summary,
+        "critical_path": [
+            {"phase": name, "start": s.start, "end": s.end} for name, s in path
+        ],
+        "idle_gaps": [{"start": start, "end": end} for start, end in gaps],
+    }
+
+
+def write_analysis(build_trace_gz: Path, run_dir: Path):
+    with gzip.open(build_trace_gz, "rt") as f:
+        analysis = analyze(read_phases(f))
+    with open(run_dir.joinpath(BUILD_TRACE_JSON), "w") as f:
+        json.dump(analysis, f, indent=True)
+
+
+def read_summary(run_dir: Path, build_trace_gz: Path) -> dict[str, any]:
+    """
+    Reads the summary of the analysis of `build_trace_gz`, analyzing it first
+    if needed, e.g. for runs archived before the analysis existed.
+    """
+    analysis_json = run_dir.joinpath(BUILD_TRACE_JSON)
+    if not analysis_json.exists():
+        if not build_trace_gz.exists():
+            return {}
+        try:
+            write_analysis(build_trace_gz, run_dir)
+        except (OSError, EOFError, zlib.error) as e:
+            logging.warning("could not read %s: %s", build_trace_gz, e)
+            return {}
+    with open(analysis_json) as f:
+        return json.load(f).get("summary", {})
@@ -0,0 +1,150 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import gzip
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import build_trace
+
+
+def b(name: str, ts: int, tid: int = 0) -> dict:
+    return {"name": name, "ph": "B", "ts": ts, "pid": 0, "tid": tid}
+
+
+def e(ts: int, tid: int = 0) -> dict:
+    return {"ph": "E", "ts": ts, "pid": 0, "tid": tid}
+
+
+def x(name: str, ts: int, dur: int, tid: int = 0) -> dict:
+    return {"name": name, "ph": "X", "ts": ts, "dur": dur, "pid": 0, "tid": tid}
+
+
+# soong_ui [0, 100)
+#   soong_build [10, 40)
+#     bp2build [10, 20)
+#   kati [40, 60)
+#   ninja [70, 100)
+# ninja action on another thread [70, 90)
+# soong_ui [110, 120)
+EVENTS = [
+    {"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "soong_ui"}},
+    b("soong_ui", 0),
+    b("soong_build", 10),
+    x("bp2build", 10, 10),
+    e(40),
+    b("kati", 40),
+    e(60),
+    b("ninja", 70),
+    x("out/a.o", 70, 20, tid=1),
+    e(100),
+    e(100),
+    b("soong_ui", 110),
+    e(120),
+]
+
+
+def trace(events: list[dict], closed: bool = True) -> str:
+    s = "[\n" + "".join(f"{json.dumps(ev)},\n" for ev in events)
+    return s + "{}]\n" if closed else s
+
+
+class BuildTraceTest(unittest.TestCase):
+    def test_iter_events_across_blocks(self):
+        with mock.patch.object(build_trace, "_READ_SIZE", 7):
+            events = list(build_trace.iter_events(io.StringIO(trace(EVENTS))))
+        self.assertEqual(events, EVENTS + [{}])
+
+    def test_iter_events_unterminated(self):
+        text = trace(EVENTS, closed=False) + '{"ph": "B"'
+        with self.assertLogs(level="WARNING"):
+            events = list(build_trace.iter_events(io.StringIO(text)))
+        self.assertEqual(events, EVENTS)
+
+    def test_iter_events_malformed(self):
+        good = trace(EVENTS, closed=False)
+        text = good + '{"ph": "B", "ts": oops},\n' + good[2:] + "{}]\n"
+        for max_event_size in (1 << 20, 128):
+            with self.subTest(max_event_size=max_event_size), mock.patch.object(
+                build_trace, "_READ_SIZE", 7
+            ), mock.patch.object(build_trace, "_MAX_EVENT_SIZE", max_event_size):
+                with self.assertLogs(level="WARNING"):
+                    events = list(build_trace.iter_events(io.StringIO(text)))
+                self.assertEqual(events, EVENTS + EVENTS + [{}])
+
+    def test_read_phases(self):
+        phases = build_trace.read_phases(io.StringIO(trace(EVENTS)))
+        self.assertEqual([p.name for p in phases], ["soong_ui", "soong_ui"])
+        self.assertEqual(
+            [c.name for c in phases[0].children], ["soong_build", "kati", "ninja"]
+        )
+        self.assertEqual(
+            build_trace.self_times(phases),
+            {
+                "soong_ui": 30,
+                "soong_ui/soong_build": 20,
+                "soong_ui/soong_build/bp2build": 10,
+                "soong_ui/kati": 20,
+                "soong_ui/ninja": 30,
+            },
+        )
+
+    def test_unfinished_phase(self):
+        with self.assertLogs(level="WARNING"):
+            phases = build_trace.read_phases(io.StringIO(trace(EVENTS[:9])))
+        self.assertEqual(phases[0].end, 90)
+        self.assertEqual(phases[0].children[-1].name, "ninja")
+
+    def test_critical_path_and_idle_gaps(self):
+        phases = build_trace.read_phases(io.StringIO(trace(EVENTS)))
+        self.assertEqual(
+            [name for name, _ in build_trace.critical_path(phases)],
+            [
+                "soong_ui/soong_build/bp2build",
+                "soong_ui/kati",
+                "soong_ui/ninja",
+                "soong_ui",
+            ],
+        )
+        self.assertEqual(build_trace.idle_gaps(phases), [(100, 110)])
+
+    def test_read_summary(self):
+        with tempfile.TemporaryDirectory() as d:
+            run_dir = Path(d)
+            trace_gz = run_dir.joinpath("build.trace.gz")
+            self.assertEqual(build_trace.read_summary(run_dir, trace_gz), {})
+            with gzip.open(trace_gz, "wt") as f:
+                f.write(trace(EVENTS))
+            summary = build_trace.read_summary(run_dir, trace_gz)
+            self.assertTrue(run_dir.joinpath(build_trace.BUILD_TRACE_JSON).exists())
+        self.assertEqual(summary["trace.wall"], "00:00.000")
+        self.assertIn("trace/soong_ui/kati", summary)
+
+    def test_read_summary_corrupt(self):
+        with tempfile.TemporaryDirectory() as d:
+            run_dir = Path(d)
+            trace_gz = run_dir.joinpath("build.trace.gz")
+            data = gzip.compress(trace(EVENTS * 100).encode())
+            # a truncated file, and one with corrupt compressed data
+            for corrupt in (data[: len(data) // 2], data[:20] + b"\xff" * 64):
+                trace_gz.write_bytes(corrupt)
+                with self.assertLogs(level="WARNING"):
+                    self.assertEqual(build_trace.read_summary(run_dir, trace_gz), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -12,30 +12,42 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import argparse
+import concurrent.futures
 import functools
+import json
 import logging
 import os
 import re
-import shutil
+import time
 import uuid
 from pathlib import Path
 from string import Template
-from typing import Callable, Generator, Iterable
+from typing import Callable, Final, Generator, Iterable
 from typing import NewType
 from typing import Optional
 from typing import TextIO
+from typing import TypeVar
 
 import cuj
 import util
 from cuj import src
 from go_allowlists import GoAllowlistManipulator
+from snapshot import Snapshot
 
 _ALLOWLISTS = "build/soong/android/allowlists/allowlists.go"
+# bumped whenever the format of the template index changes
+_INDEX_VERSION: Final[int] = 1
+# files modified this close to indexing may be modified again without their
+# mtime changing, given the timestamp granularity of some filesystems
+_RACY_NS: Final[int] = 2_000_000_000
+# directories that never have Android.bp files of interest
+_IGNORED_DIRS: Final[frozenset[str]] = frozenset({".git", ".repo"})
 
 ModuleType = NewType("ModuleType", str)
 ModuleName = NewType("ModuleName", str)
 
 Filter = Callable[[ModuleType, ModuleName], bool]
+R = TypeVar("R")
 
 
 def module_defs(src_lines: TextIO) -> Generator[tuple[ModuleType, str], None, None]:
@@ -98,6 +110,20 @@ def _modify_genrule_template(module_name: ModuleName, module_def: str) -> Option
     return f"{module_def[: index]}-${{suffix}}{module_def[index:]}"
 
 
+# assume `name` only occurs as top-level property of a module
+_NAME_PATTERN = re.compile(r'[\n\r]\s+name:\s*"(?P<name>[^"]+)(?=")', re.MULTILINE)
+
+
+def module_names(src_lines: TextIO) -> list[tuple[ModuleType, ModuleName]]:
+    """:return: the types and names of the named modules in an Android.bp file"""
+    result = []
+    for module_type, module_def in module_defs(src_lines):
+        m = _NAME_PATTERN.search(module_def)
+        if m:
+            result.append((module_type, ModuleName(m.group("name"))))
+    return result
+
+
 def _extract_templates_helper(
     src_lines: TextIO, f: Filter
 ) -> dict[ModuleName, Template]:
@@ -106,11 +132,9 @@ def _extract_templates_helper(
     Filter `f` and for each such mach return a "template" text that facilitates
     changing the module's name.
     """
-    # assume `name` only occurs as top-level property of a module
-    name_pattern = re.compile(r'[\n\r]\s+name:\s*"(?P<name>[^"]+)(?=")', re.MULTILINE)
     result = dict[ModuleName, Template]()
     for module_type, module_def in module_defs(src_lines):
-        m = name_pattern.search(module_def)
+        m = _NAME_PATTERN.search(module_def)
         if not m:
             continue
         module_name = ModuleName(m.group("name"))
@@ -131,6 +155,100 @@ def _extract_templates_helper(
     return result
 
 
+def _module_names_of(bp: Path) -> list[tuple[ModuleType, ModuleName]]:
+    with open(bp, "rt") as src_lines:
+        return module_names(src_lines)
+
+
+def _templates_of(
+    bp: Path, modules: set[tuple[ModuleType, ModuleName]]
+) -> dict[ModuleName, Template]:
+    with open(bp, "rt") as src_lines:
+        return _extract_templates_helper(src_lines, lambda t, n: (t, n) in modules)
+
+
+# fewer files than this are parsed serially as starting processes costs more
+_MIN_PARALLEL: Final[int] = 64
+
+
+def _map(fn: Callable[..., R], *iterables: Iterable) -> list[R]:
+    """`map` over a process pool for many items, as parsing is CPU-bound"""
+    items = list(zip(*iterables))
+    if len(items) < _MIN_PARALLEL:
+        return [fn(*item) for item in items]
+    with concurrent.futures.ProcessPoolExecutor() as pool:
+        chunksize = max(1, len(items) // (4 * (os.cpu_count() or 1)))
+        return list(pool.map(fn, *zip(*items), chunksize=chunksize))
+
+
+class TemplateIndex:
+    """
+    A persistent index of the modules in Android.bp files keyed by each file's
+    path, mtime and size, such that only the files that changed since a
+    previous CUJ are parsed again
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.reparsed = 0
+        """the number of files parsed by the last `modules()`"""
+        self._entries: dict[str, dict[str, any]] = {}
+        try:
+            with open(path, "rt") as f:
+                index = json.load(f)
+            if index.get("version") == _INDEX_VERSION:
+                self._entries = index["entries"]
+        except (OSError, ValueError):
+            pass
+
+    def modules(
+        self, bps: list[Path]
+    ) -> dict[Path, list[tuple[ModuleType, ModuleName]]]:
+        """:return: the types and names of the named modules of each file"""
+        racy_ns = time.time_ns() - _RACY_NS
+        stats = {bp: bp.stat() for bp in bps}
+        keys = {bp: [st.st_mtime_ns, st.st_size] for bp, st in stats.items()}
+        stale = [
+            bp for bp in bps if self._entries.get(str(bp), {}).get("key") != keys[bp]
+        ]
+        self.reparsed = len(stale)
+        parsed = dict(zip(stale, _map(_module_names_of, stale)))
+        for bp, modules in parsed.items():
+            if stats[bp].st_mtime_ns < racy_ns:
+                self._entries[str(bp)] = {"key": keys[bp], "modules": modules}
+            else:
+                self._entries.pop(str(bp), None)
+        for bp in bps:
+            if bp not in parsed:
+                parsed[bp] = [
+                    (ModuleType(t), ModuleName(n))
+                    for t, n in self._entries[str(bp)]["modules"]
+                ]
+        return parsed
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        with open(tmp, "wt") as f:
+            json.dump({"version": _INDEX_VERSION, "entries": self._entries}, f)
+        os.replace(tmp, self.path)
+
+
+def _find_bps(root: Path) -> Generator[Path, None, None]:
+    if root.name == "Android.bp":
+        yield root
+    out_dir = str(util.get_out_dir())
+    for d, dirs, files in os.walk(root):
+        # prune rather than skip the subtrees that can't have sources
+        dirs[:] = [
+            sub
+            for sub in dirs
+            if sub not in _IGNORED_DIRS and os.path.join(d, sub) != out_dir
+        ]
+        if "Android.bp" in files:
+            yield Path(d).joinpath("Android.bp")
+
+
 def _extract_templates(
     bps: dict[Path, Filter]
 ) -> dict[Path, dict[ModuleName, Template]]:
@@ -138,41 +256,59 @@ def _extract_templates(
     If any key is a directory instead of an Android.bp file, expand it is as if it
     were the glob pattern $key/**/Android.bp, i.e. replace it with all Android.bp
     files under its tree.
+    The modules of each file are indexed in parallel and persisted such that
+    only the files that changed since are parsed again by subsequent CUJs.
     """
     bp2templates = dict[Path, dict[ModuleName, Template]]()
     with open(src(_ALLOWLISTS), "rt") as af:
         go_allowlists = GoAllowlistManipulator(af.readlines())
         alwaysconvert = go_allowlists.locate("Bp2buildModuleAlwaysConvertList")
 
-    def maybe_register(bp: Path):
-        with open(bp, "rt") as src_lines:
-            templates = _extract_templates_helper(src_lines, fltr)
-            if not go_allowlists.is_dir_allowed(bp.parent):
-                templates = {n: v for n, v in templates.items() if n in alwaysconvert}
-            if len(templates) == 0:
+    found = {k: list(_find_bps(k)) for k in bps}
+    index = TemplateIndex(_template_index_path())
+    bp2modules = index.modules(
+        list(dict.fromkeys(bp for v in found.values() for bp in v))
+    )
+    logging.info("Parsed %d of %d Android.bp files", index.reparsed, len(bp2modules))
+    index.save()
+
+    # the matching modules of each file, in the order of `bps`
+    matches = dict[Path, set[tuple[ModuleType, ModuleName]]]()
+    for k, fltr in bps.items():
+        for bp in found[k]:
+            modules = {(t, n) for t, n in bp2modules[bp] if fltr(t, n)}
+            if len(modules) == 0:
                 logging.debug("No matches in %s", k)
             else:
-                bp2templates[bp] = bp2templates.get(bp, {}) | templates
+                matches[bp] = matches.get(bp, set()) | modules
 
-    for k, fltr in bps.items():
-        if k.name == "Android.bp":
-            maybe_register(k)
-        for root, _, _ in os.walk(k):
-            if Path(root).is_relative_to(util.get_out_dir()):
-                continue
-            file = Path(root).joinpath("Android.bp")
-            if file.exists():
-                maybe_register(file)
+    for bp, templates in zip(matches, _map(_templates_of, matches, matches.values())):
+        if not go_allowlists.is_dir_allowed(bp.parent):
+            templates = {n: v for n, v in templates.items() if n in alwaysconvert}
+        if len(templates) == 0:
+            logging.debug("No matches in %s", bp)
+        else:
+            bp2templates[bp] = templates
 
     return bp2templates
 
 
+@functools.cache
+def _template_index_path() -> Path:
+    return util.get_out_dir().joinpath("clone-cuj-templates.json")
+
+
 @functools.cache
 def _back_up_path() -> Path:
     #  a directory to back up files that these CUJs change
     return util.get_out_dir().joinpath("clone-cuj-backup")
 
 
+@functools.cache
+def _snapshot() -> Snapshot:
+    return Snapshot(_back_up_path(), util.get_top_dir())
+
+
 def _backup(bps: Iterable[Path]):
     # if first cuj_step then back up files to restore later
     if _back_up_path().exists():
@@ -182,27 +318,27 @@ def _backup(bps: Iterable[Path]):
             f"Delete {_back_up_path()} and revert changes to "
             f"allowlists.go and Android.bp files"
         )
-    for bp in bps:
-        src_path = bp.relative_to(util.get_top_dir())
-        bak_file = _back_up_path().joinpath(src_path)
-        os.makedirs(os.path.dirname(bak_file))
-        shutil.copy(bp, bak_file)
-    src_allowlists = src(_ALLOWLISTS)
-    bak_allowlists = _back_up_path().joinpath(_ALLOWLISTS)
-    os.makedirs(os.path.dirname(bak_allowlists))
-    shutil.copy(src_allowlists, bak_allowlists)
+    _snapshot().take([*bps, src(_ALLOWLISTS)])
 
 
 def _restore():
-    src(_ALLOWLISTS).touch(exist_ok=True)
-    for root, _, files in os.walk(_back_up_path()):
-        for file in files:
-            bak_file = Path(root).joinpath(file)
-            bak_path = bak_file.relative_to(_back_up_path())
-            src_file = util.get_top_dir().joinpath(bak_path)
-            shutil.copy(bak_file, src_file)
-            # touch to update mtime; ctime is ignored by ninja
-            src_file.touch(exist_ok=True)
+    restored = _snapshot().restore()
+    logging.info(
+        "Restored %d of %d files from %s",
+        len(restored),
+        len(_snapshot().entries()),
+        _back_up_path(),
+    )
+
+
+def _restore_and_delete():
+    _restore()
+    if differing := _snapshot().verify():
+        raise RuntimeError(
+            f"{len(differing)} files differ from their backup in "
+            f"{_back_up_path()} after restoring them, e.g. {differing[0]}"
+        )
+    _snapshot().delete()
 
 
 def _bz_counterpart(bp: Path) -> Path:
@@ -257,30 +393,29 @@ def _make_clones(bp2templates: dict[Path, dict[ModuleName, Template]], n: int):
 
 
 def _display_sizes():
+    if not _snapshot().exists():
+        return
     file_count = 0
     orig_tot = 0
     curr_tot = 0
     output = ["\n"]
-    for root, _, files in os.walk(_back_up_path()):
-        file_count += len(files)
-        for file in files:
-            backup_file = Path(root).joinpath(file)
-            common_path = backup_file.relative_to(_back_up_path())
-            source_file = util.get_top_dir().joinpath(common_path)
-            curr_size = os.stat(source_file).st_size
-            curr_tot += curr_size
-            orig_size = os.stat(backup_file).st_size
-            orig_tot += orig_size
+    for common_path, entry in _snapshot().entries().items():
+        file_count += 1
+        source_file = util.get_top_dir().joinpath(common_path)
+        curr_size = os.stat(source_file).st_size
+        curr_tot += curr_size
+        orig_size = entry.size
+        orig_tot += orig_size
+        output.append(
+            f"{orig_size:7,} {curr_size - orig_size :+5,} => {curr_size:9,} "
+            f"bytes {source_file.relative_to(util.get_top_dir())}"
+        )
+        if source_file.name == "Android.bp":
+            bz = _bz_counterpart(source_file)
             output.append(
-                f"{orig_size:7,} {curr_size - orig_size :+5,} => {curr_size:9,} "
-                f"bytes {source_file.relative_to(util.get_top_dir())}"
+                f"{os.stat(bz).st_size:8,} bytes "
+                f"$OUTDIR/{bz.relative_to(util.get_out_dir())}"
             )
-            if file == "Android.bp":
-                bz = _bz_counterpart(source_file)
-                output.append(
-                    f"{os.stat(bz).st_size:8,} bytes "
-                    f"$OUTDIR/{bz.relative_to(util.get_out_dir())}"
-                )
     logging.info(
         f"Affected {file_count} files {orig_tot:,} "
         f"{curr_tot - orig_tot:+,} => {curr_tot:,} bytes"
@@ -299,11 +434,28 @@ def _name_cuj(count: int, module_count: int, bp_count: int) -> str:
     return name
 
 
+def sweep_counts(largest: int) -> list[int]:
+    """:return: the powers of 2 up to `largest`, e.g. 1, 2, 4, 8 for 8 or 10"""
+    return [1 << i for i in range(largest.bit_length())]
+
+
 class Clone(cuj.CujGroup):
     def __init__(self, group_name: str, bps: dict[Path, Filter]):
         super().__init__(group_name)
         self.bps = bps
 
+    def counts(self) -> list[int]:
+        """:return: the numbers of clones of each module, one per CUJ step"""
+        if "CLONE" in os.environ:
+            return [int(s) for s in os.environ["CLONE"].split(",")]
+        counts = [1, 100, 200, 300, 400]
+        logging.info(
+            f'Will clone {",".join(str(i) for i in counts)} in cujs. '
+            f"You may specify alternative counts with CLONE env var, "
+            f"e.g. CLONE = 1,10,100,1000"
+        )
+        return counts
+
     def get_steps(self) -> Iterable[cuj.CujStep]:
         bp2templates = _extract_templates(self.bps)
         bp_count = len(bp2templates)
@@ -311,15 +463,7 @@ class Clone(cuj.CujGroup):
             raise RuntimeError(f"No eligible module to clone in {self.bps.keys()}")
         module_count = sum(len(templates) for templates in bp2templates.values())
 
-        if "CLONE" in os.environ:
-            counts = [int(s) for s in os.environ["CLONE"].split(",")]
-        else:
-            counts = [1, 100, 200, 300, 400]
-            logging.info(
-                f'Will clone {",".join(str(i) for i in counts)} in cujs. '
-                f"You may specify alternative counts with CLONE env var, "
-                f"e.g. CLONE = 1,10,100,1000"
-            )
+        counts = self.counts()
         first_bp = next(iter(bp2templates.keys()))
 
         def modify_bp():
@@ -346,15 +490,32 @@ class Clone(cuj.CujGroup):
                 steps.append(
                     cuj.CujStep(
                         verb="revert",
-                        apply_change=cuj.sequence(
-                            _restore, lambda: shutil.rmtree(_back_up_path())
-                        ),
+                        apply_change=_restore_and_delete,
                         verify=_display_sizes,
                     )
                 )
         return steps
 
 
+class CloneSweep(Clone):
+    """
+    Clones modules geometrically more times in each step, e.g. 1, 2, 4 ... 1024
+    times, such that `scaling.py` can fit how the build scales with the number
+    of modules
+    """
+
+    def counts(self) -> list[int]:
+        if "CLONE" in os.environ:
+            return super().counts()
+        largest = int(os.environ.get("CLONE_SWEEP", 1024))
+        counts = sweep_counts(largest)
+        logging.info(
+            f"Will clone {counts[0]} to {counts[-1]} times, doubling in each "
+            f"cuj. You may specify the largest count with CLONE_SWEEP env var"
+        )
+        return counts
+
+
 def main():
     """
     provided only for manual run;
@@ -11,14 +11,21 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+import tempfile
 import textwrap
 import unittest
 from io import StringIO
+from pathlib import Path
 
 from clone import ModuleName
+from clone import ModuleType
+from clone import TemplateIndex
 from clone import _extract_templates_helper
 from clone import module_defs
+from clone import module_names
 from clone import name_in
+from clone import sweep_counts
 from clone import type_in
 
 
@@ -124,6 +131,47 @@ class CloneTest(unittest.TestCase):
             ),
         )
 
+    def test_module_names(self):
+        self.assertEqual(
+            module_names(StringIO(self.bp)),
+            [(ModuleType("cc_library"), "a"), (ModuleType("genrule"), "b")],
+        )
+
+    def test_template_index(self):
+        with tempfile.TemporaryDirectory() as d:
+            a = Path(d).joinpath("a", "Android.bp")
+            b = Path(d).joinpath("b", "Android.bp")
+            for bp in (a, b):
+                bp.parent.mkdir()
+                bp.write_text(self.bp)
+                # as if written long enough ago to be cached
+                os.utime(bp, ns=(0, 0))
+            index_json = Path(d).joinpath("index.json")
+            index = TemplateIndex(index_json)
+            modules = index.modules([a, b])
+            self.assertEqual(index.reparsed, 2)
+            self.assertEqual(modules[a], module_names(StringIO(self.bp)))
+            index.save()
+
+            index = TemplateIndex(index_json)
+            self.assertEqual(index.modules([a, b]), modules)
+            self.assertEqual(index.reparsed, 0)
+
+            with open(b, "a") as f:
+                f.write('cc_binary {\n  name: "c",\n}\n')
+            modules = index.modules([a, b])
+            self.assertEqual(index.reparsed, 1)
+            self.assertEqual(modules[b][-1], ("cc_binary", "c"))
+            with self.subTest("recently modified files aren't cached"):
+                self.assertEqual(index.modules([a, b]), modules)
+                self.assertEqual(index.reparsed, 1)
+
+    def test_sweep_counts(self):
+        self.assertEqual(sweep_counts(1), [1])
+        self.assertEqual(sweep_counts(8), [1, 2, 4, 8])
+        self.assertEqual(sweep_counts(10), [1, 2, 4, 8])
+        self.assertEqual(len(sweep_counts(1024)), 11)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
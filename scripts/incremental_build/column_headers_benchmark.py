@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmarks ordering the event columns of metrics.csv over synthetic runs, each
+of which records a random subset of a common chronology of events.
+"""
+import argparse
+import logging
+import random
+import time
+
+import perf_metrics
+
+
+def synthetic_rows(
+    runs: int, columns: int, events: int, swaps: int, seed: int = 0
+) -> list[dict[str, None]]:
+    """
+    :param swaps: the number of runs with two adjacent events swapped, i.e.
+    introducing cycles
+    """
+    rng = random.Random(seed)
+    chronology = [f"event.{i:06d}" for i in range(columns)]
+    rows = []
+    for i in range(runs):
+        row = sorted(rng.sample(range(columns), min(events, columns)))
+        if i < swaps and len(row) > 1:
+            j = rng.randrange(len(row) - 1)
+            row[j], row[j + 1] = row[j + 1], row[j]
+        rows.append(dict.fromkeys(chronology[k] for k in row))
+    return rows
+
+
+def benchmark(rows: list[dict[str, None]], allow_cycles: bool):
+    start = time.perf_counter()
+    headers = perf_metrics._get_column_headers(rows, allow_cycles=allow_cycles)
+    elapsed = time.perf_counter() - start
+    print(f"{len(headers)} columns over {len(rows)} runs: {elapsed:8.3f}s")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("--runs", type=int, default=500, help="%(default)s")
+    p.add_argument(
+        "--columns", type=int, default=20_000, help="distinct events, %(default)s"
+    )
+    p.add_argument(
+        "--events", type=int, default=2_000, help="events per run, %(default)s"
+    )
+    p.add_argument(
+        "--swaps",
+        type=int,
+        default=0,
+        help="runs with events out of order, i.e. with cycles, %(default)s",
+    )
+    options = p.parse_args()
+    rows = synthetic_rows(options.runs, options.columns, options.events, options.swaps)
+    benchmark(rows, allow_cycles=options.swaps > 0)
+
+
+if __name__ == "__main__":
+    logging.root.setLevel(logging.INFO)
+    main()
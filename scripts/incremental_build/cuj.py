@@ -14,16 +14,23 @@
 import abc
 import dataclasses
 import enum
+import io
 import logging
 import os
+import shutil
 from pathlib import Path
-from typing import Callable, Iterable, TypeAlias
+from typing import Callable, Iterable, Optional, TypeAlias
 
 import util
 from util import BuildType
 
 Action: TypeAlias = Callable[[], None]
 Verifier: TypeAlias = Callable[[], None]
+Undo: TypeAlias = list[dict[str, str]]
+"""
+actions that restore the files a step changes to their state before the CUJ
+group, see `restore()`
+"""
 
 
 def de_src(p: Path) -> str:
@@ -116,6 +123,12 @@ class CujStep:
     """post-build assertions, i.e. tests.
   Should raise `Exception` for failures.
   """
+    undo: Optional[Callable[[], Undo]] = None
+    """
+  called before `apply_change` for the journal, so that another process can
+  revert the CUJ group if it's interrupted; None for steps that can be
+  reverted by applying the remaining steps of their CUJ group
+  """
 
 
 class CujGroup(abc.ABC):
@@ -142,3 +155,39 @@ def sequence(*vs: Callable[[], None]) -> Callable[[], None]:
             v()
 
     return f
+
+
+def restore(undo: Undo):
+    """
+    Restores the files in `undo` whether the step that recorded it was applied,
+    partly applied or already reverted
+    """
+    for action in undo:
+        match action:
+            case {"remove": path}:
+                p = Path(path)
+                if p.is_dir() and not p.is_symlink():
+                    shutil.rmtree(p)
+                else:
+                    p.unlink(missing_ok=True)
+            case {"rename": path, "to": to}:
+                if Path(path).exists():
+                    Path(path).rename(to)
+            case {"truncate": path, "suffix": suffix}:
+                # only if the step appended the suffix before it was interrupted
+                suffix = suffix.encode()
+                with open(path, "rb+") as f:
+                    size = f.seek(0, io.SEEK_END)
+                    if size >= len(suffix):
+                        f.seek(size - len(suffix))
+                        if f.read() == suffix:
+                            f.truncate(size - len(suffix))
+            case {"write": path, "text": text}:
+                p = Path(path)
+                if p.is_dir() and not p.is_symlink():
+                    shutil.rmtree(p)
+                elif p.exists() and p.read_text() == text:
+                    continue
+                p.write_text(text)
+            case _:
+                raise ValueError(f"unknown undo action {action}")
@@ -95,7 +95,14 @@ class Modify(CujGroup):
                 f.seek(-len(self.text), io.SEEK_END)
                 f.truncate()
 
-        return [CujStep("", add_line), CujStep("revert", revert)]
+        return [
+            CujStep(
+                "",
+                add_line,
+                undo=lambda: [{"truncate": str(self.file), "suffix": self.text}],
+            ),
+            CujStep("revert", revert, undo=lambda: []),
+        ]
 
 
 class Create(CujGroup):
@@ -111,7 +118,9 @@ class Create(CujGroup):
 
     def __init__(self, file: Path, ws: InWorkspace, text: Optional[str] = None):
         super().__init__(f"create {de_src(file)}")
-        if file.exists():
+        # until the journal is read a resumed session can't tell whether an
+        # interrupted run of this CUJ created the file, see `incremental_build._revert()`
+        if file.exists() and not util.RESUMING:
             raise RuntimeError(
                 f"File {file} already exists. Interrupted an earlier run?\n"
                 "TIP: `repo status` and revert changes!!!"
@@ -138,9 +147,20 @@ class Create(CujGroup):
             else:
                 self.file.unlink(missing_ok=False)
 
+        created = shallowest_missing_dir or self.file
         return [
-            CujStep("", create, self.ws.verifier(self.file)),
-            CujStep("revert", delete, InWorkspace.OMISSION.verifier(self.file)),
+            CujStep(
+                "",
+                create,
+                self.ws.verifier(self.file),
+                lambda: [{"remove": str(created)}],
+            ),
+            CujStep(
+                "revert",
+                delete,
+                InWorkspace.OMISSION.verifier(self.file),
+                lambda: [],
+            ),
         ]
 
 
@@ -192,11 +212,13 @@ class Delete(CujGroup):
                 "",
                 move_to_tempdir_to_mimic_deletion,
                 InWorkspace.OMISSION.verifier(self.original),
+                lambda: [{"rename": str(copied), "to": str(self.original)}],
             ),
             CujStep(
                 "revert",
                 lambda: copied.rename(self.original),
                 self.ws.verifier(self.original),
+                lambda: [],
             ),
         ]
 
@@ -231,8 +253,18 @@ class ReplaceFileWithDir(CujGroup):
             self.p.write_text(original_text)
 
         return [
-            CujStep(f"", replace_it, create_dir.verify),
-            CujStep(f"revert", revert, InWorkspace.SYMLINK.verifier(self.p)),
+            CujStep(
+                f"",
+                replace_it,
+                create_dir.verify,
+                lambda: [{"write": str(self.p), "text": self.p.read_text()}],
+            ),
+            CujStep(
+                f"revert",
+                revert,
+                InWorkspace.SYMLINK.verifier(self.p),
+                lambda: [],
+            ),
         ]
 
 
@@ -281,11 +313,13 @@ class ModifyKeptBuildFile(CujGroup):
                 step1.verb,
                 step1.apply_change,
                 cuj.sequence(step1.verify, merge_prover),
+                step1.undo,
             ),
             CujStep(
                 step2.verb,
                 step2.apply_change,
                 cuj.sequence(step2.verify, merge_disprover),
+                step2.undo,
             ),
         ]
 
@@ -317,11 +351,13 @@ class CreateKeptBuildFile(CujGroup):
                 step1.verb,
                 step1.apply_change,
                 cuj.sequence(step1.verify, merge_prover),
+                step1.undo,
             ),
             CujStep(
                 step2.verb,
                 step2.apply_change,
                 cuj.sequence(step2.verify, merge_disprover),
+                step2.undo,
             ),
         ]
 
@@ -344,8 +380,8 @@ class CreateUnkeptBuildFile(CujGroup):
         assert len(tail) == 0
         _, merge_disprover = content_verfiers(ws_build_file, content)
         return [
-            CujStep(step1.verb, step1.apply_change, merge_disprover),
-            CujStep(step2.verb, step2.apply_change, merge_disprover),
+            CujStep(step1.verb, step1.apply_change, merge_disprover, step1.undo),
+            CujStep(step2.verb, step2.apply_change, merge_disprover, step2.undo),
         ]
 
 
@@ -397,6 +433,10 @@ def _cloning_cujs() -> tuple[CujGroup, ...]:
                 src("packages/modules/NeuralNetworks/runtime/Android.bp"): libNN,
             },
         ),
+        clone.CloneSweep(
+            "scale adbd clones",
+            {src("packages/modules/adb/Android.bp"): clone.name_in("adbd")},
+        ),
     )
 
 
@@ -407,13 +447,18 @@ def get_cujgroups() -> tuple[CujGroup, ...]:
     # we can't tell if ShouldKeepExistingBuildFile would be True or not
     non_empty_dir = "*/*"
     pkg = src("art")
-    finder.confirm(pkg, non_empty_dir, "Android.bp", "!BUILD*")
     pkg_free = src("bionic/docs")
-    finder.confirm(pkg_free, non_empty_dir, "!**/Android.bp", "!**/BUILD*")
     ancestor = src("bionic")
-    finder.confirm(ancestor, "**/Android.bp", "!Android.bp", "!BUILD*")
     leaf_pkg_free = src("bionic/build")
-    finder.confirm(leaf_pkg_free, f"!{non_empty_dir}", "!**/Android.bp", "!**/BUILD*")
+    # an interrupted CUJ may have created an Android.bp in these until the
+    # resumed session reverts it
+    if not util.RESUMING:
+        finder.confirm(pkg, non_empty_dir, "Android.bp", "!BUILD*")
+        finder.confirm(pkg_free, non_empty_dir, "!**/Android.bp", "!**/BUILD*")
+        finder.confirm(ancestor, "**/Android.bp", "!Android.bp", "!BUILD*")
+        finder.confirm(
+            leaf_pkg_free, f"!{non_empty_dir}", "!**/Android.bp", "!**/BUILD*"
+        )
 
     android_bp_cujs = (
         Modify(src("Android.bp")),
@@ -45,7 +45,14 @@ class RegexModify(CujGroup):
         def revert():
             self.file.write_text(original_text)
 
-        return [CujStep("", modify), CujStep("revert", revert)]
+        return [
+            CujStep(
+                "",
+                modify,
+                undo=lambda: [{"write": str(self.file), "text": self.file.read_text()}],
+            ),
+            CujStep("revert", revert, undo=lambda: []),
+        ]
 
 
 def modify_private_method(file: Path) -> CujGroup:
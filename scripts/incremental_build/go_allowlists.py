@@ -24,55 +24,72 @@ class Defaults:
     recurse: bool
 
 
-@dataclasses.dataclass(frozen=True)
 class GoAllowlistManipulator:
     """
     This is a bare-bones regex-based utility for manipulating `allowlists.go`
     It expects that file to be propertly formatted.
+    Items prepended to lists are held back and spliced into the source code
+    lines in a single pass when `lines` is next read, such that prepending to
+    lists many times doesn't shift the lines that follow each time.
     """
 
-    lines: list[str]
-    """the source code lines of `allowlists.go`"""
-    _lists: dict[str, "GoList"] = dataclasses.field(default_factory=lambda: {})
-    """
-    All GoList instances retrieved via `locate()` indexed by their list names.
-    This dict is kept around such that any list when modified can adjust the
-    line numbers of all other lists appropriately
-    """
-    dir_defaults: dict[Path, Defaults] = dataclasses.field(default_factory=lambda: {})
-    """
-    the mappings from directories to whether they are bp2build allowed or not
-    """
-
-    def __post_init__(self):
+    def __init__(self, lines: list[str]):
+        self._lines = lines
+        self._lists: dict[str, "GoList"] = {}
+        """
+        All GoList instances retrieved via `locate()` indexed by their list names.
+        This dict is kept around such that any list when modified can adjust the
+        line numbers of all other lists appropriately
+        """
+        self.dir_defaults: dict[Path, Defaults] = {}
+        """
+        the mappings from directories to whether they are bp2build allowed or not
+        """
         #  reads the Bp2BuildConfig to materialize `dir_defaults`
         start = re.compile(r"\w+\s*=\s*Bp2BuildConfig\{")
         entry = re.compile(
             r'"(?P<path>[^"]+)"\s*:\s*Bp2BuildDefault(?P<allowed>True|False)(?P<recurse>Recursively)?'
         )
         begun = False
-        left_pad: str = ""
-        for line in self.lines:
+        for line in self._lines:
             line = line.strip()
             if not begun:
                 begun = bool(start.match(line))
             elif line == "}":
                 break
             else:
-                real_item = line.strip()
-                m = entry.search(real_item)
+                m = entry.search(line)
                 if m:
                     key = Path(m.group("path"))
                     value = Defaults(
                         m.group("allowed") == "True", bool(m.group("recurse"))
                     )
                     self.dir_defaults[key] = value
-                    if left_pad == "":
-                        left_pad = line[: line.index(real_item)]
-
         else:
             raise RuntimeError("Bp2BuildConfig missing")
 
+    @property
+    def lines(self) -> list[str]:
+        """the source code lines of `allowlists.go`, including prepended items"""
+        pending = sorted(
+            (go_list for go_list in self._lists.values() if go_list.pending),
+            key=lambda go_list: go_list._begin,
+        )
+        if pending:
+            begins = {name: go_list.begin for name, go_list in self._lists.items()}
+            lines = []
+            prev = 0
+            for go_list in pending:
+                lines.extend(self._lines[prev : go_list._begin])
+                lines.extend(go_list._flush())
+                prev = go_list._begin
+            lines.extend(self._lines[prev:])
+            # in place, as callers may hold on to the list
+            self._lines[:] = lines
+            for name, go_list in self._lists.items():
+                go_list._begin = begins[name]
+        return self._lines
+
     def locate(self, listname: str) -> "GoList":
         if listname in self._lists:
             return self._lists[listname]
@@ -110,28 +127,66 @@ class GoAllowlistManipulator:
         return self._lists
 
 
-@dataclasses.dataclass
 class GoList:
-    parent: GoAllowlistManipulator
-    begin: int
-    end: int
-    left_pad: str = ""
+    """
+    A `[]string` list of `allowlists.go`, whose items are parsed once into an
+    ordered set for constant time membership tests
+    """
+
+    _ITEM = re.compile(r'"([^"]*)"')
+
+    def __init__(
+        self, parent: GoAllowlistManipulator, begin: int, end: int, left_pad: str = ""
+    ):
+        self.parent = parent
+        self._begin = begin
+        """the first line in `parent.lines` excluding pending prepends"""
+        self._length = end - begin
+        self.left_pad = left_pad
+        self._items: dict[str, None] = {
+            item: None
+            for line in parent.lines[begin:end]
+            for item in self._ITEM.findall(line)
+        }
+        self._pending: list[list[str]] = []
+        """blocks of items prepended since `parent.lines` was last read"""
+        self._shifted = 0
+        """the number of pending prepended items of this list"""
+
+    @property
+    def pending(self) -> bool:
+        return self._shifted > 0
+
+    @property
+    def begin(self) -> int:
+        """the first line of the list were pending prepends spliced in"""
+        return self._begin + sum(
+            go_list._shifted
+            for go_list in self.parent.lists.values()
+            if go_list._begin < self._begin
+        )
+
+    @property
+    def end(self) -> int:
+        return self.begin + self._length
 
     def __contains__(self, item: str) -> bool:
-        quoted = f'"{item}"'
-        for i in range(self.begin, self.end):
-            if quoted in self.parent.lines[i]:
-                return True
-        return False
+        return item in self._items
 
     def prepend(self, items: list[str]):
-        clones = [f'{self.left_pad}"{i}",\n' for i in items]
-        self.parent.lines[self.begin : self.begin] = clones
-        growth = len(items)
-        self.end += growth
-        for go_list in self.parent.lists.values():
-            #  adjust line numbers for all subsequent lists
-            #  in the source code
-            if go_list.begin > self.begin:
-                go_list.begin += growth
-                go_list.end += growth
+        self._pending.append(items)
+        self._shifted += len(items)
+        self._length += len(items)
+        for item in items:
+            self._items[item] = None
+
+    def _flush(self) -> list[str]:
+        """:return: the lines of the pending items, emptying them"""
+        lines = [
+            f'{self.left_pad}"{i}",\n'
+            for items in reversed(self._pending)
+            for i in items
+        ]
+        self._pending.clear()
+        self._shifted = 0
+        return lines
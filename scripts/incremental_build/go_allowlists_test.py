@@ -79,6 +79,54 @@ class GoListLocatorTest(unittest.TestCase):
             self.assertEqual(begin, empty.begin)
             self.assertEqual(end, empty.end)
 
+    def test_batched_prepends(self):
+        empty = self.allowlists.locate("empty")
+        more = self.allowlists.locate("more")
+        more.prepend(["m-1"])
+        empty.prepend(["e-1", "e-2"])
+        more.prepend(["m-2", "m-3"])
+        empty.prepend(["e-3"])
+        self.assertTrue("m-3" in more)
+        self.assertFalse("m-3" in empty)
+        self.assertEqual((empty.begin, empty.end), (5, 8))
+        self.assertEqual((more.begin, more.end), (10, 15))
+        self.assertEqual(
+            "".join(self.allowlists.lines),
+            textwrap.dedent(
+                """\
+                import blah
+                package blue
+                type X
+                var (
+                  empty = []string{
+                "e-3",
+                "e-1",
+                "e-2",
+                  }
+                  more = []string{
+                    "m-2",
+                    "m-3",
+                    "m-1",
+                    "a",
+                    "b", // comment
+                  }
+                  Bp2buildDefaultConfig = Bp2BuildConfig{
+                    "some_dir": Bp2BuildDefaultFalse
+                  }
+                )
+                """
+            ),
+        )
+        with self.subTest("line numbers hold once the prepends are spliced in"):
+            self.assertEqual((empty.begin, empty.end), (5, 8))
+            self.assertEqual((more.begin, more.end), (10, 15))
+            self.assertEqual(self.allowlists.lines[more.begin], '    "m-2",\n')
+            self.assertEqual(self.allowlists.lines[more.end], "  }\n")
+        with self.subTest("lists can be prepended to again"):
+            more.prepend(["m-4"])
+            self.assertEqual(self.allowlists.lines[more.begin], '    "m-4",\n')
+            self.assertEqual(self.original_size + 7, len(self.allowlists.lines))
+
 
 if __name__ == "__main__":
     unittest.main()
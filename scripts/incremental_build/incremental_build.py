@@ -15,39 +15,65 @@
 """
 A tool for running builds (soong or b) and measuring the time taken.
 """
+import concurrent.futures
 import datetime
 import enum
 import functools
-import hashlib
 import itertools
 import json
 import logging
+import math
 import os
 import shutil
 import subprocess
 import sys
 import textwrap
 import time
+from concurrent.futures import Future
 from pathlib import Path
+from typing import Callable
 from typing import Final
 from typing import Mapping
 from typing import Optional
 from typing import TextIO
+from typing import TypeVar
 
+import bazel_profile
+import clone
+import cuj
 import cuj_catalog
+import ninja_actions
+import ninja_fingerprint
+import page_cache
 import perf_metrics
 import pretty
+import scaling
+import stats
 import ui
 import util
+import workers
 from cuj import skip_for
+from ninja_fingerprint import SectionTracker
+from journal import Interrupted
+from journal import Journal
+from journal import Unit
+from ninja_log import NinjaLog
+from overhead import Overhead
+from resource_sampler import ResourceSampler
+from size_index import SizeIndex
+from size_index import Totals
 from util import BuildInfo
 from util import BuildResult
 from util import BuildType
 
 MAX_RUN_COUNT: Final[int] = 5
+# fewer repetitions give too unreliable an estimate of the variance
+MIN_REPEATS: Final[int] = 3
 BAZEL_PROFILES: Final[str] = "bazel_metrics"
 CQUERY_OUT: Final[str] = "soong/soong_injection/cquery.out"
 
+T = TypeVar("T")
+
 
 @functools.cache
 def _prepare_env() -> Mapping[str, str]:
@@ -73,23 +99,22 @@ def _prepare_env() -> Mapping[str, str]:
     return env
 
 
-def _new_action_count(actions_output: TextIO = None, previous_count=0) -> int:
-    """the new actions are written to `actions_output`"""
-    ninja_log_file = util.get_out_dir().joinpath(".ninja_log")
-    if not ninja_log_file.exists():
-        return 0
-    action_count: int = 0
-    with open(ninja_log_file, "r") as ninja_log:
-        for line in ninja_log:
-            # note "# ninja log v5" is the first line in `.nina_log`
-            if line.startswith("#"):
-                continue
-            action_count += 1
-            if actions_output and previous_count < action_count:
-                # second from last column is the file
-                print(line.split()[-2], file=actions_output)
-    delta = action_count - previous_count
-    return delta
+@functools.cache
+def _collector() -> concurrent.futures.ThreadPoolExecutor:
+    """a pool for collecting the metrics of each build"""
+    return concurrent.futures.ThreadPoolExecutor(thread_name_prefix="collector")
+
+
+@functools.cache
+def _session_overhead() -> Overhead:
+    """the tool's overhead over all builds of the session"""
+    return Overhead()
+
+
+@functools.cache
+def _ninja_log() -> NinjaLog:
+    """a single reader per session so that the log is never rescanned"""
+    return NinjaLog(util.get_out_dir().joinpath(".ninja_log"))
 
 
 def _recompact_ninja_log(f: TextIO):
@@ -113,19 +138,34 @@ def _recompact_ninja_log(f: TextIO):
     )
 
 
+def _build_file(target_product: str) -> Path:
+    return util.get_out_dir().joinpath(f"soong/build.{target_product}.ninja")
+
+
 def _build_file_sha(target_product: str) -> str:
-    build_file = util.get_out_dir().joinpath(f"soong/build.{target_product}.ninja")
-    if not build_file.exists():
-        return ""
-    with open(build_file, mode="rb") as f:
-        h = hashlib.sha256()
-        for block in iter(lambda: f.read(4096), b""):
-            h.update(block)
-        return h.hexdigest()[0:8]
+    return ninja_fingerprint.fingerprint(
+        _build_file(target_product), ui.get_user_input().ninja_fingerprint
+    )
+
+
+@functools.cache
+def _ninja_sections() -> SectionTracker:
+    """a single tracker per session to compare each build with the previous"""
+    return SectionTracker()
+
+
+def _write_ninja_sections(target_product: str, run_dir: Path):
+    changed = _ninja_sections().update(_build_file(target_product), run_dir)
+    if changed:
+        logging.info(
+            "%d sections of the ninja file changed, e.g. %s",
+            len(changed),
+            ", ".join(changed[:5]),
+        )
 
 
 def _build_file_size(target_product: str) -> int:
-    build_file = util.get_out_dir().joinpath(f"soong/build.{target_product}.ninja")
+    build_file = _build_file(target_product)
     return os.path.getsize(build_file) if build_file.exists() else 0
 
 
@@ -135,26 +175,31 @@ def _pretty_env(env: Mapping[str, str]) -> str:
     return "\n".join(env_copy)
 
 
-def _total_size(filetype: str) -> int | None:
+@functools.cache
+def _size_index(filetype: str) -> SizeIndex:
+    """a single index per session so that only changed directories are rescanned"""
     match filetype:
         case "Android.bp":
             top = util.get_top_dir().resolve()
-            out = util.get_out_dir().resolve()
-            ignore_out = f'-not -path "{out}" ' if out.is_relative_to(top) else ""
-            cmd = f'find {top} -name Android.bp {ignore_out} | xargs stat -L -c "%s"'
+            return SizeIndex(top, filetype, exclude=[util.get_out_dir().resolve()])
         case "BUILD.bazel":
             ws = util.get_out_dir().joinpath("soong", "workspace")
-            cmd = f'find {ws} -name BUILD.bazel | xargs stat -L -c "%s"'
+            return SizeIndex(ws, filetype)
         case _:
             raise RuntimeError(f"Android.bp or BUILD.bazel expected: {filetype}")
-    logging.debug(f"Running {cmd}")
-    p = subprocess.run(cmd, shell=True, text=True, capture_output=True)
-    if p.returncode:
-        logging.error(
-            "Failed to compute total size of %s files:\n%s", filetype, p.stderr
-        )
-        return None
-    return sum(int(line) for line in p.stdout.splitlines())
+
+
+def _total_size(filetype: str) -> Totals:
+    index = _size_index(filetype)
+    start = time.perf_counter()
+    totals = index.totals()
+    logging.debug(
+        "Sized %s files in %.1fs, rescanning %d directories",
+        filetype,
+        time.perf_counter() - start,
+        index.rescanned,
+    )
+    return totals or Totals(count=None, size=None)
 
 
 def _build(build_type: BuildType, run_dir: Path) -> BuildInfo:
@@ -177,53 +222,104 @@ def _build(build_type: BuildType, run_dir: Path) -> BuildInfo:
         return os.stat(cquery_out).st_size if cquery_out.exists() else None
 
     cquery_ts = get_cquery_ts()
+    ninja_log = _ninja_log()
     with open(logfile, mode="wt") as f:
-        action_count_before = _new_action_count()
-        if action_count_before > 0:
+        ninja_log.checkpoint()
+        if ninja_log.needs_recompaction():
             _recompact_ninja_log(f)
             f.flush()
-            action_count_before = _new_action_count()
+            ninja_log.checkpoint()
         f.write(
             f"Command: {cmd}\n"
             f"Environment Variables:\n"
             f'{textwrap.indent(_pretty_env(env), "  ")}\n\n\n'
         )
         f.flush()  # because we pass f to a subprocess, we want to flush now
+        cache_mode = ui.get_user_input().cache_mode
+        cache_resident = None
+        if cache_mode is not None:
+            with _session_overhead().step("page_cache"):
+                cache_resident = page_cache.prepare(
+                    cache_mode, util.get_top_dir(), util.get_out_dir()
+                )
         logging.info("Command: %s", cmd)
         logging.info('TIP: To view the log:\n  tail -f "%s"', logfile)
         start_ns = time.perf_counter_ns()
-        p = subprocess.run(
+        p = subprocess.Popen(
             cmd,
-            check=False,
             cwd=util.get_top_dir(),
             env=env,
             shell=False,
             stdout=f,
             stderr=f,
         )
+        with ResourceSampler(p.pid, ui.get_user_input().sample_interval) as sampler:
+            p.wait()
         elapsed_ns = time.perf_counter_ns() - start_ns
-        with open(run_dir.joinpath("new_ninja_actions.txt"), "w") as af:
-            action_count_delta = _new_action_count(af, action_count_before)
 
-    if get_cquery_ts() > cquery_ts:
-        shutil.copy(cquery_out, run_dir.joinpath("cquery.out"))
-        bazel_profiles = util.get_out_dir().joinpath(BAZEL_PROFILES)
-        if bazel_profiles.exists():
-            shutil.copytree(bazel_profiles, run_dir.joinpath(BAZEL_PROFILES))
+    # the following steps are independent I/O and so are overlapped
+    run_overhead = Overhead()
+    pool = _collector()
+
+    def collect(name: str, fn: Callable[..., T], *args) -> Future[T]:
+        return pool.submit(run_overhead.timed(name, fn), *args)
+
+    def write_ninja_actions() -> int:
+        new_ninja_actions = ninja_log.new_entries()
+        with open(run_dir.joinpath("new_ninja_actions.txt"), "w") as af:
+            for entry in new_ninja_actions:
+                print(entry.output, file=af)
+        ninja_actions.write_analysis(run_dir, new_ninja_actions)
+        return len(new_ninja_actions)
+
+    def copy_bazel_metrics():
+        if get_cquery_ts() > cquery_ts:
+            shutil.copy(cquery_out, run_dir.joinpath("cquery.out"))
+            bazel_profiles = util.get_out_dir().joinpath(BAZEL_PROFILES)
+            if bazel_profiles.exists():
+                shutil.copytree(bazel_profiles, run_dir.joinpath(BAZEL_PROFILES))
+                bazel_profile.write_analysis(run_dir.joinpath(BAZEL_PROFILES), run_dir)
+
+    collection_start = time.perf_counter()
+    futures = [collect("bazel_metrics", copy_bazel_metrics)]
+    if sampler.samples:
+        futures.append(collect("resources", sampler.write_samples, run_dir))
+    actions = collect("ninja_actions", write_ninja_actions)
+    build_ninja_hash = collect("build_ninja_hash", _build_file_sha, target_product)
+    if ui.get_user_input().ninja_sections:
+        futures.append(
+            collect(
+                "build_ninja_sections", _write_ninja_sections, target_product, run_dir
+            )
+        )
+    bp_totals = collect("bp_size", _total_size, "Android.bp")
+    bz_totals = collect("bz_size", _total_size, "BUILD.bazel")
+    futures.extend([actions, build_ninja_hash, bp_totals, bz_totals])
+    concurrent.futures.wait(futures)
+    run_overhead.add("collection", time.perf_counter() - collection_start)
+    for future in futures:
+        future.result()  # raises any failure
+    run_overhead.write(run_dir)
+    _session_overhead().merge(run_overhead)
 
     return BuildInfo(
-        actions=action_count_delta,
-        bp_size_total=_total_size("Android.bp"),
+        actions=actions.result(),
+        bp_count=bp_totals.result().count,
+        bp_size_total=bp_totals.result().size,
         build_type=build_type,
         build_result=BuildResult.FAILED if p.returncode else BuildResult.SUCCESS,
-        build_ninja_hash=_build_file_sha(target_product),
+        build_ninja_hash=build_ninja_hash.result(),
         build_ninja_size=_build_file_size(target_product),
-        bz_size_total=_total_size("BUILD.bazel"),
+        bz_count=bz_totals.result().count,
+        bz_size_total=bz_totals.result().size,
+        cache_mode=cache_mode.value if cache_mode else None,
+        cache_resident=cache_resident,
         cquery_out_size=get_cquery_size(),
         description="<placeholder>",
         product=f'{target_product}-{env["TARGET_BUILD_VARIANT"]}',
         targets=ui.get_user_input().targets,
         time=datetime.timedelta(microseconds=elapsed_ns / 1000),
+        **sampler.summary(),
     )
 
 
@@ -242,6 +338,49 @@ def _run_cuj(
     return build_info
 
 
+def _revert(interrupted: Interrupted):
+    """
+    Reverts the changes of an interrupted CUJ group from the undo data its
+    steps journaled, if they all did, and otherwise by applying the changes of
+    its remaining steps, without building, as the steps of a CUJ group restore
+    the source tree by design
+    """
+    undo = dict(interrupted.undo)
+    if interrupted.applied >= 0 and all(
+        step in undo for step in range(interrupted.applied + 1)
+    ):
+        logging.warning(
+            "Reverting the interrupted CUJ %s; ignore its %d completed runs: %s",
+            interrupted.unit.cujgroup,
+            len(interrupted.runs),
+            " ".join(interrupted.runs),
+        )
+        for step in reversed(range(interrupted.applied + 1)):
+            cuj.restore(undo[step])
+        return
+    groups = [cuj_catalog.Warmup, *cuj_catalog.get_cujgroups()]
+    group = next(
+        (g for g in groups if g.description == interrupted.unit.cujgroup), None
+    )
+    if group is None:
+        logging.critical(
+            "Can't revert the interrupted CUJ %s, it no longer exists; "
+            "revert its changes manually",
+            interrupted.unit.cujgroup,
+        )
+        sys.exit(1)
+    logging.warning(
+        "Reverting the interrupted CUJ %s; ignore its %d completed runs: %s",
+        group.description,
+        len(interrupted.runs),
+        " ".join(interrupted.runs),
+    )
+    util.CURRENT_BUILD_TYPE = BuildType[interrupted.unit.build_type]
+    for cujstep in list(group.get_steps())[interrupted.applied + 1 :]:
+        logging.info("Applying %s %s", cujstep.verb, group.description)
+        cujstep.apply_change()
+
+
 def _display(prop_regex: str):
     user_input = ui.get_user_input()
     metrics = user_input.log_dir.joinpath(util.METRICS_TABLE)
@@ -252,9 +391,26 @@ def _display(prop_regex: str):
         metrics,
         prop_regex,
         user_input.log_dir.joinpath("perf"),
+        agg=pretty.Aggregation.MEDIAN
+        if user_input.ci_target is None
+        else pretty.Aggregation.CI95,
     )
 
 
+def _report_scaling():
+    """reports the scaling of the clone sweeps among the chosen CUJ groups"""
+    user_input = ui.get_user_input()
+    if any(
+        isinstance(cuj_catalog.get_cujgroups()[i], clone.CloneSweep)
+        for i in user_input.chosen_cujgroups
+    ):
+        scaling.report(
+            user_input.log_dir.joinpath(util.METRICS_TABLE),
+            scaling.DEFAULT_PROPERTIES,
+            user_input.log_dir.joinpath("perf"),
+        )
+
+
 def main():
     """
     Run provided target(s) under various CUJs and collect metrics.
@@ -273,7 +429,8 @@ def main():
     logging.warning(
         textwrap.dedent(
             f"""\
-             If you kill this process, make sure to revert unwanted changes.
+             If you kill this process, make sure to revert unwanted changes,
+             e.g. with --resume which also skips the CUJs already completed.
              TIP: If you have no local changes of interest you may
                   `repo forall -p -c git reset --hard`  and
                   `repo forall -p -c git clean --force` and even
@@ -282,6 +439,28 @@ def main():
         )
     )
 
+    if user_input.worker_trees:
+        succeeded = workers.run(user_input)
+        perf_metrics.merge_worker_logs(user_input.log_dir)
+        perf_metrics.tabulate_metrics_csv(user_input.log_dir)
+        _display(r"^(?:time|bp2build|soong_build/\*\.bazel)$")
+        _report_scaling()
+        sys.exit(0 if succeeded else 1)
+
+    journal = Journal(user_input.log_dir)
+    completed: dict[Unit, dict[str, float]] = {}
+    if user_input.resume:
+        completed, interrupted = journal.read()
+        if interrupted:
+            _revert(interrupted)
+            journal.reverted(interrupted.unit)
+        # rebuild the CUJ groups for their checks of the source tree, which
+        # were skipped until the interrupted CUJ was reverted
+        util.RESUMING = False
+        cuj_catalog.get_cujgroups.cache_clear()
+        cuj_catalog.get_cujgroups()
+        logging.info("Resuming, %d CUJ groups already completed", len(completed))
+
     run_dir_gen = util.next_path(user_input.log_dir.joinpath(util.RUN_DIR_PREFIX))
 
     class StopBuilding(enum.Enum):
@@ -290,9 +469,45 @@ def main():
 
     stop_building: Optional[StopBuilding] = None
 
-    def run_cuj_group(cuj_group: cuj_catalog.CujGroup):
+    session_overhead = _session_overhead()
+    # a single thread so that reports are produced in order
+    reporter = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="reporter")
+    pending_reports: list[Future] = []
+
+    def report(display: bool):
+        def tabulate_and_display():
+            with session_overhead.step("tabulate"):
+                perf_metrics.tabulate_metrics_csv(user_input.log_dir)
+            if display:
+                with session_overhead.step("display"):
+                    _display("^time$")
+
+        pending_reports.append(reporter.submit(tabulate_and_display))
+
+    def wait_for_reports():
+        with session_overhead.step("wait_for_reports"):
+            for future in pending_reports:
+                future.result()
+        pending_reports.clear()
+
+    def run_cuj_group(
+        cuj_group: cuj_catalog.CujGroup, repeat: Optional[int] = None
+    ) -> dict[str, datetime.timedelta]:
+        """:return: the time of the first build after each step, by step"""
         nonlocal stop_building
-        for cujstep in cuj_group.get_steps():
+        # warmups are neither skipped nor need reverting
+        journaled = cuj_group != cuj_catalog.Warmup
+        unit = Unit(build_type.name, cuj_group.description, repeat)
+        if journaled and unit in completed:
+            logging.info("SKIPPING completed %s", unit)
+            return {
+                desc: datetime.timedelta(seconds=t)
+                for desc, t in completed[unit].items()
+            }
+        if journaled:
+            journal.started(unit)
+        times: dict[str, datetime.timedelta] = {}
+        for step, cujstep in enumerate(cuj_group.get_steps()):
             desc = cujstep.verb
             desc = f"{desc} {cuj_group.description}".strip()
             logging.info(
@@ -301,6 +516,13 @@ def main():
                 " ".join(user_input.targets),
                 desc,
             )
+            if journaled:
+                journal.applying(
+                    unit,
+                    step,
+                    cujstep.verb,
+                    cujstep.undo() if cujstep.undo else None,
+                )
             cujstep.apply_change()
 
             for run in itertools.count():
@@ -308,6 +530,8 @@ def main():
                     logging.warning("SKIPPING BUILD")
                     break
                 run_dir = next(run_dir_gen)
+                # reports may overlap applying a change but not a build
+                wait_for_reports()
 
                 build_info = _run_cuj(run_dir, build_type, cujstep)
                 build_info.description = (
@@ -316,6 +540,10 @@ def main():
                 build_info.warmup = cuj_group == cuj_catalog.Warmup
                 build_info.rebuild = run != 0
                 build_info.tag = user_input.tag
+                build_info.repeat = repeat
+                build_info.worker = user_input.worker_id
+                if run == 0 and build_info.build_result == BuildResult.SUCCESS:
+                    times[desc] = build_info.time
 
                 logging.info(json.dumps(build_info, indent=2, cls=util.CustomEncoder))
 
@@ -332,16 +560,59 @@ def main():
                     stop_building = StopBuilding.DUE_TO_ERROR
                     logging.critical(f"Build did not stabilize in {run} attempts")
 
-                perf_metrics.archive_run(run_dir, build_info)
-                perf_metrics.tabulate_metrics_csv(user_input.log_dir)
-                if cuj_group != cuj_catalog.Warmup and run == 0:
-                    _display("^time$")  # display intermediate results
+                with session_overhead.step("archive"):
+                    perf_metrics.archive_run(run_dir, build_info)
+                if journaled:
+                    journal.ran(unit, step, run_dir.name)
+                # display intermediate results
+                report(display=cuj_group != cuj_catalog.Warmup and run == 0)
 
                 if build_info.actions == 0:
                     # build has stabilized
                     break
         if stop_building == StopBuilding.DUE_TO_ERROR:
+            wait_for_reports()
             sys.exit(1)
+        if journaled:
+            journal.completed(unit, {k: t.total_seconds() for k, t in times.items()})
+        return times
+
+    def benchmark_cuj_group(cuj_group: cuj_catalog.CujGroup):
+        """
+        Repeats the CUJ group until the confidence intervals of the times of
+        all its steps are narrow enough or the budget is exhausted.
+        """
+        running: dict[str, stats.RunningStats] = {}
+        deadline = time.monotonic() + user_input.time_budget.total_seconds()
+        for repeat in itertools.count():
+            for desc, t in run_cuj_group(cuj_group, repeat).items():
+                running.setdefault(desc, stats.RunningStats()).add(t.total_seconds())
+            n = repeat + 1
+            widest = max(
+                (s.relative_ci_half_width() for s in running.values()),
+                default=math.inf,
+            )
+            if stop_building:
+                break
+            if n >= MIN_REPEATS and widest <= user_input.ci_target:
+                logging.info("CIs converged after %d repeats", n)
+                break
+            if n >= user_input.max_repeats:
+                logging.warning("CIs did not converge in %d repeats", n)
+                break
+            if time.monotonic() >= deadline:
+                logging.warning("CIs did not converge within the time budget")
+                break
+        for desc, s in running.items():
+            logging.info(
+                "%s: %s ±%s (95%% CI, N=%d)",
+                desc,
+                util.hhmmss(datetime.timedelta(seconds=s.mean), True),
+                util.hhmmss(datetime.timedelta(seconds=s.ci_half_width()), True)
+                if s.n > 1
+                else "?",
+                s.n,
+            )
 
     for build_type in user_input.build_types:
         util.CURRENT_BUILD_TYPE = build_type
@@ -349,8 +620,23 @@ def main():
         if user_input.chosen_cujgroups and not user_input.no_warmup:
             run_cuj_group(cuj_catalog.Warmup)
         for i in user_input.chosen_cujgroups:
-            run_cuj_group(cuj_catalog.get_cujgroups()[i])
+            if user_input.ci_target is None:
+                run_cuj_group(cuj_catalog.get_cujgroups()[i])
+            else:
+                benchmark_cuj_group(cuj_catalog.get_cujgroups()[i])
+    wait_for_reports()
+    reporter.shutdown()
+    _collector().shutdown()
     _display(r"^(?:time|bp2build|soong_build/\*\.bazel)$")
+    _report_scaling()
+    logging.info(
+        "Tool overhead by step (overlapping steps add up to more than the wall "
+        "time spent):\n%s",
+        "\n".join(
+            f"  {step}: {util.hhmmss(datetime.timedelta(seconds=t), True)}"
+            for step, t in session_overhead.steps().items()
+        ),
+    )
 
 
 class InfoAndBelow(logging.Filter):
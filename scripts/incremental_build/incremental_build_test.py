@@ -0,0 +1,115 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Callable
+from unittest import mock
+
+import cuj_catalog
+import cuj_regex_based
+import incremental_build
+from cuj import CujGroup
+from cuj import InWorkspace
+from journal import Journal
+from journal import Unit
+
+
+class RevertTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.top = Path(self.tmp.name).joinpath("top")
+        self.top.joinpath("a").mkdir(parents=True)
+        self.top.joinpath("a", "README.txt").write_text("read me\n")
+        self.top.joinpath("a", "Foo.java").write_text(
+            "class Foo {\n  private static boolean foo() {\n    return true;\n  }\n}\n"
+        )
+        self.log_dir = Path(self.tmp.name).joinpath("logs")
+        patcher = mock.patch("util.get_top_dir", return_value=self.top)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def tree(self) -> dict[str, str]:
+        return {
+            str(p.relative_to(self.top)): "" if p.is_dir() else p.read_text()
+            for p in sorted(self.top.rglob("*"))
+        }
+
+    def interrupt(self, group: CujGroup, reverting: bool, applied: bool = True):
+        """
+        applies the first step of `group` unless not `applied`, journaling it
+        as `incremental_build.main()` does, and if `reverting` journals the
+        second step without applying it
+        """
+        journal = Journal(self.log_dir)
+        unit = Unit("SOONG_ONLY", group.description)
+        journal.started(unit)
+        change, revert = group.get_steps()
+        journal.applying(unit, 0, change.verb, change.undo())
+        if applied:
+            change.apply_change()
+        if reverting:
+            journal.applying(unit, 1, revert.verb, revert.undo())
+
+    def groups(self) -> dict[str, Callable[[], CujGroup]]:
+        new_file = self.top.joinpath("b", "c", "new.txt")
+        java = self.top.joinpath("a", "Foo.java")
+        return {
+            "create": lambda: cuj_catalog.Create(new_file, InWorkspace.SYMLINK),
+            "delete": lambda: cuj_catalog.Delete(
+                self.top.joinpath("a", "README.txt"), InWorkspace.SYMLINK
+            ),
+            "replace": lambda: cuj_catalog.ReplaceFileWithDir(
+                self.top.joinpath("a", "README.txt")
+            ),
+            "modify": lambda: cuj_catalog.Modify(java),
+            "regex": lambda: cuj_regex_based.modify_private_method(java),
+        }
+
+    def test_revert(self):
+        before = self.tree()
+        for name, group in self.groups().items():
+            for reverting in (False, True):
+                with self.subTest(name, reverting=reverting):
+                    self.interrupt(group(), reverting)
+                    self.assertNotEqual(self.tree(), before)
+                    # as if in another process
+                    _, interrupted = Journal(self.log_dir).read()
+                    incremental_build._revert(interrupted)
+                    self.assertEqual(self.tree(), before)
+                    Journal(self.log_dir).reverted(interrupted.unit)
+
+    def test_revert_unapplied(self):
+        before = self.tree()
+        for name, group in self.groups().items():
+            with self.subTest(name):
+                self.interrupt(group(), reverting=False, applied=False)
+                _, interrupted = Journal(self.log_dir).read()
+                incremental_build._revert(interrupted)
+                self.assertEqual(self.tree(), before)
+                Journal(self.log_dir).reverted(interrupted.unit)
+
+    def test_create_when_resuming(self):
+        existing = self.top.joinpath("a", "README.txt")
+        with self.assertRaises(RuntimeError):
+            cuj_catalog.Create(existing, InWorkspace.SYMLINK)
+        with mock.patch("util.RESUMING", True):
+            cuj_catalog.Create(existing, InWorkspace.SYMLINK)
+
+
+if __name__ == "__main__":
+    unittest.main()
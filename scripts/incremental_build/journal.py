@@ -0,0 +1,128 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+An append-only journal of the progress of a session, so that an interrupted
+session can be resumed: the changes of the CUJ group that was interrupted are
+reverted and the CUJ groups already completed are skipped.
+"""
+import dataclasses
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Final, Optional
+
+JOURNAL: Final[str] = "journal.jsonl"
+
+
+@dataclasses.dataclass(frozen=True)
+class Unit:
+    """a CUJ group run once for a build type"""
+
+    build_type: str
+    cujgroup: str
+    repeat: Optional[int] = None
+
+
+@dataclasses.dataclass(frozen=True)
+class Interrupted:
+    unit: Unit
+    applied: int
+    """the index of the last step whose change was applied, possibly partly"""
+    runs: tuple[str, ...]
+    """the run dirs of the completed builds of the CUJ group"""
+    undo: tuple[tuple[int, list[dict[str, str]]], ...] = ()
+    """the undo data recorded by the applied steps by step, see `cuj.Undo`"""
+
+
+class Journal:
+    def __init__(self, log_dir: Path):
+        self.path = log_dir.joinpath(JOURNAL)
+
+    def _append(self, event: str, unit: Unit, **kwargs):
+        entry = {"event": event, "unit": dataclasses.asdict(unit), **kwargs}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            # an entry must be durable before the change it records is made
+            os.fsync(f.fileno())
+
+    def started(self, unit: Unit):
+        self._append("started", unit)
+
+    def applying(
+        self,
+        unit: Unit,
+        step: int,
+        verb: str,
+        undo: Optional[list[dict[str, str]]] = None,
+    ):
+        """:param undo: the data to revert the step with from another process"""
+        if undo is None:
+            self._append("applying", unit, step=step, verb=verb)
+        else:
+            self._append("applying", unit, step=step, verb=verb, undo=undo)
+
+    def ran(self, unit: Unit, step: int, run_dir: str):
+        self._append("ran", unit, step=step, run_dir=run_dir)
+
+    def completed(self, unit: Unit, times: dict[str, float]):
+        """:param times: seconds of the first build after each step"""
+        self._append("completed", unit, times=times)
+
+    def reverted(self, unit: Unit):
+        self._append("reverted", unit)
+
+    def read(self) -> tuple[dict[Unit, dict[str, float]], Optional[Interrupted]]:
+        """
+        :return: the step times of each completed unit and the unit that was
+        interrupted, if any
+        """
+        completed: dict[Unit, dict[str, float]] = {}
+        interrupted: Optional[Interrupted] = None
+        if not self.path.exists():
+            return completed, interrupted
+        with open(self.path) as f:
+            lines = f.readlines()
+        for i, line in enumerate(lines):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                if i == len(lines) - 1:
+                    # a crash while appending
+                    logging.warning("ignoring a partial journal entry: %s", line)
+                    break
+                raise
+            unit = Unit(**entry["unit"])
+            match entry["event"]:
+                case "started":
+                    interrupted = Interrupted(unit, -1, ())
+                case "applying":
+                    undo = interrupted.undo
+                    if "undo" in entry:
+                        undo = (*undo, (entry["step"], entry["undo"]))
+                    interrupted = dataclasses.replace(
+                        interrupted, applied=entry["step"], undo=undo
+                    )
+                case "ran":
+                    interrupted = dataclasses.replace(
+                        interrupted, runs=(*interrupted.runs, entry["run_dir"])
+                    )
+                case "completed":
+                    completed[unit] = entry["times"]
+                    interrupted = None
+                case "reverted":
+                    interrupted = None
+        return completed, interrupted
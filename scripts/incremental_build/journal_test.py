@@ -0,0 +1,90 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import tempfile
+import unittest
+from pathlib import Path
+
+from journal import Interrupted
+from journal import Journal
+from journal import Unit
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.journal = Journal(Path(self._tmp.name))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_empty(self):
+        self.assertEqual(self.journal.read(), ({}, None))
+
+    def test_completed_and_interrupted(self):
+        done = Unit("SOONG_ONLY", "modify a", None)
+        self.journal.started(done)
+        self.journal.applying(done, 0, "")
+        self.journal.ran(done, 0, "run-001")
+        self.journal.applying(done, 1, "revert")
+        self.journal.ran(done, 1, "run-002")
+        self.journal.completed(done, {"modify a": 10.5, "revert modify a": 9.0})
+
+        interrupted = Unit("SOONG_ONLY", "create b", 2)
+        self.journal.started(interrupted)
+        self.journal.applying(interrupted, 0, "")
+        self.journal.ran(interrupted, 0, "run-003")
+        self.journal.ran(interrupted, 0, "run-004")
+
+        completed, actual = self.journal.read()
+        self.assertEqual(completed, {done: {"modify a": 10.5, "revert modify a": 9.0}})
+        self.assertEqual(actual, Interrupted(interrupted, 0, ("run-003", "run-004")))
+
+    def test_interrupted_before_applying(self):
+        unit = Unit("MIXED_PROD", "modify a")
+        self.journal.started(unit)
+        self.assertEqual(self.journal.read(), ({}, Interrupted(unit, -1, ())))
+
+    def test_reverted(self):
+        unit = Unit("SOONG_ONLY", "modify a")
+        self.journal.started(unit)
+        self.journal.applying(unit, 0, "")
+        self.journal.reverted(unit)
+        self.assertEqual(self.journal.read(), ({}, None))
+
+    def test_undo(self):
+        unit = Unit("SOONG_ONLY", "create a")
+        self.journal.started(unit)
+        self.journal.applying(unit, 0, "", [{"remove": "/src/a"}])
+        self.journal.ran(unit, 0, "run-001")
+        self.journal.applying(unit, 1, "revert", [])
+        self.assertEqual(
+            self.journal.read(),
+            (
+                {},
+                Interrupted(
+                    unit, 1, ("run-001",), ((0, [{"remove": "/src/a"}]), (1, []))
+                ),
+            ),
+        )
+
+    def test_partial_entry(self):
+        unit = Unit("SOONG_ONLY", "modify a")
+        self.journal.started(unit)
+        with open(self.journal.path, "a") as f:
+            f.write('{"event": "applying", "un')
+        self.assertEqual(self.journal.read(), ({}, Interrupted(unit, -1, ())))
+
+
+if __name__ == "__main__":
+    unittest.main()
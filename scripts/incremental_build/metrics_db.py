@@ -0,0 +1,118 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+An append-only SQLite store of the metrics of each run in a log dir, such that
+tabulating them doesn't require re-reading every run directory.
+"""
+import sqlite3
+from pathlib import Path
+from typing import Final
+
+METRICS_DB: Final[str] = "metrics.db"
+
+Row = dict[str, any]
+
+_SCHEMA: Final[str] = """
+CREATE TABLE IF NOT EXISTS runs (
+  id INTEGER PRIMARY KEY,
+  log TEXT NOT NULL UNIQUE,
+  seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_seq ON runs(seq);
+-- per-run values e.g. build info and summaries, in their original order
+CREATE TABLE IF NOT EXISTS metrics (
+  run_id INTEGER NOT NULL REFERENCES runs(id),
+  ord INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  value TEXT NOT NULL,
+  PRIMARY KEY (run_id, ord)
+);
+CREATE INDEX IF NOT EXISTS metrics_name ON metrics(name);
+-- timed events, in chronological order
+CREATE TABLE IF NOT EXISTS events (
+  run_id INTEGER NOT NULL REFERENCES runs(id),
+  ord INTEGER NOT NULL,
+  name TEXT NOT NULL,
+  value TEXT NOT NULL,
+  PRIMARY KEY (run_id, ord)
+);
+CREATE INDEX IF NOT EXISTS events_name ON events(name);
+"""
+
+
+class MetricsDb:
+    def __init__(self, log_dir: Path):
+        self.path = log_dir.joinpath(METRICS_DB)
+        # a generous timeout as runs may be recorded concurrently
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> "MetricsDb":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def logs(self) -> set[str]:
+        """:return: the names of the run dirs recorded"""
+        return {log for (log,) in self._conn.execute("SELECT log FROM runs")}
+
+    def last_seq(self) -> int:
+        """:return: the largest sequence number recorded, 0 if none"""
+        (seq,) = self._conn.execute("SELECT MAX(seq) FROM runs").fetchone()
+        return seq or 0
+
+    def add_run(self, log: str, seq: int, metrics: Row, events: Row):
+        """
+        Records a run, replacing any previous record of the same run dir.
+        None values are skipped and other values are stored as strings.
+        """
+        with self._conn:
+            old = self._conn.execute("SELECT id FROM runs WHERE log = ?", (log,))
+            for (run_id,) in old.fetchall():
+                self._conn.execute("DELETE FROM metrics WHERE run_id = ?", (run_id,))
+                self._conn.execute("DELETE FROM events WHERE run_id = ?", (run_id,))
+                self._conn.execute("DELETE FROM runs WHERE id = ?", (run_id,))
+            run_id = self._conn.execute(
+                "INSERT INTO runs (log, seq) VALUES (?, ?)", (log, seq)
+            ).lastrowid
+            for table, row in (("metrics", metrics), ("events", events)):
+                self._conn.executemany(
+                    f"INSERT INTO {table} (run_id, ord, name, value) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        (run_id, i, k, str(v))
+                        for i, (k, v) in enumerate(row.items())
+                        if v is not None
+                    ),
+                )
+
+    def _rows(self, table: str) -> list[Row]:
+        runs = self._conn.execute("SELECT id FROM runs ORDER BY seq")
+        rows: dict[int, Row] = {run_id: {} for (run_id,) in runs}
+        for run_id, name, value in self._conn.execute(
+            f"SELECT run_id, name, value FROM {table} ORDER BY run_id, ord"
+        ):
+            rows[run_id][name] = value
+        return list(rows.values())
+
+    def rows(self) -> tuple[list[Row], list[Row]]:
+        """
+        :return: the metrics and the events of every run, in the same order of
+        runs
+        """
+        return self._rows("metrics"), self._rows("events")
@@ -0,0 +1,52 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import tempfile
+import unittest
+from pathlib import Path
+
+from metrics_db import MetricsDb
+
+
+class MetricsDbTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_dir = Path(self.tmp.name)
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def test_rows_in_run_and_column_order(self):
+        with MetricsDb(self.log_dir) as db:
+            db.add_run("run-10", 10, {"log": "run-10", "z": 1, "a": None}, {})
+            db.add_run(
+                "run-2", 2, {"log": "run-2", "b": True}, {"soong": "01:00", "a": "2"}
+            )
+        with MetricsDb(self.log_dir) as db:
+            self.assertEqual(db.logs(), {"run-2", "run-10"})
+            metrics, events = db.rows()
+        self.assertEqual(
+            metrics, [{"log": "run-2", "b": "True"}, {"log": "run-10", "z": "1"}]
+        )
+        self.assertEqual(list(events[0]), ["soong", "a"])
+        self.assertEqual(events[1], {})
+
+    def test_add_run_replaces(self):
+        with MetricsDb(self.log_dir) as db:
+            db.add_run("run-1", 1, {"x": 1}, {"e": "00:01"})
+            db.add_run("run-1", 1, {"y": 2}, {})
+            self.assertEqual(db.rows(), ([{"y": "2"}], [{}]))
+
+
+if __name__ == "__main__":
+    unittest.main()
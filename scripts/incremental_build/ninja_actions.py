@@ -0,0 +1,144 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-action timing analysis of the ninja actions run by a build, based on the
+entries appended to `.ninja_log`.
+"""
+import bisect
+import datetime
+import json
+from pathlib import Path
+from typing import Final
+
+import util
+from ninja_log import NinjaLogEntry
+
+NINJA_ACTIONS_JSON: Final[str] = "ninja_actions.json"
+TOP_N: Final[int] = 20
+# upper bounds (exclusive, in ms) of the duration histogram buckets
+HISTOGRAM_BUCKETS_MS: Final[tuple[int, ...]] = (
+    10,
+    100,
+    1_000,
+    10_000,
+    60_000,
+    600_000,
+)
+# width of the intervals over which parallelism is averaged
+PARALLELISM_INTERVAL_MS: Final[int] = 1_000
+
+
+def _bucket_name(i: int) -> str:
+    if i == len(HISTOGRAM_BUCKETS_MS):
+        return f">={HISTOGRAM_BUCKETS_MS[-1]}ms"
+    return f"<{HISTOGRAM_BUCKETS_MS[i]}ms"
+
+
+def histogram(entries: list[NinjaLogEntry]) -> dict[str, int]:
+    counts = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+    for e in entries:
+        counts[bisect.bisect_right(HISTOGRAM_BUCKETS_MS, e.duration)] += 1
+    return {_bucket_name(i): count for i, count in enumerate(counts)}
+
+
+def parallelism(
+    entries: list[NinjaLogEntry], interval: int = PARALLELISM_INTERVAL_MS
+) -> list[float]:
+    """
+    :return: the average number of concurrently running actions in each
+    successive `interval` ms since the first action started
+    """
+    if not entries:
+        return []
+    origin = min(e.start for e in entries)
+    span = max(e.end for e in entries) - origin
+    busy = [0] * (span // interval + 1)
+    for e in entries:
+        start, end = e.start - origin, e.end - origin
+        while start < end:
+            i = start // interval
+            chunk_end = min(end, (i + 1) * interval)
+            busy[i] += chunk_end - start
+            start = chunk_end
+    return [round(b / interval, 2) for b in busy]
+
+
+def critical_path(entries: list[NinjaLogEntry]) -> list[NinjaLogEntry]:
+    """
+    `.ninja_log` has no dependency information, so the critical path is
+    approximated by walking back from the last action to finish: the
+    predecessor of an action is taken to be the action that finished last
+    before it started.
+    :return: the chain of actions in chronological order
+    """
+    by_end = sorted(entries, key=lambda e: (e.end, e.start))
+    ends = [e.end for e in by_end]
+    path = []
+    i = len(by_end) - 1
+    while i >= 0:
+        current = by_end[i]
+        path.append(current)
+        i = bisect.bisect_right(ends, current.start, hi=i) - 1
+    path.reverse()
+    return path
+
+
+def _hhmmss(ms: int) -> str:
+    return util.hhmmss(datetime.timedelta(milliseconds=ms), decimal_precision=True)
+
+
+def _action(e: NinjaLogEntry) -> dict[str, any]:
+    return {"output": e.output, "start": e.start, "end": e.end}
+
+
+def analyze(entries: list[NinjaLogEntry], top_n: int = TOP_N) -> dict[str, any]:
+    """
+    :return: a json-serializable analysis; its "summary" holds the values that
+    are tabulated in metrics.csv
+    """
+    if not entries:
+        return {"summary": {}}
+    slowest = sorted(entries, key=lambda e: e.duration, reverse=True)[:top_n]
+    path = critical_path(entries)
+    wall = max(e.end for e in entries) - min(e.start for e in entries)
+    total = sum(e.duration for e in entries)
+    path_time = sum(e.duration for e in path)
+    return {
+        "summary": {
+            "ninja_actions.wall": _hhmmss(wall),
+            "ninja_actions.total": _hhmmss(total),
+            "ninja_actions.parallelism": round(total / wall) if wall else 0,
+            "ninja_actions.critical_path": _hhmmss(path_time),
+            "ninja_actions.critical_path_length": len(path),
+            "ninja_actions.slowest_time": _hhmmss(slowest[0].duration),
+        },
+        "slowest": [_action(e) for e in slowest],
+        "histogram": histogram(entries),
+        "parallelism_interval_ms": PARALLELISM_INTERVAL_MS,
+        "parallelism": parallelism(entries),
+        "critical_path": [_action(e) for e in path],
+    }
+
+
+def write_analysis(run_dir: Path, entries: list[NinjaLogEntry]):
+    with open(run_dir.joinpath(NINJA_ACTIONS_JSON), "w") as f:
+        json.dump(analyze(entries), f, indent=True)
+
+
+def read_summary(run_dir: Path) -> dict[str, any]:
+    analysis_json = run_dir.joinpath(NINJA_ACTIONS_JSON)
+    if not analysis_json.exists():
+        return {}
+    with open(analysis_json) as f:
+        return json.load(f).get("summary", {})
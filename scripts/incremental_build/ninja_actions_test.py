@@ -0,0 +1,76 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest
+
+import ninja_actions
+from ninja_log import NinjaLogEntry
+
+
+def entry(output: str, start: int, end: int) -> NinjaLogEntry:
+    return NinjaLogEntry(start, end, 0, output, "")
+
+
+# a: [0, 1000)   b: [0, 400)   c: [400, 1500)   d: [1000, 3000)
+ENTRIES = [
+    entry("a", 0, 1000),
+    entry("b", 0, 400),
+    entry("c", 400, 1500),
+    entry("d", 1000, 3000),
+]
+
+
+class NinjaActionsTest(unittest.TestCase):
+    def test_histogram(self):
+        self.assertEqual(
+            ninja_actions.histogram([entry("x", 0, 5), *ENTRIES]),
+            {
+                "<10ms": 1,
+                "<100ms": 0,
+                "<1000ms": 1,
+                "<10000ms": 3,
+                "<60000ms": 0,
+                "<600000ms": 0,
+                ">=600000ms": 0,
+            },
+        )
+
+    def test_parallelism(self):
+        self.assertEqual(ninja_actions.parallelism(ENTRIES), [2.0, 1.5, 1.0, 0.0])
+        self.assertEqual(ninja_actions.parallelism([]), [])
+
+    def test_critical_path(self):
+        self.assertEqual(
+            [e.output for e in ninja_actions.critical_path(ENTRIES)], ["a", "d"]
+        )
+        self.assertEqual(ninja_actions.critical_path([]), [])
+
+    def test_analyze(self):
+        analysis = ninja_actions.analyze(ENTRIES, top_n=2)
+        self.assertEqual(
+            analysis["summary"],
+            {
+                "ninja_actions.wall": "00:03.000",
+                "ninja_actions.total": "00:04.500",
+                "ninja_actions.parallelism": 2,
+                "ninja_actions.critical_path": "00:03.000",
+                "ninja_actions.critical_path_length": 2,
+                "ninja_actions.slowest_time": "00:02.000",
+            },
+        )
+        self.assertEqual([a["output"] for a in analysis["slowest"]], ["d", "c"])
+        self.assertEqual(ninja_actions.analyze([]), {"summary": {}})
+
+
+if __name__ == "__main__":
+    unittest.main()
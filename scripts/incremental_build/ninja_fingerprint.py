@@ -0,0 +1,184 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Fingerprints of the ninja file generated by soong, to tell whether, and where,
+it changed between builds without reading it in small blocks.
+"""
+import enum
+import hashlib
+import json
+import mmap
+import os
+import re
+from pathlib import Path
+from typing import Final, Optional
+
+SECTIONS_JSON: Final[str] = "build_ninja_sections.json"
+# hashlib releases the GIL for large updates, so hashing in a background
+# thread doesn't hold up others
+_SLICE: Final[int] = 8 << 20
+_SAMPLES: Final[int] = 64
+_SAMPLE_SIZE: Final[int] = 64 << 10
+# the rule of a build statement follows the first unescaped colon
+_BUILD_RULE: Final[re.Pattern] = re.compile(rb"build (?:[^:$\n]|\$.)*:\s*(\S+)")
+
+
+class Mode(enum.Enum):
+    FULL = "full"
+    """SHA-256 of the contents, the same as that of `sha256sum`"""
+    SAMPLED = "sampled"
+    """
+    SHA-256 of the size, the mtime and evenly spaced chunks of the contents;
+    far cheaper, at the cost of missing changes that keep the size and mtime
+    and fall between the chunks
+    """
+
+
+def _digest(h) -> str:
+    return h.hexdigest()[0:8]
+
+
+def fingerprint(path: Path, mode: Mode = Mode.FULL) -> str:
+    """:return: an 8 character fingerprint, empty if there is no file"""
+    if not path.exists():
+        return ""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if mode == Mode.SAMPLED:
+            h.update(f"{size}:{os.fstat(f.fileno()).st_mtime_ns}".encode())
+        if size == 0:
+            return _digest(h)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            view = memoryview(m)
+            try:
+                if mode == Mode.FULL or size <= _SAMPLES * _SAMPLE_SIZE:
+                    for offset in range(0, size, _SLICE):
+                        h.update(view[offset : offset + _SLICE])
+                else:
+                    step = (size - _SAMPLE_SIZE) // (_SAMPLES - 1)
+                    for i in range(_SAMPLES):
+                        offset = i * step
+                        h.update(view[offset : offset + _SAMPLE_SIZE])
+            finally:
+                view.release()
+    return _digest(h)
+
+
+def _continues(line: bytes) -> bool:
+    """:return: whether the line ends with an unescaped `$`, i.e. is wrapped"""
+    line = line.rstrip(b"\r\n")
+    return (len(line) - len(line.rstrip(b"$"))) % 2 == 1
+
+
+def _unwrap(lines: list[bytes]) -> bytes:
+    """joins the physical lines of a wrapped declaration"""
+    parts = [lines[0], *(line.lstrip() for line in lines[1:])]
+    return b"".join(p.rstrip(b"\r\n")[:-1] for p in parts[:-1]) + parts[-1]
+
+
+def _section_of(declaration: bytes) -> Optional[str]:
+    """:return: the section a top-level declaration starts, if any"""
+    keyword, _, rest = declaration.partition(b" ")
+    match keyword:
+        case b"rule" | b"pool" | b"subninja" | b"include":
+            return f"{keyword.decode()} {rest.strip().decode(errors='replace')}"
+        case b"build":
+            rule = _BUILD_RULE.match(declaration)
+            return f"build {rule.group(1).decode() if rule else '?'}"
+    return None
+
+
+def section_hashes(path: Path) -> dict[str, str]:
+    """
+    Hashes each section of a ninja file: each rule, pool, subninja and include
+    declaration and, by rule, all the build statements using it.
+    Comments are ignored and the rest, e.g. variables, is hashed as "globals".
+    """
+    if not path.exists():
+        return {}
+    hashes: dict[str, any] = {"globals": hashlib.sha256()}
+
+    def hash_of(declaration: bytes):
+        section = _section_of(declaration) or "globals"
+        if section not in hashes:
+            hashes[section] = hashlib.sha256()
+        return hashes[section]
+
+    h = hashes["globals"]
+    # the physical lines of a wrapped top-level declaration
+    wrapped: list[bytes] = []
+    with open(path, "rb", buffering=_SLICE) as f:
+        for line in f:
+            if wrapped:
+                wrapped.append(line)
+                if _continues(line):
+                    continue
+                h = hash_of(_unwrap(wrapped))
+                for w in wrapped:
+                    h.update(w)
+                wrapped.clear()
+                continue
+            if line.startswith(b"#"):
+                continue
+            if not line[:1].isspace():
+                if _continues(line):
+                    wrapped.append(line)
+                    continue
+                h = hash_of(line)
+            h.update(line)
+    for w in wrapped:
+        h.update(w)
+    return {k: _digest(h) for k, h in hashes.items()}
+
+
+def changed_sections(old: dict[str, str], new: dict[str, str]) -> list[str]:
+    """:return: the sections added, removed or modified"""
+    return sorted(k for k in old.keys() | new.keys() if old.get(k) != new.get(k))
+
+
+class SectionTracker:
+    """
+    Tracks the section hashes of the ninja file across the builds of a session
+    to report which sections each build changed.
+    """
+
+    def __init__(self):
+        self._previous: Optional[dict[str, str]] = None
+
+    def update(self, path: Path, run_dir: Path) -> list[str]:
+        """
+        Writes the section hashes, and those that changed since the previous
+        update, into `run_dir`
+        :return: the changed sections, none for the first update
+        """
+        sections = section_hashes(path)
+        analysis = {"sections": sections}
+        changed = []
+        if self._previous is not None:
+            changed = changed_sections(self._previous, sections)
+            analysis["summary"] = {"build_ninja.sections_changed": len(changed)}
+            analysis["changed"] = changed
+        self._previous = sections
+        with open(run_dir.joinpath(SECTIONS_JSON), "w") as f:
+            json.dump(analysis, f, indent=True)
+        return changed
+
+
+def read_summary(run_dir: Path) -> dict[str, int]:
+    sections_json = run_dir.joinpath(SECTIONS_JSON)
+    if not sections_json.exists():
+        return {}
+    with open(sections_json) as f:
+        return json.load(f).get("summary", {})
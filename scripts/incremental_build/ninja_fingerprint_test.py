@@ -0,0 +1,120 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+import ninja_fingerprint
+from ninja_fingerprint import Mode
+from ninja_fingerprint import SectionTracker
+
+_NINJA = textwrap.dedent(
+    """\
+    ninja_required_version = 1.7.0
+    # # # # # # # #
+    # Module: libfoo
+    rule cc
+        command = clang -c $in -o $out
+    rule ld
+        command = ld $in -o $out
+    build out/foo.o: cc foo.c
+        cflags = -O2
+    build $
+            out/a$:b.o: $
+            cc a.c
+    build out/libfoo.so: ld out/foo.o out/a$:b.o
+    subninja out/other.ninja
+    """
+)
+
+
+class NinjaFingerprintTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+        self.ninja = self.dir.joinpath("build.ninja")
+        self.ninja.write_text(_NINJA)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_full_matches_sha256(self):
+        data = os.urandom(3 * 1024 * 1024 + 17)
+        self.ninja.write_bytes(data)
+        self.assertEqual(
+            ninja_fingerprint.fingerprint(self.ninja, Mode.FULL),
+            hashlib.sha256(data).hexdigest()[0:8],
+        )
+
+    def test_missing_or_empty(self):
+        self.assertEqual(ninja_fingerprint.fingerprint(self.dir / "nope"), "")
+        self.ninja.write_bytes(b"")
+        self.assertEqual(len(ninja_fingerprint.fingerprint(self.ninja)), 8)
+
+    def test_sampled(self):
+        data = bytearray(16 * 1024 * 1024)
+        self.ninja.write_bytes(data)
+        os.utime(self.ninja, ns=(0, 1))
+        before = ninja_fingerprint.fingerprint(self.ninja, Mode.SAMPLED)
+        data[0] = 1
+        self.ninja.write_bytes(data)
+        os.utime(self.ninja, ns=(0, 1))
+        self.assertNotEqual(
+            ninja_fingerprint.fingerprint(self.ninja, Mode.SAMPLED), before
+        )
+        # only the mtime changes
+        data[0] = 0
+        self.ninja.write_bytes(data)
+        self.assertNotEqual(
+            ninja_fingerprint.fingerprint(self.ninja, Mode.SAMPLED), before
+        )
+
+    def test_section_hashes(self):
+        sections = ninja_fingerprint.section_hashes(self.ninja)
+        self.assertEqual(
+            sorted(sections),
+            [
+                "build cc",
+                "build ld",
+                "globals",
+                "rule cc",
+                "rule ld",
+                "subninja out/other.ninja",
+            ],
+        )
+
+    def test_changed_sections(self):
+        tracker = SectionTracker()
+        self.assertEqual(tracker.update(self.ninja, self.dir), [])
+        self.assertEqual(ninja_fingerprint.read_summary(self.dir), {})
+        self.ninja.write_text(
+            _NINJA.replace("-O2", "-O3").replace("# Module: libfoo", "# changed")
+        )
+        self.assertEqual(tracker.update(self.ninja, self.dir), ["build cc"])
+        self.ninja.write_text(_NINJA.replace("subninja out/other.ninja\n", ""))
+        self.assertEqual(
+            tracker.update(self.ninja, self.dir),
+            ["build cc", "subninja out/other.ninja"],
+        )
+        self.assertEqual(
+            ninja_fingerprint.read_summary(self.dir),
+            {"build_ninja.sections_changed": 2},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
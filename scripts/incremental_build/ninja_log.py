@@ -0,0 +1,193 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import dataclasses
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+_READ_SIZE = 1 << 20
+# ninja recompacts the log when it starts if it has more than this many
+# entries per output, see kCompactionRatio in ninja's build_log.cc
+_COMPACTION_RATIO = 3
+
+
+@dataclasses.dataclass(frozen=True)
+class NinjaLogEntry:
+    """
+    A line of `.ninja_log`. Times are in milliseconds relative to the start of
+    the ninja invocation that ran the action.
+    """
+
+    start: int
+    end: int
+    restat: int
+    """mtime of the output as recorded by ninja, 0 if not restat-ed"""
+    output: str
+    cmd_hash: str
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    @staticmethod
+    def parse(line: str) -> "NinjaLogEntry":
+        start, end, restat, output, cmd_hash = line.rstrip("\n").split("\t")
+        return NinjaLogEntry(int(start), int(end), int(restat), output, cmd_hash)
+
+
+@dataclasses.dataclass(frozen=True)
+class _FileId:
+    dev: int
+    ino: int
+
+    @staticmethod
+    def of(st: os.stat_result) -> "_FileId":
+        return _FileId(st.st_dev, st.st_ino)
+
+
+class NinjaLog:
+    """
+    Incremental reader of `.ninja_log`.
+    Remembers the byte offset and entry count as of the last checkpoint so that
+    only the entries appended since are parsed, rather than the whole log.
+    If the log is deleted, truncated or rewritten (e.g. by `ninja -t recompact`)
+    the saved offset is discarded.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._offset = 0
+        self._entry_count = 0
+        self._file_id: Optional[_FileId] = None
+        self._compacted_count: Optional[int] = None
+        """the entry count after the log was last rewritten, if seen"""
+
+    @property
+    def entry_count(self) -> int:
+        """number of entries in the log as of the last checkpoint"""
+        return self._entry_count
+
+    def _stat(self) -> Optional[os.stat_result]:
+        try:
+            return os.stat(self.path)
+        except FileNotFoundError:
+            return None
+
+    def _is_rewritten(self, st: os.stat_result) -> bool:
+        return _FileId.of(st) != self._file_id or st.st_size < self._offset
+
+    def _read_tail(self) -> tuple[list[str], bool]:
+        """
+        :return: the complete lines after the saved offset and whether the log
+        was rewritten since, in which case the lines are of the whole log.
+        The saved offset is advanced past the returned lines.
+        """
+        st = self._stat()
+        if st is None:
+            rewritten = self._offset > 0
+            self._offset = 0
+            self._file_id = None
+            return [], rewritten
+        rewritten = self._is_rewritten(st)
+        if rewritten:
+            if self._file_id is not None:
+                logging.debug("%s was rewritten, reading from the start", self.path)
+            self._offset = 0
+            self._file_id = _FileId.of(st)
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+        # an action may be being written; leave a partial last line for later
+        end = data.rfind(b"\n") + 1
+        self._offset += end
+        return data[:end].decode(errors="replace").splitlines(), rewritten
+
+    def checkpoint(self):
+        """
+        Marks the current end of the log, subsequent `new_entries()` will only
+        return entries appended after this point.
+        """
+        st = self._stat()
+        if st is None or not self._is_rewritten(st):
+            self.new_entries()
+            return
+        # the first read of the log says nothing about when it was compacted
+        rewritten = self._file_id is not None
+        # counting newlines is much cheaper than parsing every entry
+        self._file_id = _FileId.of(st)
+        self._offset = 0
+        self._entry_count = 0
+        pos = 0
+        with open(self.path, "rb") as f:
+            for block in iter(lambda: f.read(_READ_SIZE), b""):
+                if pos == 0 and block.startswith(b"#"):
+                    # the "# ninja log vN" header
+                    self._entry_count -= 1
+                self._entry_count += block.count(b"\n")
+                # an action may be being written; leave a partial last line
+                last_newline = block.rfind(b"\n")
+                if last_newline >= 0:
+                    self._offset = pos + last_newline + 1
+                pos += len(block)
+        self._entry_count = max(self._entry_count, 0)
+        if rewritten:
+            self._compacted_count = self._entry_count
+
+    def needs_recompaction(self) -> bool:
+        """
+        :return: whether ninja might recompact, i.e. rewrite, the log when it
+        starts, after which the entries it appends can't be told from the old
+        ones. Each output has an entry after a recompaction, so there is no
+        need until the log has grown by `_COMPACTION_RATIO` since; recompacting
+        also means re-reading the whole log for `checkpoint()`.
+        """
+        if self._compacted_count is None:
+            return self._entry_count > 0
+        return self._entry_count > _COMPACTION_RATIO * self._compacted_count
+
+    def _parse(self, lines: list[str]) -> list[NinjaLogEntry]:
+        entries = []
+        for line in lines:
+            try:
+                entries.append(NinjaLogEntry.parse(line))
+            except ValueError:
+                # e.g. a torn line or another version of the log format
+                logging.debug("skipping a malformed line of %s: %r", self.path, line)
+        return entries
+
+    def new_entries(self) -> list[NinjaLogEntry]:
+        """
+        :return: the entries appended since the last checkpoint, which is then
+        moved to the end of the log.
+        """
+        previous_count = self._entry_count
+        lines, rewritten = self._read_tail()
+        # malformed lines are counted like checkpoint() counts them
+        lines = [line for line in lines if not line.startswith("#")]
+        if rewritten and previous_count:
+            # The log was rewritten, e.g. ninja recompacted it at startup, so
+            # there is no telling which entries are new. Like counting lines
+            # used to, assume the entries past the old count are the new ones.
+            logging.warning(
+                "%s was rewritten since the last checkpoint; new actions are "
+                "approximated as the entries past #%d",
+                self.path,
+                previous_count,
+            )
+            self._entry_count = len(lines)
+            self._compacted_count = self._entry_count
+            return self._parse(lines[previous_count:])
+        self._entry_count = previous_count + len(lines)
+        return self._parse(lines)
@@ -0,0 +1,149 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from ninja_log import NinjaLog
+from ninja_log import NinjaLogEntry
+
+HEADER = "# ninja log v5\n"
+
+
+def line(i: int) -> str:
+    return f"{i * 10}\t{i * 10 + 5}\t0\tout/{i}.o\t{i:x}\n"
+
+
+class NinjaLogTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name).joinpath(".ninja_log")
+
+    def tearDown(self) -> None:
+        self.tmp.cleanup()
+
+    def append(self, *lines: str):
+        with open(self.path, "a") as f:
+            f.writelines(lines)
+
+    def rewrite(self, *lines: str):
+        replacement = self.path.with_suffix(".recompact")
+        with open(replacement, "w") as f:
+            f.writelines(lines)
+        os.replace(replacement, self.path)
+
+    def test_parse(self):
+        self.assertEqual(
+            NinjaLogEntry.parse("10\t25\t1234\tout/a.o\tabc\n"),
+            NinjaLogEntry(10, 25, 1234, "out/a.o", "abc"),
+        )
+        self.assertEqual(NinjaLogEntry.parse(line(2)).duration, 5)
+
+    def test_missing_log(self):
+        log = NinjaLog(self.path)
+        log.checkpoint()
+        self.assertEqual(log.entry_count, 0)
+        self.assertEqual(log.new_entries(), [])
+
+    def test_only_appended_entries_are_new(self):
+        self.append(HEADER, line(1), line(2))
+        log = NinjaLog(self.path)
+        log.checkpoint()
+        self.assertEqual(log.entry_count, 2)
+
+        self.append(line(3), line(4))
+        self.assertEqual(
+            [e.output for e in log.new_entries()], ["out/3.o", "out/4.o"]
+        )
+        self.assertEqual(log.entry_count, 4)
+        self.assertEqual(log.new_entries(), [])
+
+    def test_partial_line_is_left_for_later(self):
+        self.append(HEADER, line(1))
+        log = NinjaLog(self.path)
+        log.checkpoint()
+
+        self.append(line(2), line(3)[:4])
+        self.assertEqual([e.output for e in log.new_entries()], ["out/2.o"])
+        self.append(line(3)[4:])
+        self.assertEqual([e.output for e in log.new_entries()], ["out/3.o"])
+
+    def test_checkpoint_after_recompaction(self):
+        self.append(HEADER, line(1), line(2), line(1), line(2))
+        log = NinjaLog(self.path)
+        log.checkpoint()
+        self.assertEqual(log.entry_count, 4)
+
+        self.rewrite(HEADER, line(1), line(2))
+        log.checkpoint()
+        self.assertEqual(log.entry_count, 2)
+        self.append(line(3))
+        self.assertEqual([e.output for e in log.new_entries()], ["out/3.o"])
+
+    def test_needs_recompaction(self):
+        log = NinjaLog(self.path)
+        log.checkpoint()
+        self.assertFalse(log.needs_recompaction())
+        self.append(HEADER, line(1), line(2))
+        log.checkpoint()
+        # the first recompaction of a session
+        self.assertTrue(log.needs_recompaction())
+
+        self.rewrite(HEADER, line(1), line(2))
+        log.checkpoint()
+        self.assertFalse(log.needs_recompaction())
+        self.append(line(1), line(2), line(1), line(2))
+        log.checkpoint()
+        self.assertFalse(log.needs_recompaction())
+        self.append(line(1))
+        log.checkpoint()
+        self.assertTrue(log.needs_recompaction())
+
+    def test_rewrite_after_checkpoint(self):
+        self.append(HEADER, line(1), line(2))
+        log = NinjaLog(self.path)
+        log.checkpoint()
+
+        with self.assertLogs(level="WARNING"):
+            self.rewrite(HEADER, line(1), line(2), line(3))
+            self.assertEqual([e.output for e in log.new_entries()], ["out/3.o"])
+        self.assertEqual(log.entry_count, 3)
+
+    def test_malformed_lines(self):
+        self.append(HEADER, line(1))
+        log = NinjaLog(self.path)
+        log.checkpoint()
+
+        self.append(line(2), "10\t20\tout/torn.o\n", "a\tb\t0\tout/x.o\tabc\n", line(3))
+        self.assertEqual(
+            [e.output for e in log.new_entries()], ["out/2.o", "out/3.o"]
+        )
+        self.assertEqual(log.entry_count, 5)
+
+    def test_truncation(self):
+        self.append(HEADER, line(1), line(2))
+        log = NinjaLog(self.path)
+        log.checkpoint()
+
+        with open(self.path, "w") as f:
+            f.write(HEADER)
+        log.checkpoint()
+        self.assertEqual(log.entry_count, 0)
+        self.append(line(3))
+        self.assertEqual([e.output for e in log.new_entries()], ["out/3.o"])
+
+
+if __name__ == "__main__":
+    unittest.main()
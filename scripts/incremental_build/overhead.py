@@ -0,0 +1,83 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Wall time of the steps this tool itself takes around builds, e.g. collecting
+metrics, so that the tool's overhead can be told apart from build times.
+"""
+import contextlib
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Final, Iterator, TypeVar
+
+OVERHEAD_JSON: Final[str] = "overhead.json"
+
+T = TypeVar("T")
+
+
+class Overhead:
+    """
+    Accumulates the time of each step by name; steps may run concurrently,
+    in which case their sum exceeds the wall time taken.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def timed(self, name: str, fn: Callable[..., T]) -> Callable[..., T]:
+        """:return: `fn` with each of its calls timed as the step `name`"""
+
+        def wrapper(*args, **kwargs) -> T:
+            with self.step(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self._steps[name] = self._steps.get(name, 0.0) + seconds
+
+    def merge(self, other: "Overhead"):
+        for name, seconds in other.steps().items():
+            self.add(name, seconds)
+
+    def steps(self) -> dict[str, float]:
+        """:return: seconds by step, in the order the steps first finished"""
+        with self._lock:
+            return dict(self._steps)
+
+    def summary(self) -> dict[str, float]:
+        return {f"overhead/{k}": round(v, 3) for k, v in self.steps().items()}
+
+    def write(self, run_dir: Path):
+        with open(run_dir.joinpath(OVERHEAD_JSON), "w") as f:
+            json.dump({"summary": self.summary()}, f, indent=True)
+
+
+def read_summary(run_dir: Path) -> dict[str, float]:
+    overhead_json = run_dir.joinpath(OVERHEAD_JSON)
+    if not overhead_json.exists():
+        return {}
+    with open(overhead_json) as f:
+        return json.load(f).get("summary", {})
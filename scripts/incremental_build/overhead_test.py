@@ -0,0 +1,61 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import concurrent.futures
+import tempfile
+import unittest
+from pathlib import Path
+
+import overhead
+from overhead import Overhead
+
+
+class OverheadTest(unittest.TestCase):
+    def test_concurrent_steps(self):
+        o = Overhead()
+        with concurrent.futures.ThreadPoolExecutor(4) as pool:
+            futures = [
+                pool.submit(o.timed(name, lambda x: x * 2), i)
+                for i, name in enumerate(["a", "b", "a", "b", "a"])
+            ]
+            self.assertEqual([f.result() for f in futures], [0, 2, 4, 6, 8])
+        self.assertEqual(set(o.steps()), {"a", "b"})
+
+    def test_step_is_timed_on_error(self):
+        o = Overhead()
+        with self.assertRaises(ValueError):
+            with o.step("failing"):
+                raise ValueError()
+        self.assertIn("failing", o.steps())
+
+    def test_merge(self):
+        session, run = Overhead(), Overhead()
+        session.add("a", 1.0)
+        run.add("a", 0.5)
+        run.add("b", 2.0)
+        session.merge(run)
+        self.assertEqual(session.steps(), {"a": 1.5, "b": 2.0})
+
+    def test_summary_round_trip(self):
+        o = Overhead()
+        o.add("build_ninja_hash", 1.23456)
+        with tempfile.TemporaryDirectory() as d:
+            o.write(Path(d))
+            self.assertEqual(
+                overhead.read_summary(Path(d)), {"overhead/build_ninja_hash": 1.235}
+            )
+            self.assertEqual(overhead.read_summary(Path(d, "nope")), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Controls the state of the OS page cache that builds start with: cold, i.e.
+with the source tree and the out dir evicted and no Bazel server running, or
+warm, i.e. with the files that every build reads resident.
+"""
+import ctypes
+import enum
+import functools
+import logging
+import mmap
+import os
+import signal
+import time
+from pathlib import Path
+from typing import Final, Iterable, Optional
+
+_DROP_CACHES: Final[Path] = Path("/proc/sys/vm/drop_caches")
+_PROC: Final[Path] = Path("/proc")
+_BAZEL_SERVER_JAR: Final[bytes] = b"A-server.jar"
+_BAZEL_SHUTDOWN_TIMEOUT: Final[float] = 30
+# percentages of the pages of the key files beyond which a warning is logged
+_COLD_MAX_RESIDENT: Final[int] = 10
+_WARM_MIN_RESIDENT: Final[int] = 90
+# large and rarely read by builds
+_SKIPPED_DIRS: Final[frozenset[str]] = frozenset({".repo", ".git"})
+
+
+class CacheMode(enum.Enum):
+    COLD = "cold"
+    WARM = "warm"
+
+
+def drop_caches() -> bool:
+    """
+    Drops the clean page cache, dentries and inodes system-wide.
+    :return: whether it was permitted, i.e. running as root
+    """
+    os.sync()
+    try:
+        _DROP_CACHES.write_text("3")
+        return True
+    except OSError:
+        return False
+
+
+def evict(roots: Iterable[Path]) -> int:
+    """
+    Advises the kernel to drop the cached pages of the files under `roots`,
+    which unlike `drop_caches` doesn't need root but leaves the dentries and
+    inodes cached.
+    :return: the number of files evicted
+    """
+    os.sync()
+    count = 0
+    for root in roots:
+        for d, dirs, files in os.walk(root):
+            dirs[:] = [x for x in dirs if x not in _SKIPPED_DIRS]
+            for name in files:
+                try:
+                    fd = os.open(os.path.join(d, name), os.O_RDONLY | os.O_NOFOLLOW)
+                except OSError:
+                    continue
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                    count += 1
+                except OSError:
+                    pass
+                finally:
+                    os.close(fd)
+    return count
+
+
+def stop_bazel_servers(out_dir: Path) -> int:
+    """
+    Terminates the Bazel servers whose output base is in `out_dir`, so that
+    the next build starts a fresh one.
+    :return: the number of servers terminated
+    """
+    out = str(out_dir).encode()
+    pids = []
+    for entry in os.scandir(_PROC):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(os.path.join(entry.path, "cmdline"), "rb") as f:
+                args = f.read().split(b"\0")
+        except OSError:
+            continue
+        if any(_BAZEL_SERVER_JAR in a for a in args) and any(
+            a.startswith(b"--output_base=" + out) for a in args
+        ):
+            pids.append(int(entry.name))
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    deadline = time.monotonic() + _BAZEL_SHUTDOWN_TIMEOUT
+    while any(_PROC.joinpath(str(pid)).exists() for pid in pids):
+        if time.monotonic() > deadline:
+            logging.warning("Bazel servers %s haven't stopped", pids)
+            break
+        time.sleep(0.1)
+    return len(pids)
+
+
+@functools.cache
+def _libc() -> ctypes.CDLL:
+    libc = ctypes.CDLL(None, use_errno=True)
+    libc.mmap.restype = ctypes.c_void_p
+    libc.mmap.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_size_t,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_int,
+        ctypes.c_long,
+    ]
+    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+    libc.mincore.argtypes = [
+        ctypes.c_void_p,
+        ctypes.c_size_t,
+        ctypes.POINTER(ctypes.c_ubyte),
+    ]
+    return libc
+
+
+def resident_pages(path: Path) -> tuple[int, int]:
+    """:return: the number of pages of the file in the page cache, and in all"""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return 0, 0
+        pages = -(-size // mmap.PAGESIZE)
+        libc = _libc()
+        addr = libc.mmap(None, size, mmap.PROT_READ, mmap.MAP_SHARED, f.fileno(), 0)
+        if addr is None or addr == ctypes.c_void_p(-1).value:
+            raise OSError(ctypes.get_errno(), f"mmap failed for {path}")
+        try:
+            vec = (ctypes.c_ubyte * pages)()
+            if libc.mincore(addr, size, vec) != 0:
+                raise OSError(ctypes.get_errno(), f"mincore failed for {path}")
+            return sum(b & 1 for b in vec), pages
+        finally:
+            libc.munmap(addr, size)
+
+
+def residency(paths: Iterable[Path]) -> Optional[float]:
+    """
+    :return: the fraction of the pages of the files in the page cache, None if
+    the files have no pages, e.g. before the first build after a clean
+    """
+    resident = total = 0
+    for p in paths:
+        try:
+            r, t = resident_pages(p)
+        except OSError as e:
+            logging.debug("skipping %s: %s", p, e)
+            continue
+        resident += r
+        total += t
+    return resident / total if total else None
+
+
+def warm(paths: Iterable[Path]):
+    """reads the files into the page cache"""
+    for p in paths:
+        try:
+            with open(p, "rb") as f:
+                while f.read(8 << 20):
+                    pass
+        except OSError:
+            pass
+
+
+def key_files(out_dir: Path) -> list[Path]:
+    """:return: files that every build reads, e.g. the ninja files"""
+    files = [out_dir.joinpath(".ninja_log"), out_dir.joinpath(".ninja_deps")]
+    for d in (out_dir, out_dir.joinpath("soong")):
+        if d.is_dir():
+            files.extend(sorted(d.glob("*.ninja")))
+    return [f for f in files if f.is_file()]
+
+
+def prepare(mode: CacheMode, top_dir: Path, out_dir: Path) -> Optional[int]:
+    """
+    Brings the page cache into `mode` for the next build
+    :return: the percentage of the pages of the key files that are resident,
+    None if there are no key files yet
+    """
+    files = key_files(out_dir)
+    match mode:
+        case CacheMode.COLD:
+            stopped = stop_bazel_servers(out_dir)
+            if not drop_caches():
+                logging.debug("can't drop caches, evicting files instead")
+                roots = [top_dir]
+                if not out_dir.is_relative_to(top_dir):
+                    roots.append(out_dir)
+                evict(roots)
+            logging.info("Cold cache: stopped %d Bazel servers", stopped)
+        case CacheMode.WARM:
+            warm(files)
+    fraction = residency(files)
+    if fraction is None:
+        logging.debug("no key files in %s to check the page cache with", out_dir)
+        return None
+    resident = round(100 * fraction)
+    if (mode == CacheMode.COLD and resident > _COLD_MAX_RESIDENT) or (
+        mode == CacheMode.WARM and resident < _WARM_MIN_RESIDENT
+    ):
+        logging.warning(
+            "%s cache expected but %d%% of the key files are resident",
+            mode.value,
+            resident,
+        )
+    return resident
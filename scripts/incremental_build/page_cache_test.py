@@ -0,0 +1,71 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import page_cache
+
+
+class PageCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.out = Path(self._tmp.name)
+        self.out.joinpath("soong").mkdir()
+        for f in ("build.ninja", ".ninja_log", "soong/build.p.ninja", "other.txt"):
+            self.out.joinpath(f).write_bytes(os.urandom(3 * 4096 + 1))
+        self.out.joinpath("empty.ninja").write_bytes(b"")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_key_files(self):
+        self.assertEqual(
+            [f.relative_to(self.out) for f in page_cache.key_files(self.out)],
+            [
+                Path(".ninja_log"),
+                Path("build.ninja"),
+                Path("empty.ninja"),
+                Path("soong/build.p.ninja"),
+            ],
+        )
+
+    def test_resident_pages(self):
+        f = self.out.joinpath("build.ninja")
+        page_cache.warm([f])
+        resident, total = page_cache.resident_pages(f)
+        self.assertEqual(total, -(-(3 * 4096 + 1) // os.sysconf("SC_PAGE_SIZE")))
+        self.assertEqual(resident, total)
+        self.assertEqual(page_cache.resident_pages(self.out / "empty.ninja"), (0, 0))
+
+    def test_residency(self):
+        files = page_cache.key_files(self.out)
+        page_cache.warm(files)
+        self.assertEqual(page_cache.residency(files), 1.0)
+        self.assertIsNone(page_cache.residency([]))
+
+    def test_prepare_without_key_files(self):
+        out = self.out.joinpath("cleaned")
+        out.mkdir()
+        with self.assertNoLogs(level="WARNING"):
+            resident = page_cache.prepare(page_cache.CacheMode.WARM, self.out, out)
+        self.assertIsNone(resident)
+
+    def test_evict(self):
+        self.assertEqual(page_cache.evict([self.out]), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -13,9 +13,11 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import argparse
 import dataclasses
 import datetime
 import glob
+import heapq
 import json
 import logging
 import os
@@ -25,14 +27,17 @@ import shutil
 import subprocess
 import textwrap
 from pathlib import Path
-from typing import Iterable
-
-from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics
-from metrics_proto.metrics_pb2 import MetricsBase
-from metrics_proto.metrics_pb2 import PerfInfo
-from metrics_proto.metrics_pb2 import SoongBuildMetrics
-
+from typing import Optional
+
+import bazel_profile
+import build_trace
+import metrics_db
+import ninja_actions
+import ninja_fingerprint
+import overhead
+import resource_sampler
 import util
+from metrics_db import MetricsDb
 
 
 @dataclasses.dataclass
@@ -61,6 +66,9 @@ BUILD_TRACE_GZ = "build.trace.gz"
 CRITICAL_PATH = "soong.log"
 SOONG_BUILD_PB = "soong_build_metrics.pb"
 SOONG_PB = "soong_metrics"
+# sidecar caching the parsed metrics protos of a run
+PBS_CACHE = "metrics_pbs.json"
+PBS_CACHE_VERSION = 1
 
 def _convert_pprof_to_human_readable_format(pprof: Path, output_type: str = 'pdf'):
     output = pprof.with_suffix("." + output_type).name
@@ -87,6 +95,10 @@ def _archive_pprof(envvar: str, d:Path):
 
 
 def archive_run(d: Path, build_info: util.BuildInfo):
+    """
+    Copies the metrics files of the build into `d` and, if `d` is a run dir,
+    records its metrics in the log dir's metrics store
+    """
     with open(d.joinpath(util.BUILD_INFO_JSON), "w") as f:
         json.dump(build_info, f, indent=True, cls=util.CustomEncoder)
     metrics_to_copy = [
@@ -102,22 +114,35 @@ def archive_run(d: Path, build_info: util.BuildInfo):
             shutil.copy(metric, d.joinpath(metric_name))
     _archive_pprof("SOONG_PROFILE_CPU", d)
     _archive_pprof("SOONG_PROFILE_MEM", d)
+    if d.name.startswith(util.RUN_DIR_PREFIX):
+        with MetricsDb(d.parent) as db:
+            _record_run(db, d)
 
 
-def read_pbs(d: Path) -> tuple[dict[str, any], list[PerfInfoOrEvent]]:
+# raw (id, real_time, start_time) of a PerfInfoOrEvent, times in nanoseconds
+_RawEvent = tuple[str, int, int]
+
+
+def _parse_pbs(d: Path) -> tuple[dict[str, any], list[_RawEvent]]:
     """
-    Reads metrics data from pb files and archives the file by copying
-    them under the log_dir.
+    Parses the metrics protos in `d`.
     Soong_build event names may contain "mixed_build" event. To normalize the
     event names between mixed builds and soong-only build, convert
       `soong_build/soong_build.xyz` and `soong_build/soong_build.mixed_build.xyz`
     both to simply `soong_build/*.xyz`
     """
+    # imported here rather than at the top level as loading the protos is
+    # a large part of the startup time of every tool importing this module
+    from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics
+    from metrics_proto.metrics_pb2 import MetricsBase
+    from metrics_proto.metrics_pb2 import PerfInfo
+    from metrics_proto.metrics_pb2 import SoongBuildMetrics
+
     soong_pb = d.joinpath(SOONG_PB)
     soong_build_pb = d.joinpath(SOONG_BUILD_PB)
     bp2build_pb = d.joinpath(BP2BUILD_PB)
 
-    events: list[PerfInfoOrEvent] = []
+    events: list[_RawEvent] = []
 
     def gen_id(name: str, desc: str) -> str:
         # Bp2BuildMetrics#Event doesn't have description
@@ -125,21 +150,16 @@ def read_pbs(d: Path) -> tuple[dict[str, any], list[PerfInfoOrEvent]]:
         return f"{name}/{normalized}"
 
     def extract_perf_info(root_obj):
-        for field_name in dir(root_obj):
-            if field_name.startswith("__"):
+        # only the repeated PerfInfo fields, as declared by the message type
+        for field in root_obj.DESCRIPTOR.fields:
+            if (
+                field.label != field.LABEL_REPEATED
+                or field.message_type != PerfInfo.DESCRIPTOR
+            ):
                 continue
-            field_value = getattr(root_obj, field_name)
-            if isinstance(field_value, Iterable):
-                for item in field_value:
-                    if not isinstance(item, PerfInfo):
-                        break
-                    events.append(
-                        PerfInfoOrEvent(
-                            gen_id(item.name, item.description),
-                            item.real_time,
-                            item.start_time,
-                        )
-                    )
+            for item in getattr(root_obj, field.name):
+                event_id = gen_id(item.name, item.description)
+                events.append((event_id, item.real_time, item.start_time))
 
     if soong_pb.exists():
         metrics_base = MetricsBase()
@@ -158,11 +178,7 @@ def read_pbs(d: Path) -> tuple[dict[str, any], list[PerfInfoOrEvent]]:
         with open(bp2build_pb, "rb") as f:
             bp2build_metrics.ParseFromString(f.read())
         for event in bp2build_metrics.events:
-            events.append(
-                PerfInfoOrEvent(event.name, event.real_time, event.start_time)
-            )
-
-    events.sort(key=lambda e: e.start_time)
+            events.append((event.name, event.real_time, event.start_time))
 
     retval = {}
     if soong_build_metrics.mixed_builds_info:
@@ -183,75 +199,117 @@ def read_pbs(d: Path) -> tuple[dict[str, any], list[PerfInfoOrEvent]]:
     return retval, events
 
 
+def _pbs_key(d: Path) -> dict[str, Optional[int]]:
+    """:return: the mtimes of the metrics protos in `d` that the cache is valid for"""
+    key = {"version": PBS_CACHE_VERSION}
+    for pb in (SOONG_PB, SOONG_BUILD_PB, BP2BUILD_PB):
+        try:
+            key[pb] = os.stat(d.joinpath(pb)).st_mtime_ns
+        except FileNotFoundError:
+            key[pb] = None
+    return key
+
+
+def read_pbs(d: Path) -> tuple[dict[str, any], list[PerfInfoOrEvent]]:
+    """
+    Reads metrics data from the pb files in `d`, see `_parse_pbs`.
+    The result is cached in a sidecar file in `d`, which is used for as long
+    as the pb files are unchanged.
+    """
+    cache = d.joinpath(PBS_CACHE)
+    key = _pbs_key(d)
+    cached = None
+    try:
+        with open(cache) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if cached and cached.get("key") == key:
+        extra, events = cached["extra"], cached["events"]
+    else:
+        extra, events = _parse_pbs(d)
+        try:
+            with open(cache, "w") as f:
+                json.dump({"key": key, "extra": extra, "events": events}, f)
+        except OSError as e:
+            logging.warning("could not cache %s: %s", cache, e)
+    perf_events = [PerfInfoOrEvent(*e) for e in events]
+    perf_events.sort(key=lambda e: e.start_time)
+    return extra, perf_events
+
+
 Row = dict[str, any]
 
 
+def _find_cycle(start: str, nexts: dict[str, set[str]]) -> list[str]:
+    """
+    :return: a path from `start` back to itself, e.g. [a, b, a], or an empty
+    list if there is none
+    """
+    path = [start]
+    visited: set[str] = set()
+    # depth-first, iteratively as there may be thousands of columns
+    pending = [iter(sorted(nexts[start]))]
+    while pending:
+        n = next(pending[-1], None)
+        if n is None:
+            pending.pop()
+            path.pop()
+        elif n == start:
+            return [*path, start]
+        elif n not in visited and n in nexts:
+            visited.add(n)
+            path.append(n)
+            pending.append(iter(sorted(nexts[n])))
+    return []
+
+
 def _get_column_headers(rows: list[Row], allow_cycles: bool) -> list[str]:
     """
     Basically a topological sort or column headers. For each Row, the column order
     can be thought of as a partial view of a chain of events in chronological
     order. It's a partial view because not all events may have needed to occur for
     a build.
+    Ties, i.e. concurrent events, are broken alphabetically. When there is a
+    cycle, the column with the fewest unsorted predecessors is taken next.
     """
-
-    @dataclasses.dataclass
-    class Column:
-        header: str
-        indegree: int
-        nexts: set[str]
-
-        def __str__(self):
-            return f"#{self.indegree}->{self.header}->{self.nexts}"
-
-        def dfs(self, target: str, visited: set[str] = None) -> list[str]:
-            if not visited:
-                visited = set()
-            if target == self.header and self.header in visited:
-                return [self.header]
-            for n in self.nexts:
-                if n in visited:
-                    continue
-                visited.add(n)
-                next_col = all_cols[n]
-                path = next_col.dfs(target, visited)
-                if path:
-                    return [self.header, *path]
-            return []
-
-    all_cols: dict[str, Column] = {}
+    indegree: dict[str, int] = {}
+    nexts: dict[str, set[str]] = {}
     for row in rows:
         prev_col = None
         for col in row:
-            if col not in all_cols:
-                column = Column(col, 0, set())
-                all_cols[col] = column
-            if prev_col is not None and col not in prev_col.nexts:
-                all_cols[col].indegree += 1
-                prev_col.nexts.add(col)
-            prev_col = all_cols[col]
-
+            if col not in nexts:
+                indegree[col] = 0
+                nexts[col] = set()
+            if prev_col is not None and col not in nexts[prev_col]:
+                indegree[col] += 1
+                nexts[prev_col].add(col)
+            prev_col = col
+
+    # Kahn's algorithm with a priority queue; as indegrees only decrease, a
+    # column is re-queued when its indegree changes and stale entries, i.e. of
+    # columns already taken or with a higher indegree, are skipped
+    queue = [(d, col) for col, d in indegree.items()]
+    heapq.heapify(queue)
     acc = []
-    entries = [c for c in all_cols.values()]
-    while len(entries) > 0:
-        # sorting alphabetically to break ties for concurrent events
-        entries.sort(key=lambda c: c.header, reverse=True)
-        entries.sort(key=lambda c: c.indegree, reverse=True)
-        entry = entries.pop()
-        # take only one to maintain alphabetical sort
-        if entry.indegree != 0:
-            cycle = "->".join(entry.dfs(entry.header))
+    taken: set[str] = set()
+    while queue:
+        d, col = heapq.heappop(queue)
+        if col in taken or d != indegree[col]:
+            continue
+        if d != 0:
+            cycle = "->".join(_find_cycle(col, nexts))
             s = f"event ordering has a cycle {cycle}"
             logging.debug(s)
             if not allow_cycles:
                 raise ValueError(s)
-        acc.append(entry.header)
-        for n in entry.nexts:
-            n = all_cols.get(n)
-            if n is not None:
-                n.indegree -= 1
-            else:
-                if not allow_cycles:
-                    raise ValueError(f"unexpected error for: {n}")
+        acc.append(col)
+        taken.add(col)
+        for n in nexts[col]:
+            if n in taken:
+                continue
+            indegree[n] -= 1
+            heapq.heappush(queue, (indegree[n], n))
     return acc
 
 
@@ -276,21 +334,73 @@ def _get_prefix_headers(prefix_rows: list[Row]) -> list[str]:
     return prefix_headers
 
 
-def tabulate_metrics_csv(log_dir: Path):
-    prefix_rows: list[Row] = []
-    rows: list[Row] = []
+def _run_seq(run_dir_name: str) -> int:
+    return int(run_dir_name[1 + len(util.RUN_DIR_PREFIX) :])
+
+
+def _read_run(d: Path) -> tuple[Row, Row]:
+    """:return: the metrics and the timed events of the run in `d`"""
+    prefix_row = get_build_info(d)
+    prefix_row["log"] = d.name
+    prefix_row["targets"] = " ".join(prefix_row.get("targets", []))
+    extra, events = read_pbs(d)
+    prefix_row = prefix_row | extra | ninja_actions.read_summary(d)
+    prefix_row |= bazel_profile.read_summary(d)
+    prefix_row |= resource_sampler.read_summary(d)
+    prefix_row |= overhead.read_summary(d)
+    prefix_row |= ninja_fingerprint.read_summary(d)
+    row = {e.id: util.hhmmss(e.real_time) for e in events}
+    row |= build_trace.read_summary(d, d.joinpath(BUILD_TRACE_GZ))
+    return prefix_row, row
+
+
+def _record_run(db: MetricsDb, d: Path):
+    prefix_row, row = _read_run(d)
+    db.add_run(d.name, _run_seq(d.name), prefix_row, row)
+
+
+def import_log_dir(db: MetricsDb, log_dir: Path):
+    """records the run dirs of `log_dir` that aren't in the store yet"""
+    recorded = db.logs()
     dirs = glob.glob(f"{util.RUN_DIR_PREFIX}*", root_dir=log_dir)
-    dirs.sort(key=lambda x: int(x[1 + len(util.RUN_DIR_PREFIX) :]))
+    dirs = [d for d in dirs if d not in recorded]
+    dirs.sort(key=_run_seq)
     for d in dirs:
-        d = log_dir.joinpath(d)
-        prefix_row = get_build_info(d)
-        prefix_row["log"] = d.name
-        prefix_row["targets"] = " ".join(prefix_row.get("targets", []))
-        extra, events = read_pbs(d)
-        prefix_row = prefix_row | extra
-        row = {e.id: util.hhmmss(e.real_time) for e in events}
-        prefix_rows.append(prefix_row)
-        rows.append(row)
+        logging.debug("importing %s", d)
+        _record_run(db, log_dir.joinpath(d))
+
+
+def merge_worker_logs(log_dir: Path):
+    """
+    Records the runs of the log dirs of concurrent workers, see workers.py, in
+    the store of `log_dir`, worker by worker and named e.g. `worker-1/run-003`
+    """
+
+    def worker_seq(name: str) -> int:
+        return int(name[1 + len(util.WORKER_DIR_PREFIX) :])
+
+    with MetricsDb(log_dir) as db:
+        recorded = db.logs()
+        seq = db.last_seq()
+        workers = glob.glob(f"{util.WORKER_DIR_PREFIX}-*", root_dir=log_dir)
+        for w in sorted(workers, key=worker_seq):
+            worker_dir = log_dir.joinpath(w)
+            dirs = glob.glob(f"{util.RUN_DIR_PREFIX}*", root_dir=worker_dir)
+            for d in sorted(dirs, key=_run_seq):
+                log = f"{w}/{d}"
+                if log in recorded:
+                    continue
+                seq += 1
+                prefix_row, row = _read_run(worker_dir.joinpath(d))
+                prefix_row["log"] = log
+                db.add_run(log, seq, prefix_row, row)
+
+
+def tabulate_metrics_csv(log_dir: Path):
+    with MetricsDb(log_dir) as db:
+        # e.g. log dirs of sessions predating the store
+        import_log_dir(db, log_dir)
+        prefix_rows, rows = db.rows()
 
     prefix_headers: list[str] = _get_prefix_headers(prefix_rows)
     headers: list[str] = _get_column_headers(rows, allow_cycles=True)
@@ -323,3 +433,21 @@ def display_tabulated_metrics(log_dir: Path, ci_mode: bool):
         output,
         util.get_csv_columns_cmd(log_dir),
     )
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description="Records the runs of incremental_build log dirs in their "
+        f"metrics store ({metrics_db.METRICS_DB}), e.g. for log dirs of "
+        f"sessions predating it, and tabulates their {util.METRICS_TABLE}"
+    )
+    p.add_argument("log_dirs", nargs="+", type=Path, help="log dirs to import")
+    options = p.parse_args()
+    for log_dir in options.log_dirs:
+        tabulate_metrics_csv(log_dir.resolve())
+        logging.info("imported %s", log_dir)
+
+
+if __name__ == "__main__":
+    logging.root.setLevel(logging.INFO)
+    main()
@@ -14,8 +14,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import dataclasses
+import datetime
+import random
+import tempfile
 import unittest
+from pathlib import Path
+from unittest import mock
 
+import perf_metrics
+from metrics_db import MetricsDb
 from perf_metrics import _get_column_headers
 
 
@@ -60,6 +67,58 @@ class PerfMetricsTest(unittest.TestCase):
                 ):
                     _get_column_headers(rows, allow_cycles=False)
 
+    def test_get_column_headers_large(self):
+        rng = random.Random(0)
+        chronology = [f"event.{i:04d}" for i in range(2_000)]
+        rows = [
+            dict.fromkeys(chronology[i] for i in sorted(rng.sample(range(2_000), 200)))
+            for _ in range(50)
+        ]
+        headers = _get_column_headers(rows, allow_cycles=False)
+        self.assertEqual(headers, sorted({col for row in rows for col in row}))
+
+    def test_read_pbs_is_cached(self):
+        parsed = ({"modules": 3}, [("b", 2_000, 2_000_000), ("a", 1_000, 1_000_000)])
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(
+            perf_metrics, "_parse_pbs", return_value=parsed
+        ) as parse:
+            d = Path(tmp)
+            d.joinpath(perf_metrics.SOONG_PB).write_bytes(b"")
+            extra, events = perf_metrics.read_pbs(d)
+            self.assertEqual(extra, {"modules": 3})
+            self.assertEqual([e.id for e in events], ["a", "b"])
+            self.assertEqual(events[0].real_time, datetime.timedelta(microseconds=1))
+
+            self.assertEqual(perf_metrics.read_pbs(d), (extra, events))
+            self.assertEqual(parse.call_count, 1)
+
+            # a changed proto invalidates the cache
+            d.joinpath(perf_metrics.BP2BUILD_PB).write_bytes(b"")
+            perf_metrics.read_pbs(d)
+            self.assertEqual(parse.call_count, 2)
+
+    def test_merge_worker_logs(self):
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.object(
+            perf_metrics, "read_pbs", return_value=({}, [])
+        ):
+            log_dir = Path(tmp)
+            for worker, runs in (("worker-10", 1), ("worker-2", 2)):
+                for i in range(1, runs + 1):
+                    d = log_dir.joinpath(worker, f"run-{i:03d}")
+                    d.mkdir(parents=True)
+                    d.joinpath("build_info.json").write_text(
+                        f'{{"description": "{worker} {i}", "worker": {worker[7:]}}}'
+                    )
+            perf_metrics.merge_worker_logs(log_dir)
+            perf_metrics.merge_worker_logs(log_dir)
+            with MetricsDb(log_dir) as db:
+                prefix_rows, _ = db.rows()
+            self.assertEqual(
+                [r["log"] for r in prefix_rows],
+                ["worker-2/run-001", "worker-2/run-002", "worker-10/run-001"],
+            )
+            self.assertEqual(prefix_rows[2]["worker"], "10")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -13,18 +13,22 @@
 # limitations under the License.
 import argparse
 import csv
+import dataclasses
 import datetime
 import enum
 import logging
+import math
 import re
 import statistics
 import subprocess
+import sys
 import textwrap
 from pathlib import Path
 
 from typing import Iterable, NewType, TextIO, TypeVar
 
 import plot_metrics
+import stats
 import util
 
 Row = NewType("Row", dict[str, str])
@@ -36,8 +40,14 @@ def _normalize_rebuild(row: Row):
         r"^(rebuild)-[\d+](.*)$", "\\1\\2", row.get("description")
     )
 
-def _get_tagged_build_type(row: Row) -> str:
+def _get_cached_build_type(row: Row) -> str:
+    """builds with cold and warm caches are never aggregated together"""
     build_type = row.get("build_type")
+    cache_mode = row.get("cache_mode")
+    return build_type if not cache_mode else f"{build_type}/{cache_mode}"
+
+def _get_tagged_build_type(row: Row) -> str:
+    build_type = _get_cached_build_type(row)
     tag = row.get("tag")
     return build_type if not tag else f"{build_type}:{tag}"
 
@@ -60,6 +70,8 @@ class Aggregation(enum.Enum):
     MEDIAN = (statistics.median,)
     MIN = (min,)
     STDEV = (statistics.stdev,)
+    # reported as the mean with the half-width of its 95% confidence interval
+    CI95 = (stats.ci_half_width,)
 
     N = TypeVar("N", int, float)
 
@@ -67,6 +79,25 @@ class Aggregation(enum.Enum):
         return self.value[0](xs)
 
 
+def _parse_values(prop: str, rows: list[Row]) -> tuple[list[float], bool]:
+    """
+    :return: the non-empty values of `prop`, as seconds for time periods, and
+    whether they are plain numbers rather than time periods
+    """
+    vals = [x.get(prop) for x in rows]
+    vals = [x for x in vals if bool(x)]
+    isnum = any(x.isnumeric() for x in vals)
+    if isnum:
+        return [int(x) for x in vals], True
+    return [util.period_to_seconds(x) for x in vals], False
+
+
+def _format_value(v: float, isnum: bool) -> str:
+    if isnum:
+        return f"{v:.0f}"
+    return util.hhmmss(datetime.timedelta(seconds=v))
+
+
 def _aggregate(prop: str, rows: list[Row], agg: Aggregation) -> str:
     """
     compute the requested aggregation
@@ -74,18 +105,19 @@ def _aggregate(prop: str, rows: list[Row], agg: Aggregation) -> str:
     """
     if not rows:
         return ""
-    vals = [x.get(prop) for x in rows]
-    vals = [x for x in vals if bool(x)]
+    vals, isnum = _parse_values(prop, rows)
     if len(vals) == 0:
         return ""
 
-    isnum = any(x.isnumeric() for x in vals)
-    if isnum:
-        vals = [int(x) for x in vals]
-        cell = f"{(agg.fn(vals)):.0f}"
+    def fmt(v):
+        return _format_value(v, isnum)
+
+    if agg == Aggregation.CI95:
+        cell = fmt(statistics.mean(vals))
+        if len(vals) > 1:
+            cell = f"{cell}±{fmt(agg.fn(vals))}"
     else:
-        vals = [util.period_to_seconds(x) for x in vals]
-        cell = util.hhmmss(datetime.timedelta(seconds=agg.fn(vals)))
+        cell = fmt(agg.fn(vals))
 
     if len(vals) > 1:
         cell = f"{cell}[N={len(vals)}]"
@@ -145,6 +177,208 @@ def summarize_helper(metrics: TextIO, regex: str, agg: Aggregation) -> dict[str,
     return {prop: tabulate(prop) for prop in properties}
 
 
+@dataclasses.dataclass(frozen=True)
+class Comparison:
+    cuj: str
+    targets: str
+    build_type: str
+    prop: str
+    base: str
+    """formatted median of the base values"""
+    candidate: str
+    """formatted median of the candidate values"""
+    change: float
+    """relative change of the median"""
+    effect: float
+    """rank-biserial correlation, positive if candidate values tend to be larger"""
+    p_value: float
+    n_base: int
+    n_candidate: int
+    regressed: bool
+    improved: bool
+
+    @staticmethod
+    def headers() -> list[str]:
+        return [
+            "cuj",
+            "targets",
+            "build_type",
+            "property",
+            "base",
+            "candidate",
+            "change",
+            "effect",
+            "p",
+            "N",
+            "verdict",
+        ]
+
+    def cells(self) -> list[str]:
+        verdict = "REGRESSED" if self.regressed else "improved" if self.improved else ""
+        return [
+            self.cuj,
+            self.targets,
+            self.build_type,
+            self.prop,
+            self.base,
+            self.candidate,
+            f"{self.change:+.1%}",
+            f"{self.effect:+.2f}",
+            f"{self.p_value:.3g}",
+            f"{self.n_base}/{self.n_candidate}",
+            verdict,
+        ]
+
+
+def compare_helper(
+    base_rows: list[Row],
+    candidate_rows: list[Row],
+    regex: str,
+    threshold: float,
+    alpha: float,
+    filter_cujs: bool = True,
+) -> list[Comparison]:
+    """
+    Compares the properties matching `regex` for each cuj, targets and build
+    type with a Mann-Whitney U test. All properties are taken to be
+    lower-is-better, e.g. times and action counts.
+    Args:
+      base_rows, candidate_rows: rows of metrics.csv files
+      threshold: relative change of the median beyond which a significant
+        change is a regression or improvement
+      alpha: significance level
+    """
+    p = re.compile(regex)
+
+    def group(rows: list[Row]) -> dict[tuple[str, str, str], list[Row]]:
+        rows = [row for row in rows if acceptable(row)]
+        for row in rows:
+            _normalize_rebuild(row)
+        if filter_cujs:
+            rows = [
+                row
+                for row in rows
+                if not re.search("WARMUP|rebuild", row.get("description"))
+            ]
+        return util.groupby(
+            rows,
+            lambda l: (
+                l.get("description"),
+                l.get("targets"),
+                _get_cached_build_type(l),
+            ),
+        )
+
+    base_groups = group(base_rows)
+    candidate_groups = group(candidate_rows)
+    properties = [
+        prop
+        for prop in dict.fromkeys(k for row in candidate_rows for k in row)
+        if p.search(prop) and any(prop in row for row in base_rows)
+    ]
+    if len(properties) == 0:
+        logging.error("no matching properties found")
+
+    comparisons = []
+    for key, candidates in candidate_groups.items():
+        bases = base_groups.get(key)
+        if not bases:
+            continue
+        for prop in properties:
+            base_vals, isnum = _parse_values(prop, bases)
+            candidate_vals, _ = _parse_values(prop, candidates)
+            if not base_vals or not candidate_vals:
+                continue
+            base_median = statistics.median(base_vals)
+            candidate_median = statistics.median(candidate_vals)
+            if base_median:
+                change = (candidate_median - base_median) / base_median
+            else:
+                change = math.inf if candidate_median else 0.0
+            u, p_value = stats.mann_whitney_u(base_vals, candidate_vals)
+            significant = p_value < alpha
+            comparisons.append(
+                Comparison(
+                    *key,
+                    prop=prop,
+                    base=_format_value(base_median, isnum),
+                    candidate=_format_value(candidate_median, isnum),
+                    change=change,
+                    effect=stats.rank_biserial(
+                        u, len(base_vals), len(candidate_vals)
+                    ),
+                    p_value=p_value,
+                    n_base=len(base_vals),
+                    n_candidate=len(candidate_vals),
+                    regressed=significant and change > threshold,
+                    improved=significant and change < -threshold,
+                )
+            )
+    return comparisons
+
+
+def _read_rows(metrics_csv: Path) -> list[Row]:
+    with open(metrics_csv, "rt") as f:
+        return list(csv.DictReader(f))
+
+
+def _rows_for(tag_or_dir: str, metrics_csv: Path) -> list[Row]:
+    """
+    :return: the rows of the metrics.csv in `tag_or_dir` if it is a log dir,
+    otherwise the rows of `metrics_csv` tagged `tag_or_dir`
+    """
+    p = Path(tag_or_dir)
+    if p.is_dir():
+        return _read_rows(p.joinpath(util.METRICS_TABLE))
+    if p.is_file():
+        return _read_rows(p)
+    rows = [row for row in _read_rows(metrics_csv) if row.get("tag") == tag_or_dir]
+    if not rows:
+        logging.error("no rows tagged %s in %s", tag_or_dir, metrics_csv)
+    return rows
+
+
+def compare(
+    base: str,
+    candidate: str,
+    metrics_csv: Path,
+    regex: str,
+    output_dir: Path,
+    threshold: float,
+    alpha: float,
+    filter_cujs: bool = True,
+) -> bool:
+    """
+    writes the comparison of two tags or log dirs to `output_dir`
+    :return: whether any property regressed
+    """
+    comparisons = compare_helper(
+        _rows_for(base, metrics_csv),
+        _rows_for(candidate, metrics_csv),
+        regex,
+        threshold,
+        alpha,
+        filter_cujs,
+    )
+    compare_csv = output_dir.joinpath("compare.csv")
+    compare_csv.parent.mkdir(parents=True, exist_ok=True)
+    with open(compare_csv, mode="wt") as f:
+        f.write(_write_table([Comparison.headers(), *(c.cells() for c in comparisons)]))
+    _display_summarized_metrics(compare_csv, filter_cujs=False)
+    regressions = [c for c in comparisons if c.regressed]
+    for c in regressions:
+        logging.error(
+            "%s %s [%s] %s regressed %+.1f%% (p=%.3g)",
+            c.build_type,
+            c.targets,
+            c.cuj,
+            c.prop,
+            100 * c.change,
+            c.p_value,
+        )
+    return len(regressions) > 0
+
+
 def _display_summarized_metrics(summary_csv: Path, filter_cujs: bool):
     cmd = (
         (
@@ -226,11 +460,47 @@ def main():
         default="svg",
         help="graph output format, e.g. png, svg etc"
     )
+    p.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("BASE", "CANDIDATE"),
+        help="Compare two tags of the metrics.csv file, or two log dirs, "
+        "instead of summarizing. Exits with 1 if any property regressed",
+    )
+    p.add_argument(
+        "--threshold",
+        type=float,
+        default=0.05,
+        help="With --compare, the relative change of the median beyond which "
+        "a significant change is a regression. Defaults to %(default)s",
+    )
+    p.add_argument(
+        "--alpha",
+        type=float,
+        default=0.05,
+        help="With --compare, the significance level. Defaults to %(default)s",
+    )
     options = p.parse_args()
     metrics_csv = Path(options.metrics)
     aggregation: Aggregation = options.statistic
     if metrics_csv.exists() and metrics_csv.is_dir():
         metrics_csv = metrics_csv.joinpath(util.METRICS_TABLE)
+    if options.compare:
+        base, candidate = options.compare
+        output_dir = (
+            Path(candidate) if Path(candidate).is_dir() else metrics_csv.parent
+        ).joinpath("perf")
+        regressed = compare(
+            base=base,
+            candidate=candidate,
+            metrics_csv=metrics_csv,
+            regex=options.properties,
+            output_dir=output_dir,
+            threshold=options.threshold,
+            alpha=options.alpha,
+            filter_cujs=options.filter,
+        )
+        sys.exit(1 if regressed else 0)
     if not metrics_csv.exists():
         raise RuntimeError(f"{metrics_csv} does not exit")
     summarize(
@@ -17,6 +17,7 @@ import unittest
 from typing import TextIO
 
 from pretty import Aggregation
+from pretty import compare_helper
 from pretty import summarize_helper
 
 
@@ -87,6 +88,90 @@ class PrettyTest(unittest.TestCase):
             result["ac"],
         )
 
+    def test_summarize_ci(self):
+        result = summarize_helper(self.metrics, "a$|ac", Aggregation.CI95)
+        self.assertEqual(
+            textwrap.dedent(
+                """\
+                cuj,targets,B1,B2
+                WARMUP,nothing,1,
+                do it,something,10,601
+                do it,nothing,,3600
+                rebuild,something,5±13[N=2],
+                undo it,something,,240
+                """
+            ),
+            result["a"],
+        )
+        self.assertIn("rebuild,something,01:06±00:19[N=2],", result["ac"])
+
+    def test_summarize_cache_modes_apart(self):
+        metrics = io.StringIO(
+            textwrap.dedent(
+                """\
+                build_result,build_type,cache_mode,description,targets,time
+                SUCCESS,B1,cold,do it,nothing,1:00
+                SUCCESS,B1,warm,do it,nothing,0:10
+                SUCCESS,B1,cold,do it,nothing,1:10
+                SUCCESS,B1,,do it,nothing,0:30
+                """
+            )
+        )
+        result = summarize_helper(metrics, "time", Aggregation.MEDIAN)
+        self.assertEqual(
+            textwrap.dedent(
+                """\
+                cuj,targets,B1/cold,B1/warm,B1
+                do it,nothing,01:05[N=2],00:10,00:30
+                """
+            ),
+            result["time"],
+        )
+
+    def test_compare(self):
+        def rows(tag: str, times: list[str], actions: list[int]) -> list[dict]:
+            return [
+                {
+                    "build_result": "SUCCESS",
+                    "build_type": "B1",
+                    "description": "do it",
+                    "targets": "something",
+                    "tag": tag,
+                    "time": t,
+                    "actions": str(a),
+                }
+                for t, a in zip(times, actions)
+            ]
+
+        base = rows("base", ["1:00", "1:01", "0:59", "1:02", "1:00"], [5] * 5)
+        candidate = rows("new", ["1:10", "1:12", "1:09", "1:11", "1:13"], [5] * 5)
+        candidate.append({**candidate[0], "description": "rebuild-1 after do it"})
+        comparisons = compare_helper(base, candidate, "^(time|actions)$", 0.05, 0.05)
+        self.assertEqual([c.prop for c in comparisons], ["time", "actions"])
+        time, actions = comparisons
+        self.assertEqual(
+            time.cells(),
+            [
+                "do it",
+                "something",
+                "B1",
+                "time",
+                "01:00",
+                "01:11",
+                "+18.3%",
+                "+1.00",
+                "0.0119",
+                "5/5",
+                "REGRESSED",
+            ],
+        )
+        self.assertFalse(actions.regressed)
+        self.assertEqual(actions.p_value, 1.0)
+
+        # a regression that is too small to matter
+        comparisons = compare_helper(base, candidate, "^time$", 0.2, 0.05)
+        self.assertFalse(comparisons[0].regressed)
+
     def test_summarize_loose_pattern(self):
         result = summarize_helper(self.metrics, "^a", Aggregation.MEDIAN)
         self.assertEqual(len(result), 3)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Benchmarks `perf_metrics.read_pbs` over every run of a log dir, without and
+with the cached parsed metrics, by default over a synthetic 500-run log dir.
+"""
+import argparse
+import glob
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import perf_metrics
+import util
+
+
+def _add_perf_infos(msg, perf_info_type, count: int):
+    """adds `count` entries to each of the repeated PerfInfo fields of `msg`"""
+    for field in msg.DESCRIPTOR.fields:
+        if (
+            field.label != field.LABEL_REPEATED
+            or field.message_type != perf_info_type.DESCRIPTOR
+        ):
+            continue
+        for i in range(count):
+            item = getattr(msg, field.name).add()
+            item.name = field.name
+            item.description = f"soong_build.{field.name}.{i}"
+            item.start_time = 1_700_000_000_000_000_000 + i * 1_000_000
+            item.real_time = 1_000_000 + i
+
+
+def create_log_dir(log_dir: Path, runs: int, events: int):
+    from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics
+    from metrics_proto.metrics_pb2 import MetricsBase
+    from metrics_proto.metrics_pb2 import PerfInfo
+    from metrics_proto.metrics_pb2 import SoongBuildMetrics
+
+    metrics_base = MetricsBase()
+    _add_perf_infos(metrics_base, PerfInfo, events)
+    soong_build_metrics = SoongBuildMetrics()
+    _add_perf_infos(soong_build_metrics, PerfInfo, events)
+    bp2build_metrics = Bp2BuildMetrics()
+    bp2build_metrics.generatedModuleCount = 1000
+    for i in range(events):
+        event = bp2build_metrics.events.add()
+        event.name = f"bp2build.{i}"
+        event.start_time = 1_700_000_000_000_000_000 + i * 1_000_000
+        event.real_time = 1_000_000 + i
+
+    pbs = {
+        perf_metrics.SOONG_PB: metrics_base.SerializeToString(),
+        perf_metrics.SOONG_BUILD_PB: soong_build_metrics.SerializeToString(),
+        perf_metrics.BP2BUILD_PB: bp2build_metrics.SerializeToString(),
+    }
+    for i in range(runs):
+        run_dir = log_dir.joinpath(f"{util.RUN_DIR_PREFIX}-{i:03d}")
+        run_dir.mkdir(parents=True)
+        for name, data in pbs.items():
+            run_dir.joinpath(name).write_bytes(data)
+
+
+def _read_all(run_dirs: list[Path]) -> float:
+    start = time.perf_counter()
+    for d in run_dirs:
+        perf_metrics.read_pbs(d)
+    return time.perf_counter() - start
+
+
+def benchmark(log_dir: Path):
+    run_dirs = [
+        log_dir.joinpath(d)
+        for d in glob.glob(f"{util.RUN_DIR_PREFIX}*", root_dir=log_dir)
+    ]
+    for d in run_dirs:
+        d.joinpath(perf_metrics.PBS_CACHE).unlink(missing_ok=True)
+    cold = _read_all(run_dirs)
+    warm = _read_all(run_dirs)
+    print(f"read_pbs over {len(run_dirs)} runs:")
+    print(f"  parsing protos:   {cold:8.3f}s")
+    print(f"  cached:           {warm:8.3f}s ({cold / warm:.1f}x)")
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument(
+        "--log-dir",
+        type=Path,
+        help="an existing log dir to benchmark instead of a synthetic one; "
+        "note that its cached parsed metrics are discarded",
+    )
+    p.add_argument("--runs", type=int, default=500, help="%(default)s")
+    p.add_argument(
+        "--events",
+        type=int,
+        default=50,
+        help="entries per repeated PerfInfo field, %(default)s",
+    )
+    options = p.parse_args()
+    if options.log_dir:
+        benchmark(options.log_dir)
+        return
+    with tempfile.TemporaryDirectory() as d:
+        create_log_dir(Path(d), options.runs, options.events)
+        benchmark(Path(d))
+
+
+if __name__ == "__main__":
+    logging.root.setLevel(logging.INFO)
+    main()
@@ -0,0 +1,323 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Samples the resource usage of a build's process tree from `/proc`.
+"""
+import csv
+import dataclasses
+import functools
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Final, Optional
+
+RESOURCES_CSV: Final[str] = "resources.csv"
+DEFAULT_INTERVAL: Final[float] = 1.0
+# the tools that RSS is broken down by
+TOOLS: Final[tuple[str, ...]] = (
+    "soong_ui",
+    "soong_build",
+    "kati",
+    "ninja",
+    "bazel",
+    "java",
+    "clang",
+    "other",
+)
+# the jar run by the bazel server; the server is a daemon and so it is not in
+# the build's process tree
+_BAZEL_SERVER_JAR: Final[bytes] = b"A-server.jar"
+_PROC: Final[Path] = Path("/proc")
+_MIB: Final[int] = 1 << 20
+
+
+@functools.cache
+def _clock_ticks() -> int:
+    return os.sysconf("SC_CLK_TCK")
+
+
+@functools.cache
+def _page_size() -> int:
+    return os.sysconf("SC_PAGE_SIZE")
+
+
+@dataclasses.dataclass(frozen=True)
+class ProcStat:
+    pid: int
+    ppid: int
+    comm: str
+    cpu_ticks: int
+    """user and system time including that of reaped children"""
+    rss: int
+    """in bytes"""
+
+    @staticmethod
+    def parse(pid: int, stat: str) -> "ProcStat":
+        # comm is in parentheses and may itself contain spaces or parentheses
+        comm_end = stat.rindex(")")
+        comm = stat[stat.index("(") + 1 : comm_end]
+        fields = stat[comm_end + 2 :].split()
+        # see proc(5), fields[0] is the 3rd field of the stat line
+        utime, stime, cutime, cstime = (int(f) for f in fields[11:15])
+        return ProcStat(
+            pid=pid,
+            ppid=int(fields[1]),
+            comm=comm,
+            cpu_ticks=utime + stime + cutime + cstime,
+            rss=int(fields[21]) * _page_size(),
+        )
+
+
+def _read_stat(pid: int) -> Optional[ProcStat]:
+    try:
+        with open(_PROC.joinpath(str(pid), "stat")) as f:
+            return ProcStat.parse(pid, f.read())
+    except (OSError, ValueError, IndexError):
+        # the process exited or isn't accessible
+        return None
+
+
+def _read_fields(pid: int, name: str, keys: tuple[str, ...]) -> dict[str, int]:
+    """reads `key: value` lines of /proc/<pid>/<name>"""
+    values = {}
+    try:
+        with open(_PROC.joinpath(str(pid), name)) as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in keys:
+                    values[key] = int(value.split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    return values
+
+
+@functools.cache
+def _is_bazel_server(pid: int) -> bool:
+    try:
+        with open(_PROC.joinpath(str(pid), "cmdline"), "rb") as f:
+            return _BAZEL_SERVER_JAR in f.read()
+    except OSError:
+        return False
+
+
+def tool_of(p: ProcStat) -> str:
+    comm = p.comm
+    if comm in ("soong_ui", "soong_build", "ninja"):
+        return comm
+    if comm in ("ckati", "kati"):
+        return "kati"
+    if comm == "bazel" or (comm == "java" and _is_bazel_server(p.pid)):
+        return "bazel"
+    if comm in ("java", "javac"):
+        return "java"
+    if comm.startswith("clang"):
+        return "clang"
+    return "other"
+
+
+@dataclasses.dataclass(frozen=True)
+class Sample:
+    t: int
+    """milliseconds since sampling started"""
+    cpu: int
+    """percentage of a core used since the previous sample"""
+    io_read: int
+    """bytes read from storage since the previous sample"""
+    io_write: int
+    """bytes written to storage since the previous sample"""
+    ctx_switches: int
+    """context switches since the previous sample"""
+    rss: dict[str, int]
+    """bytes, by tool"""
+
+    @property
+    def total_rss(self) -> int:
+        return sum(self.rss.values())
+
+
+@dataclasses.dataclass(frozen=True)
+class _Totals:
+    cpu_ticks: int = 0
+    io_read: int = 0
+    io_write: int = 0
+    ctx_switches: int = 0
+
+
+def snapshot(root_pid: int) -> tuple[_Totals, dict[str, int]]:
+    """
+    :return: the cumulative counters and the RSS by tool of the live processes
+    descending from `root_pid`, plus the bazel server.
+    CPU time and I/O of reaped processes are included through their parents,
+    context switches of reaped processes are not.
+    """
+    procs: dict[int, ProcStat] = {}
+    children: dict[int, list[int]] = {}
+    for entry in os.scandir(_PROC):
+        if not entry.name.isdigit():
+            continue
+        p = _read_stat(int(entry.name))
+        if p is None:
+            continue
+        procs[p.pid] = p
+        children.setdefault(p.ppid, []).append(p.pid)
+
+    tree = [
+        pid for pid, p in procs.items() if p.comm == "java" and tool_of(p) == "bazel"
+    ]
+    pending = [root_pid] if root_pid in procs else []
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+
+    totals = _Totals()
+    rss = dict.fromkeys(TOOLS, 0)
+    for pid in dict.fromkeys(tree):
+        p = procs[pid]
+        rss[tool_of(p)] += p.rss
+        io = _read_fields(pid, "io", ("read_bytes", "write_bytes"))
+        ctx = _read_fields(
+            pid, "status", ("voluntary_ctxt_switches", "nonvoluntary_ctxt_switches")
+        )
+        totals = _Totals(
+            cpu_ticks=totals.cpu_ticks + p.cpu_ticks,
+            io_read=totals.io_read + io.get("read_bytes", 0),
+            io_write=totals.io_write + io.get("write_bytes", 0),
+            ctx_switches=totals.ctx_switches + sum(ctx.values()),
+        )
+    return totals, rss
+
+
+class ResourceSampler:
+    """
+    Samples the resource usage of the process tree rooted at `root_pid` every
+    `interval` seconds on a background thread, for use as a context manager
+    around waiting for the root process.
+    """
+
+    def __init__(self, root_pid: int, interval: float = DEFAULT_INTERVAL):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.samples: list[Sample] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> "ResourceSampler":
+        if self.interval > 0 and _PROC.is_dir():
+            self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        start = time.monotonic()
+        prev_t = start
+        prev = _Totals()
+        first = True
+        while first or not self._stop.wait(self.interval):
+            try:
+                totals, rss = snapshot(self.root_pid)
+            except OSError as e:
+                logging.warning("stopped sampling resources: %s", e)
+                return
+            now = time.monotonic()
+            if first:
+                # a baseline, e.g. the bazel server has been running for a while
+                prev, prev_t, first = totals, now, False
+                continue
+
+            def delta(field: str) -> int:
+                # exited but not yet reaped processes drop out of the totals
+                return max(getattr(totals, field) - getattr(prev, field), 0)
+
+            self.samples.append(
+                Sample(
+                    t=round((now - start) * 1000),
+                    cpu=round(
+                        100 * delta("cpu_ticks") / _clock_ticks() / (now - prev_t)
+                    ),
+                    io_read=delta("io_read"),
+                    io_write=delta("io_write"),
+                    ctx_switches=delta("ctx_switches"),
+                    rss=rss,
+                )
+            )
+            prev, prev_t = totals, now
+
+    def summary(self) -> dict[str, int]:
+        """
+        :return: peak and mean values, with RSS and I/O in MiB
+        """
+        if not self.samples:
+            return {}
+        n = len(self.samples)
+        total_rss = [s.total_rss for s in self.samples]
+        return {
+            "cpu_mean": round(sum(s.cpu for s in self.samples) / n),
+            "cpu_peak": max(s.cpu for s in self.samples),
+            "rss_mean": round(sum(total_rss) / n / _MIB),
+            "rss_peak": round(max(total_rss) / _MIB),
+            "io_read": round(sum(s.io_read for s in self.samples) / _MIB),
+            "io_write": round(sum(s.io_write for s in self.samples) / _MIB),
+            "ctx_switches": sum(s.ctx_switches for s in self.samples),
+        }
+
+    def write_samples(self, run_dir: Path):
+        """writes the time series with sizes in KiB"""
+        with open(run_dir.joinpath(RESOURCES_CSV), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(
+                [
+                    "t_ms",
+                    "cpu_pct",
+                    "io_read_kib",
+                    "io_write_kib",
+                    "ctx_switches",
+                    *(f"rss_kib.{tool}" for tool in TOOLS),
+                ]
+            )
+            for s in self.samples:
+                writer.writerow(
+                    [
+                        s.t,
+                        s.cpu,
+                        s.io_read >> 10,
+                        s.io_write >> 10,
+                        s.ctx_switches,
+                        *(s.rss[tool] >> 10 for tool in TOOLS),
+                    ]
+                )
+
+
+def read_summary(run_dir: Path) -> dict[str, int]:
+    """:return: the peak RSS of each tool in MiB, from the stored time series"""
+    resources_csv = run_dir.joinpath(RESOURCES_CSV)
+    if not resources_csv.exists():
+        return {}
+    peaks: dict[str, int] = {}
+    with open(resources_csv, newline="") as f:
+        for row in csv.DictReader(f):
+            for col, val in row.items():
+                if col.startswith("rss_kib."):
+                    peaks[col] = max(peaks.get(col, 0), int(val))
+    return {
+        f"rss_peak.{col.removeprefix('rss_kib.')}": kib >> 10
+        for col, kib in peaks.items()
+        if kib
+    }
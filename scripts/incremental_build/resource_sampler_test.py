@@ -0,0 +1,79 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import resource_sampler
+from resource_sampler import ProcStat
+from resource_sampler import ResourceSampler
+
+
+class ResourceSamplerTest(unittest.TestCase):
+    def test_parse(self):
+        stat = (
+            "42 (soong (ui)) S 7 42 42 0 -1 4194560 100 0 0 0 "
+            "30 12 5 3 20 0 10 0 1000 123456 256 18446744073709551615"
+        )
+        p = ProcStat.parse(42, stat)
+        self.assertEqual(p.ppid, 7)
+        self.assertEqual(p.comm, "soong (ui)")
+        self.assertEqual(p.cpu_ticks, 50)
+        self.assertEqual(p.rss, 256 * os.sysconf("SC_PAGE_SIZE"))
+
+    def test_tool_of(self):
+        def tool(comm: str) -> str:
+            return resource_sampler.tool_of(ProcStat(-1, 0, comm, 0, 0))
+
+        self.assertEqual(tool("soong_build"), "soong_build")
+        self.assertEqual(tool("ckati"), "kati")
+        self.assertEqual(tool("clang++"), "clang")
+        self.assertEqual(tool("javac"), "java")
+        self.assertEqual(tool("bash"), "other")
+
+    @unittest.skipUnless(Path("/proc/self/stat").exists(), "requires /proc")
+    def test_sampling(self):
+        # a child that spawns a grandchild, both busy for a while
+        busy = "import time\nend = time.time() + 0.5\nwhile time.time() < end: pass"
+        script = (
+            f"import subprocess, sys\n"
+            f"p = subprocess.Popen([sys.executable, '-c', {busy!r}])\n"
+            f"{busy}\n"
+            f"p.wait()"
+        )
+        p = subprocess.Popen([sys.executable, "-c", script])
+        with ResourceSampler(p.pid, interval=0.05) as sampler:
+            p.wait()
+        self.assertGreater(len(sampler.samples), 2)
+        summary = sampler.summary()
+        self.assertGreater(summary["cpu_peak"], 50)
+        self.assertGreater(summary["rss_peak"], 0)
+
+        with tempfile.TemporaryDirectory() as d:
+            sampler.write_samples(Path(d))
+            peaks = resource_sampler.read_summary(Path(d))
+        self.assertEqual(list(peaks), ["rss_peak.other"])
+
+    def test_disabled(self):
+        with ResourceSampler(os.getpid(), interval=0) as sampler:
+            pass
+        self.assertEqual(sampler.samples, [])
+        self.assertEqual(sampler.summary(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
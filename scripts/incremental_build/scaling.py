@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Fits how properties of the builds of clone CUJs, e.g. soong_build time, peak
+memory and build.ninja size, scale with the number of modules cloned, and
+reports where the scaling bends.
+"""
+import argparse
+import csv
+import dataclasses
+import logging
+import math
+import re
+import statistics
+from pathlib import Path
+from typing import Callable, Final, Optional
+
+import util
+
+Row = dict[str, str]
+
+SCALING_CSV: Final[str] = "scaling.csv"
+DEFAULT_PROPERTIES: Final[str] = (
+    r"^(?:time|soong/soong_build|bp2build|soong_build/.*"
+    r"|rss_peak\.soong_build|build_ninja_size)$"
+)
+# y = a + b * f(n) for n modules
+MODELS: Final[dict[str, Callable[[int], float]]] = {
+    "linear": lambda n: n,
+    "n log n": lambda n: n * math.log2(n),
+    "quadratic": lambda n: n * n,
+}
+# the exponent with which the cost of each additional module may grow before
+# the scaling is taken to bend, i.e. 0 for linear and 1 for quadratic scaling
+BEND_EXPONENT: Final[float] = 0.75
+
+# the description of a clone CUJ, see `clone._name_cuj()`
+_CLONE_CUJ: Final[re.Pattern] = re.compile(
+    r"^(?P<after>bp aft )?(?P<count>\d+)(?:x(?P<modules>\d+))?"
+    r"(?:\(\d+ files\))? (?P<cuj>.+)$"
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class Fit:
+    model: str
+    a: float
+    b: float
+    r2: float
+    """the coefficient of determination, 1 being a perfect fit"""
+
+
+def fit(model: str, ns: list[int], ys: list[float]) -> Fit:
+    """least squares fit of y = a + b * f(n) for the `model` f"""
+    fs = [MODELS[model](n) for n in ns]
+    f_mean = statistics.mean(fs)
+    y_mean = statistics.mean(ys)
+    sxx = sum((f - f_mean) ** 2 for f in fs)
+    b = sum((f - f_mean) * (y - y_mean) for f, y in zip(fs, ys)) / sxx if sxx else 0
+    a = y_mean - b * f_mean
+    sse = sum((y - a - b * f) ** 2 for f, y in zip(fs, ys))
+    sst = sum((y - y_mean) ** 2 for y in ys)
+    return Fit(model, a, b, 1 - sse / sst if sst else 1.0)
+
+
+def bend(ns: list[int], ys: list[float]) -> Optional[int]:
+    """
+    :return: the smallest n beyond which the cost of each additional n grows
+    faster than `BEND_EXPONENT` allows, if any. `ns` must be in ascending order.
+    """
+    # the marginal cost over each interval between consecutive ns, by midpoint
+    slopes = [
+        ((n0 + n1) / 2, (y1 - y0) / (n1 - n0))
+        for n0, n1, y0, y1 in zip(ns, ns[1:], ys, ys[1:])
+    ]
+    for i, ((m0, s0), (m1, s1)) in enumerate(zip(slopes, slopes[1:])):
+        if s0 <= 0 or s1 <= 0:
+            continue
+        if math.log(s1 / s0) / math.log(m1 / m0) > BEND_EXPONENT:
+            return ns[i + 1]
+    return None
+
+
+@dataclasses.dataclass(frozen=True)
+class Scaling:
+    cuj: str
+    targets: str
+    build_type: str
+    prop: str
+    ns: list[int]
+    ys: list[float]
+    fits: list[Fit]
+    bends_at: Optional[int]
+
+    @property
+    def best(self) -> Fit:
+        # the models have as many parameters so the best fits the least error
+        return max(self.fits, key=lambda f: f.r2)
+
+    @staticmethod
+    def headers() -> list[str]:
+        return [
+            "cuj",
+            "targets",
+            "build_type",
+            "property",
+            "modules",
+            "best",
+            *(f"r2.{m}" for m in MODELS),
+            "bends_at",
+        ]
+
+    def cells(self) -> list[str]:
+        return [
+            self.cuj,
+            self.targets,
+            self.build_type,
+            self.prop,
+            f"{self.ns[0]}..{self.ns[-1]}",
+            self.best.model,
+            *(f"{f.r2:.3f}" for f in self.fits),
+            str(self.bends_at or ""),
+        ]
+
+
+def _value(v: str) -> float:
+    return int(v) if v.isnumeric() else util.period_to_seconds(v)
+
+
+def scaling_helper(rows: list[Row], regex: str) -> list[Scaling]:
+    """
+    Fits each property matching `regex` for each clone CUJ, targets and build
+    type with at least 3 clone counts, taking the median of repeated builds.
+    Builds after the modification of a cloned Android.bp, i.e. "bp aft" steps,
+    are fitted separately from the builds after cloning.
+    """
+    p = re.compile(regex)
+    properties = [
+        prop for prop in dict.fromkeys(k for r in rows for k in r) if p.search(prop)
+    ]
+    # by series then by number of modules
+    series: dict[tuple[str, str, str], dict[int, list[Row]]] = {}
+    for row in rows:
+        m = _CLONE_CUJ.match(row.get("description", ""))
+        if not m or row.get("build_result") == "FAILED":
+            continue
+        n = int(m.group("count")) * int(m.group("modules") or 1)
+        build_type = row.get("build_type")
+        if row.get("cache_mode"):
+            build_type = f"{build_type}/{row.get('cache_mode')}"
+        key = (
+            f"{m.group('after') or ''}{m.group('cuj')}",
+            row.get("targets"),
+            build_type,
+        )
+        series.setdefault(key, {}).setdefault(n, []).append(row)
+
+    result = []
+    for (cuj, targets, build_type), by_n in series.items():
+        if len(by_n) < 3:
+            continue
+        for prop in properties:
+            points = [
+                (n, statistics.median(_value(r[prop]) for r in rs if r.get(prop)))
+                for n, rs in sorted(by_n.items())
+                if any(r.get(prop) for r in rs)
+            ]
+            if len(points) < 3:
+                continue
+            ns = [n for n, _ in points]
+            ys = [y for _, y in points]
+            result.append(
+                Scaling(
+                    cuj=cuj,
+                    targets=targets,
+                    build_type=build_type,
+                    prop=prop,
+                    ns=ns,
+                    ys=ys,
+                    fits=[fit(model, ns, ys) for model in MODELS],
+                    bends_at=bend(ns, ys),
+                )
+            )
+    return result
+
+
+def report(metrics_csv: Path, regex: str, output_dir: Path):
+    """writes the scaling of the clone CUJs in `metrics_csv` to `output_dir`"""
+    with open(metrics_csv, "rt") as f:
+        scalings = scaling_helper(list(csv.DictReader(f)), regex)
+    if not scalings:
+        logging.warning("no clone CUJ with 3 or more clone counts to fit")
+        return
+    scaling_csv = output_dir.joinpath(SCALING_CSV)
+    scaling_csv.parent.mkdir(parents=True, exist_ok=True)
+    with open(scaling_csv, "wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(Scaling.headers())
+        writer.writerows(s.cells() for s in scalings)
+    for s in scalings:
+        best = s.best
+        logging.info(
+            "%s %s [%s] %s ~ %s (R²=%.3f)%s",
+            s.build_type,
+            s.targets,
+            s.cuj,
+            s.prop,
+            best.model,
+            best.r2,
+            f", superlinear from {s.bends_at} modules" if s.bends_at else "",
+        )
+    logging.info("scaling of clone CUJs written to %s", scaling_csv)
+
+
+def main():
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument(
+        "metrics",
+        nargs="?",
+        type=Path,
+        default=util.get_default_log_dir().joinpath(util.METRICS_TABLE),
+        help="metrics.csv file to parse, default=%(default)s",
+    )
+    p.add_argument(
+        "-p",
+        "--properties",
+        default=DEFAULT_PROPERTIES,
+        help="regex to select properties, default=%(default)s",
+    )
+    p.add_argument(
+        "--output-dir",
+        type=Path,
+        help="directory to write scaling.csv to, "
+        "default: the perf directory next to METRICS",
+    )
+    options = p.parse_args()
+    report(
+        options.metrics,
+        options.properties,
+        options.output_dir or options.metrics.parent.joinpath("perf"),
+    )
+
+
+if __name__ == "__main__":
+    logging.root.setLevel(logging.INFO)
+    main()
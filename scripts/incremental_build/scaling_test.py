@@ -0,0 +1,84 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import datetime
+import math
+import unittest
+
+import scaling
+import util
+
+
+class ScalingTest(unittest.TestCase):
+    ns = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024]
+
+    def test_fit(self):
+        for model, f in scaling.MODELS.items():
+            with self.subTest(model):
+                ys = [30 + 0.5 * f(n) for n in self.ns]
+                fits = {m: scaling.fit(m, self.ns, ys) for m in scaling.MODELS}
+                self.assertAlmostEqual(fits[model].a, 30)
+                self.assertAlmostEqual(fits[model].b, 0.5)
+                self.assertAlmostEqual(fits[model].r2, 1)
+                self.assertEqual(max(fits.values(), key=lambda x: x.r2).model, model)
+
+    def test_fit_constant(self):
+        f = scaling.fit("linear", self.ns, [7] * len(self.ns))
+        self.assertEqual((f.a, f.b, f.r2), (7, 0, 1))
+
+    def test_bend(self):
+        linear = [100 + 2 * n for n in self.ns]
+        self.assertIsNone(scaling.bend(self.ns, linear))
+        n_log_n = [100 + n * math.log2(n) for n in self.ns]
+        self.assertIsNone(scaling.bend(self.ns, n_log_n))
+        quadratic = [100 + n * n for n in self.ns]
+        self.assertEqual(scaling.bend(self.ns, quadratic), 2)
+        # linear, then quadratic beyond 64
+        bent = [100 + 2 * n + max(0, n - 64) ** 2 for n in self.ns]
+        self.assertEqual(scaling.bend(self.ns, bent), 64)
+
+    def test_scaling_helper(self):
+        def row(desc: str, secs: float, size: int, **kwargs) -> dict[str, str]:
+            return {
+                "description": desc,
+                "build_type": "SOONG_ONLY",
+                "targets": "nothing",
+                "time": util.hhmmss(datetime.timedelta(seconds=secs), True),
+                "build_ninja_size": str(size),
+                **kwargs,
+            }
+
+        rows = [row("WARMUP", 99, 1)]
+        for n in self.ns[:6]:
+            for repeat in range(2):
+                rows.append(row(f"{n}x2 scale", 60 + n * n + repeat, 1000 * n))
+                rows.append(row(f"bp aft {n}x2 scale", 10 + n, 1000 * n))
+        rows.append(row("revert scale", 60, 1000))
+        rows.append(row("4 other", 60, 1000, build_result="FAILED"))
+        rows.append(row("8 other", 60, 1000))
+
+        result = {(s.cuj, s.prop): s for s in scaling.scaling_helper(rows, "^time$")}
+        self.assertEqual(set(result), {("scale", "time"), ("bp aft scale", "time")})
+        s = result[("scale", "time")]
+        self.assertEqual(s.ns, [2, 4, 8, 16, 32, 64])
+        # the median of the repeats
+        self.assertEqual(s.ys[0], 60 + 1 + 0.5)
+        self.assertEqual(s.best.model, "quadratic")
+        self.assertEqual(result[("bp aft scale", "time")].best.model, "linear")
+
+        result = scaling.scaling_helper(rows, "size")
+        self.assertEqual([s.best.model for s in result], ["linear", "linear"])
+
+
+if __name__ == "__main__":
+    unittest.main()
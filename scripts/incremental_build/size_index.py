@@ -0,0 +1,151 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Counts and sizes the files of a given name, e.g. Android.bp, in a source tree
+without re-listing directories that haven't changed since the previous count.
+"""
+import concurrent.futures
+import dataclasses
+import os
+import time
+from pathlib import Path
+from typing import Final, Iterable, Optional
+
+# the root and its children are scanned serially, the subtrees below them are
+# walked in parallel
+_SERIAL_DEPTH: Final[int] = 2
+# directories modified this close to a scan may be modified again without
+# their mtime changing, given the timestamp granularity of some filesystems
+_RACY_NS: Final[int] = 2_000_000_000
+
+
+@dataclasses.dataclass(frozen=True)
+class Totals:
+    count: int = 0
+    size: int = 0
+    """in bytes"""
+
+    def __add__(self, other: "Totals") -> "Totals":
+        return Totals(self.count + other.count, self.size + other.size)
+
+
+@dataclasses.dataclass(frozen=True)
+class _Dir:
+    mtime_ns: int
+    subdirs: tuple[str, ...]
+    has_file: bool
+
+
+class SizeIndex:
+    """
+    Caches the listing of each directory keyed by its mtime, which changes
+    whenever an entry is added, removed or renamed; the matching files are
+    still stat'ed every time as editing them in place leaves the mtime of the
+    directory unchanged.
+    Like `find`, symlinks to directories aren't followed.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        name: str,
+        exclude: Iterable[Path] = (),
+        workers: Optional[int] = None,
+    ):
+        self.root = root
+        self.name = name
+        self.exclude = {str(e) for e in exclude}
+        self.workers = workers
+        self.rescanned = 0
+        """the number of directories listed by the last `totals()`"""
+        self._dirs: dict[str, _Dir] = {}
+
+    def _visit(
+        self, d: str, old: dict[str, _Dir], new: dict[str, _Dir], racy_ns: int
+    ) -> tuple[Totals, bool, tuple[str, ...]]:
+        """
+        :return: the totals of the matching file in `d`, whether `d` was
+        listed rather than cached and the subdirs to visit
+        """
+        try:
+            mtime_ns = os.stat(d, follow_symlinks=False).st_mtime_ns
+            entry = old.get(d)
+            rescanned = entry is None or entry.mtime_ns != mtime_ns
+            if rescanned:
+                subdirs = []
+                has_file = False
+                with os.scandir(d) as it:
+                    for e in it:
+                        if e.is_dir(follow_symlinks=False):
+                            if e.path not in self.exclude:
+                                subdirs.append(e.path)
+                        elif e.name == self.name:
+                            has_file = True
+                entry = _Dir(
+                    # a racy entry is cached but never matches
+                    mtime_ns=mtime_ns if mtime_ns < racy_ns else -1,
+                    subdirs=tuple(subdirs),
+                    has_file=has_file,
+                )
+        except OSError:
+            # removed or inaccessible
+            return Totals(), False, ()
+        new[d] = entry
+        totals = Totals()
+        if entry.has_file:
+            try:
+                totals = Totals(1, os.stat(os.path.join(d, self.name)).st_size)
+            except OSError:
+                pass
+        return totals, rescanned, entry.subdirs
+
+    def _walk(
+        self, top: str, old: dict[str, _Dir], new: dict[str, _Dir], racy_ns: int
+    ) -> tuple[Totals, int]:
+        totals = Totals()
+        rescanned = 0
+        pending = [top]
+        while pending:
+            t, r, subdirs = self._visit(pending.pop(), old, new, racy_ns)
+            totals += t
+            rescanned += r
+            pending.extend(subdirs)
+        return totals, rescanned
+
+    def totals(self) -> Optional[Totals]:
+        """:return: the count and total size of the files, None if no root"""
+        if not self.root.is_dir():
+            return None
+        racy_ns = time.time_ns() - _RACY_NS
+        old, new = self._dirs, {}
+        totals = Totals()
+        rescanned = 0
+        frontier = [str(self.root)]
+        for _ in range(_SERIAL_DEPTH):
+            subdirs = []
+            for d in frontier:
+                t, r, s = self._visit(d, old, new, racy_ns)
+                totals += t
+                rescanned += r
+                subdirs.extend(s)
+            frontier = subdirs
+        # each thread writes the entries of disjoint subtrees
+        with concurrent.futures.ThreadPoolExecutor(self.workers) as pool:
+            for t, r in pool.map(lambda d: self._walk(d, old, new, racy_ns), frontier):
+                totals += t
+                rescanned += r
+        # directories no longer visited are dropped
+        self._dirs = new
+        self.rescanned = rescanned
+        return totals
@@ -0,0 +1,74 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from size_index import SizeIndex
+from size_index import Totals
+
+
+def _age(root: Path):
+    """backdates all directories so that none is considered racy"""
+    for d, _, _ in os.walk(root):
+        os.utime(d, ns=(0, 1_000_000_000))
+
+
+class SizeIndexTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        for d, content in [
+            ("a", "1"),
+            ("a/b", "22"),
+            ("a/b/c/d", "333"),
+            ("e", "4444"),
+            ("out/soong", "55555"),
+        ]:
+            self.root.joinpath(d).mkdir(parents=True)
+            self.root.joinpath(d, "Android.bp").write_text(content)
+        self.root.joinpath("a/b/BUILD.bazel").write_text("666666")
+        os.symlink(self.root.joinpath("a"), self.root.joinpath("link"))
+        _age(self.root)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_totals(self):
+        index = SizeIndex(self.root, "Android.bp", exclude=[self.root / "out"])
+        self.assertEqual(index.totals(), Totals(4, 10))
+        self.assertEqual(SizeIndex(self.root, "BUILD.bazel").totals(), Totals(1, 6))
+
+    def test_no_root(self):
+        self.assertIsNone(SizeIndex(self.root / "nope", "Android.bp").totals())
+
+    def test_rescans_only_changed_dirs(self):
+        index = SizeIndex(self.root, "Android.bp")
+        index.totals()
+        self.assertEqual(index.rescanned, 8)
+
+        # editing in place doesn't require listing any directory
+        self.root.joinpath("a/b/c/d/Android.bp").write_text("3333")
+        self.assertEqual(index.totals(), Totals(5, 16))
+        self.assertEqual(index.rescanned, 0)
+
+        self.root.joinpath("a/b/c/Android.bp").write_text("7")
+        self.root.joinpath("e/Android.bp").unlink()
+        self.assertEqual(index.totals(), Totals(5, 13))
+        self.assertEqual(index.rescanned, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
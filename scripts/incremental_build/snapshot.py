@@ -0,0 +1,159 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Snapshots of source files that CUJs change, for restoring them afterwards by
+rewriting only the files whose content differs.
+"""
+import dataclasses
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Final, Iterable
+
+MANIFEST: Final[str] = "manifest.json"
+# the ioctl to share the blocks of a file with another, see ioctl_ficlone(2)
+_FICLONE: Final[int] = 0x40049409
+_CHUNK: Final[int] = 1 << 20
+
+
+@dataclasses.dataclass(frozen=True)
+class Entry:
+    sha256: str
+    size: int
+    mtime_ns: int
+    """of the file when the snapshot was taken"""
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(_CHUNK):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def copy(src: Path, dst: Path):
+    """
+    Copies the content of `src` to `dst`, sharing their blocks on filesystems
+    that support reflinks, e.g. btrfs and XFS, and otherwise copying in the
+    kernel where possible
+    """
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+            return
+        except OSError:
+            pass
+        try:
+            remaining = os.fstat(s.fileno()).st_size
+            while remaining > 0:
+                n = os.copy_file_range(s.fileno(), d.fileno(), remaining)
+                if n == 0:
+                    break
+                remaining -= n
+            return
+        except OSError:
+            # e.g. across filesystems on older kernels
+            s.seek(0)
+            d.seek(0)
+            d.truncate()
+        shutil.copyfileobj(s, d)
+
+
+class Snapshot:
+    """
+    Copies of files under `top` in `root`, with a manifest of the hash, size
+    and mtime of each file. The manifest is written last such that a snapshot
+    is either complete or not there.
+    """
+
+    def __init__(self, root: Path, top: Path):
+        self.root = root
+        self.top = top
+        self._entries: dict[str, Entry] = {}
+
+    def _copy_of(self, rel: str) -> Path:
+        return self.root.joinpath("files", rel)
+
+    def exists(self) -> bool:
+        return self.root.joinpath(MANIFEST).exists()
+
+    def take(self, files: Iterable[Path]):
+        entries = {}
+        for file in files:
+            rel = str(file.relative_to(self.top))
+            st = file.stat()
+            copy_of = self._copy_of(rel)
+            copy_of.parent.mkdir(parents=True, exist_ok=True)
+            copy(file, copy_of)
+            entries[rel] = Entry(_sha256(copy_of), st.st_size, st.st_mtime_ns)
+        tmp = self.root.joinpath(f"{MANIFEST}.tmp")
+        with open(tmp, "wt") as f:
+            json.dump({rel: dataclasses.asdict(e) for rel, e in entries.items()}, f)
+        os.replace(tmp, self.root.joinpath(MANIFEST))
+        self._entries = entries
+
+    def entries(self) -> dict[str, Entry]:
+        """:return: the files of the snapshot by path relative to `top`"""
+        if not self._entries:
+            if not self.exists():
+                raise RuntimeError(f"no complete snapshot in {self.root}")
+            with open(self.root.joinpath(MANIFEST), "rt") as f:
+                self._entries = {rel: Entry(**e) for rel, e in json.load(f).items()}
+        return self._entries
+
+    def _differs(self, rel: str, e: Entry) -> bool:
+        file = self.top.joinpath(rel)
+        try:
+            st = file.stat()
+        except FileNotFoundError:
+            return True
+        if st.st_size != e.size:
+            return True
+        if st.st_mtime_ns == e.mtime_ns:
+            return False
+        return _sha256(file) != e.sha256
+
+    def restore(self) -> list[str]:
+        """
+        Rewrites the files whose content differs from the snapshot, such that
+        restoring again is a no-op
+        :return: the files rewritten
+        """
+        restored = []
+        for rel, e in self.entries().items():
+            if not self._differs(rel, e):
+                continue
+            file = self.top.joinpath(rel)
+            copy(self._copy_of(rel), file)
+            # touch to update mtime; ctime is ignored by ninja
+            file.touch(exist_ok=True)
+            restored.append(rel)
+        return restored
+
+    def verify(self) -> list[str]:
+        """:return: the files whose content differs from the snapshot"""
+        return [
+            rel
+            for rel, e in self.entries().items()
+            if not self.top.joinpath(rel).exists()
+            or _sha256(self.top.joinpath(rel)) != e.sha256
+        ]
+
+    def delete(self):
+        shutil.rmtree(self.root)
+        self._entries = {}
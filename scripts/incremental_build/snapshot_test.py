@@ -0,0 +1,89 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from snapshot import Snapshot
+from snapshot import copy
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.top = Path(self.tmp.name).joinpath("top")
+        self.files = [
+            self.top.joinpath("a", "Android.bp"),
+            self.top.joinpath("b", "c", "Android.bp"),
+            self.top.joinpath("allowlists.go"),
+        ]
+        for f in self.files:
+            f.parent.mkdir(parents=True, exist_ok=True)
+            f.write_text(f"content of {f.parent.name}\n")
+            os.utime(f, ns=(1_000_000_000, 1_000_000_000))
+        self.snapshot = Snapshot(Path(self.tmp.name).joinpath("backup"), self.top)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_copy(self):
+        data = os.urandom(3 << 20)
+        src = self.top.joinpath("src")
+        src.write_bytes(data)
+        dst = self.top.joinpath("dst")
+        dst.write_bytes(b"longer than nothing")
+        copy(src, dst)
+        self.assertEqual(dst.read_bytes(), data)
+
+    def test_restore(self):
+        self.assertFalse(self.snapshot.exists())
+        self.snapshot.take(self.files)
+        self.assertTrue(self.snapshot.exists())
+        self.assertEqual(self.snapshot.restore(), [])
+
+        a, bc, allowlists = self.files
+        with open(a, "a") as f:
+            f.write("clones\n")
+        allowlists.unlink()
+        # the same content but a newer mtime
+        bc.write_text(bc.read_text())
+        self.assertEqual(self.snapshot.verify(), ["a/Android.bp", "allowlists.go"])
+
+        # as if in another process
+        snapshot = Snapshot(self.snapshot.root, self.top)
+        self.assertEqual(snapshot.restore(), ["a/Android.bp", "allowlists.go"])
+        self.assertEqual(a.read_text(), "content of a\n")
+        self.assertEqual(allowlists.read_text(), "content of top\n")
+        self.assertGreater(a.stat().st_mtime_ns, 1_000_000_000)
+        self.assertEqual(snapshot.verify(), [])
+        with self.subTest("restoring is idempotent"):
+            self.assertEqual(snapshot.restore(), [])
+
+        snapshot.delete()
+        self.assertFalse(snapshot.exists())
+        with self.assertRaises(RuntimeError):
+            snapshot.restore()
+
+    def test_incomplete(self):
+        self.files.append(self.top.joinpath("missing"))
+        with self.assertRaises(FileNotFoundError):
+            self.snapshot.take(self.files)
+        self.assertFalse(self.snapshot.exists())
+        with self.assertRaises(RuntimeError):
+            self.snapshot.entries()
+
+
+if __name__ == "__main__":
+    unittest.main()
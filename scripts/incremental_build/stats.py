@@ -0,0 +1,176 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Statistics for repeated timings, using only the standard library.
+"""
+import dataclasses
+import functools
+import math
+import statistics
+from typing import Final, Iterable
+
+# two-sided 95% critical values of Student's t-distribution by degrees of
+# freedom; beyond the table the normal approximation is close enough
+_T_95: Final[tuple[float, ...]] = (
+    12.706,
+    4.303,
+    3.182,
+    2.776,
+    2.571,
+    2.447,
+    2.365,
+    2.306,
+    2.262,
+    2.228,
+    2.201,
+    2.179,
+    2.160,
+    2.145,
+    2.131,
+    2.120,
+    2.110,
+    2.101,
+    2.093,
+    2.086,
+    2.080,
+    2.074,
+    2.069,
+    2.064,
+    2.060,
+    2.056,
+    2.052,
+    2.048,
+    2.045,
+    2.042,
+)
+_Z_95: Final[float] = 1.960
+
+
+def t_critical(df: int) -> float:
+    """:return: the two-sided 95% critical value for `df` degrees of freedom"""
+    if df < 1:
+        return math.inf
+    return _T_95[df - 1] if df <= len(_T_95) else _Z_95
+
+
+@dataclasses.dataclass
+class RunningStats:
+    """
+    Running mean and variance using Welford's algorithm, i.e. without keeping
+    the samples.
+    """
+
+    n: int = 0
+    mean: float = 0.0
+    _m2: float = 0.0
+
+    def add(self, x: float):
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self._m2 += d * (x - self.mean)
+
+    @property
+    def stdev(self) -> float:
+        return math.sqrt(self._m2 / (self.n - 1)) if self.n > 1 else math.inf
+
+    def ci_half_width(self) -> float:
+        """:return: the half-width of the 95% confidence interval of the mean"""
+        if self.n < 2:
+            return math.inf
+        return t_critical(self.n - 1) * self.stdev / math.sqrt(self.n)
+
+    def relative_ci_half_width(self) -> float:
+        """:return: the CI half-width as a fraction of the mean"""
+        return self.ci_half_width() / abs(self.mean) if self.mean else math.inf
+
+
+def ci_half_width(xs: Iterable[float]) -> float:
+    """:return: the half-width of the 95% confidence interval of the mean"""
+    xs = list(xs)
+    if len(xs) < 2:
+        return 0.0
+    return t_critical(len(xs) - 1) * statistics.stdev(xs) / math.sqrt(len(xs))
+
+
+# the exact distribution of U is enumerated for at most this many samples
+_MAX_EXACT: Final[int] = 30
+
+
+@functools.cache
+def _u_counts(m: int, n: int) -> tuple[int, ...]:
+    """
+    :return: for each value of U, the number of orderings of m xs and n ys
+    (without ties) with that many (x, y) pairs where x < y
+    """
+    if m == 0 or n == 0:
+        return (1,)
+    # the largest element is either a y, which exceeds all m xs, or an x
+    with_y = _u_counts(m, n - 1)
+    with_x = _u_counts(m - 1, n)
+    return tuple(
+        (with_y[u - m] if 0 <= u - m < len(with_y) else 0)
+        + (with_x[u] if u < len(with_x) else 0)
+        for u in range(m * n + 1)
+    )
+
+
+def mann_whitney_u(xs: list[float], ys: list[float]) -> tuple[float, float]:
+    """
+    Mann-Whitney U test of whether ys tend to be larger or smaller than xs.
+    The p-value is exact for small samples without ties and otherwise uses
+    the normal approximation with tie and continuity corrections.
+    :return: U, i.e. the number of (x, y) pairs where x < y counting ties as
+    half, and the two-sided p-value
+    """
+    m, n = len(xs), len(ys)
+    if m == 0 or n == 0:
+        return 0.0, 1.0
+    ranked = sorted([(v, 0) for v in xs] + [(v, 1) for v in ys])
+    # average ranks, 1-based, over runs of tied values
+    rank_sum_y = 0.0
+    tie_term = 0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j < len(ranked) and ranked[j][0] == ranked[i][0]:
+            j += 1
+        t = j - i
+        tie_term += t**3 - t
+        rank_sum_y += (i + j + 1) / 2 * sum(g for _, g in ranked[i:j])
+        i = j
+    u = rank_sum_y - n * (n + 1) / 2
+
+    if tie_term == 0 and m + n <= _MAX_EXACT:
+        counts = _u_counts(m, n)
+        total = sum(counts)
+        k = round(u)
+        lower = sum(counts[: k + 1]) / total
+        upper = sum(counts[k:]) / total
+        return u, min(1.0, 2 * min(lower, upper))
+
+    mu = m * n / 2
+    variance = m * n / 12 * ((m + n + 1) - tie_term / ((m + n) * (m + n - 1)))
+    if variance <= 0:
+        return u, 1.0
+    z = max(abs(u - mu) - 0.5, 0) / math.sqrt(variance)
+    return u, min(1.0, 2 * (1 - statistics.NormalDist().cdf(z)))
+
+
+def rank_biserial(u: float, m: int, n: int) -> float:
+    """
+    :return: the effect size of a Mann-Whitney U, between -1 (all ys are
+    smaller than all xs) and 1 (all ys are larger)
+    """
+    return 2 * u / (m * n) - 1 if m and n else 0.0
@@ -0,0 +1,63 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import math
+import statistics
+import unittest
+
+import stats
+
+
+class StatsTest(unittest.TestCase):
+    def test_running_stats(self):
+        xs = [61.2, 59.8, 60.5, 62.0, 60.1]
+        s = stats.RunningStats()
+        self.assertEqual(s.ci_half_width(), math.inf)
+        for x in xs:
+            s.add(x)
+        self.assertEqual(s.n, 5)
+        self.assertAlmostEqual(s.mean, statistics.mean(xs))
+        self.assertAlmostEqual(s.stdev, statistics.stdev(xs))
+        self.assertAlmostEqual(s.ci_half_width(), stats.ci_half_width(xs))
+        self.assertAlmostEqual(
+            s.ci_half_width(), 2.776 * statistics.stdev(xs) / math.sqrt(5)
+        )
+        self.assertLess(s.relative_ci_half_width(), 0.02)
+
+    def test_t_critical(self):
+        self.assertEqual(stats.t_critical(0), math.inf)
+        self.assertEqual(stats.t_critical(1), 12.706)
+        self.assertEqual(stats.t_critical(30), 2.042)
+        self.assertEqual(stats.t_critical(1000), 1.96)
+
+    def test_mann_whitney_u(self):
+        # exact, cf. tables of the Mann-Whitney U distribution
+        self.assertEqual(stats.mann_whitney_u([1, 2, 3], [4, 5, 6]), (9.0, 0.1))
+        u, p = stats.mann_whitney_u([1, 2, 3, 4, 5], [1.5, 2.5, 3.5, 4.5, 5.5])
+        self.assertEqual(u, 15.0)
+        self.assertAlmostEqual(p, 0.690, places=3)
+        # ties, normal approximation
+        u, p = stats.mann_whitney_u([1, 2, 2, 3], [4, 5, 5, 6])
+        self.assertEqual(u, 16.0)
+        self.assertAlmostEqual(p, 0.0284, places=4)
+        self.assertEqual(stats.mann_whitney_u([1, 1], [1, 1]), (2.0, 1.0))
+        self.assertEqual(stats.mann_whitney_u([], [1]), (0.0, 1.0))
+
+    def test_rank_biserial(self):
+        self.assertEqual(stats.rank_biserial(9, 3, 3), 1)
+        self.assertEqual(stats.rank_biserial(0, 3, 3), -1)
+        self.assertEqual(stats.rank_biserial(4.5, 3, 3), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
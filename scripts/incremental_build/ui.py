@@ -14,6 +14,7 @@
 
 import argparse
 import dataclasses
+import datetime
 import functools
 import logging
 import os
@@ -24,6 +25,9 @@ from pathlib import Path
 from typing import Optional
 
 import cuj_catalog
+import ninja_fingerprint
+import page_cache
+import resource_sampler
 import util
 from util import BuildType
 
@@ -37,10 +41,27 @@ class UserInput:
     no_warmup: bool
     targets: tuple[str, ...]
     ci_mode: bool
+    sample_interval: float
+    ci_target: Optional[float]
+    time_budget: datetime.timedelta
+    max_repeats: int
+    ninja_fingerprint: ninja_fingerprint.Mode
+    ninja_sections: bool
+    worker_trees: tuple[Path, ...]
+    jobs: int
+    worker_id: Optional[int]
+    resume: bool
+    cache_mode: Optional[page_cache.CacheMode]
+    ignore_repo_diff: bool
 
 
 @functools.cache
 def get_user_input() -> UserInput:
+    # the CUJ groups check the source tree, which may still have the changes
+    # of the CUJ that a resumed session was interrupted in
+    resume = argparse.ArgumentParser(add_help=False)
+    resume.add_argument("--resume", action="store_true")
+    util.RESUMING = resume.parse_known_args()[0].resume
     cujgroups = cuj_catalog.get_cujgroups()
 
     def validate_cujgroups(input_str: str) -> list[int]:
@@ -177,6 +198,91 @@ def get_user_input() -> UserInput:
         "first metrics after warmup to the logs directory in CI",
     )
 
+    p.add_argument(
+        "--sample-interval",
+        type=float,
+        default=resource_sampler.DEFAULT_INTERVAL,
+        help="Seconds between samples of the resource usage of builds, "
+        "0 to disable sampling. Defaults to %(default)s",
+    )
+    p.add_argument(
+        "--ci-target",
+        type=float,
+        default=None,
+        help="Benchmark mode: repeat each CUJ until the 95%% confidence "
+        "interval of the time of each of its steps is within this fraction "
+        "of the mean, e.g. 0.05, or until --time-budget or --max-repeats "
+        "is reached",
+    )
+    p.add_argument(
+        "--time-budget",
+        type=float,
+        default=60,
+        help="Benchmark mode: minutes to spend repeating each CUJ. "
+        "Defaults to %(default)s",
+    )
+    p.add_argument(
+        "--max-repeats",
+        type=int,
+        default=20,
+        help="Benchmark mode: maximum repetitions of each CUJ. "
+        "Defaults to %(default)s",
+    )
+
+    p.add_argument(
+        "--ninja-fingerprint",
+        type=ninja_fingerprint.Mode,
+        default=ninja_fingerprint.Mode.FULL,
+        help="How build_ninja_hash is computed: a SHA-256 of the whole soong "
+        "ninja file or, far cheaper, of its size, mtime and sampled chunks. "
+        f"Choose from {[m.value for m in ninja_fingerprint.Mode]}, "
+        f"defaults to {ninja_fingerprint.Mode.FULL.value}",
+    )
+    p.add_argument(
+        "--ninja-sections",
+        default=False,
+        action="store_true",
+        help="Hash each rule, subninja etc. of the soong ninja file to report "
+        "which of them each build changed",
+    )
+    p.add_argument(
+        "--worker-trees",
+        nargs="+",
+        type=Path,
+        default=[],
+        help="Run the chosen CUJ groups concurrently, each in one of these "
+        "source trees, e.g. separate checkouts of the same sources, with its "
+        "own out dir",
+    )
+    p.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="With --worker-trees, the maximum number of CUJ groups to run "
+        "at a time. Defaults to the number of worker trees",
+    )
+    p.add_argument(
+        "--cache-mode",
+        type=page_cache.CacheMode,
+        default=None,
+        help="The page cache state each build starts with: "
+        f"{page_cache.CacheMode.COLD.value}, i.e. dropped or the source tree "
+        "and out dir evicted, and no Bazel server running, or "
+        f"{page_cache.CacheMode.WARM.value}, i.e. the ninja files read in "
+        "beforehand. Defaults to leaving the page cache as it is",
+    )
+    p.add_argument(
+        "--resume",
+        default=False,
+        action="store_true",
+        help="Resume an interrupted session in --log-dir: revert the changes "
+        "of the CUJ that was interrupted and skip the CUJs already completed. "
+        "Implies --append-csv and skips the uncommitted changes check",
+    )
+    # set for each invocation by the workers, see workers.py
+    p.add_argument("--worker-id", type=int, default=None, help=argparse.SUPPRESS)
+
     options = p.parse_args()
 
     if options.verbosity:
@@ -217,7 +323,11 @@ def get_user_input() -> UserInput:
     )
     logging.info(f"%d CUJs chosen:\n%s", len(chosen_cujgroups), pretty_str)
 
-    if not options.ignore_repo_diff and util.has_uncommitted_changes():
+    if (
+        not options.ignore_repo_diff
+        and not options.resume
+        and util.has_uncommitted_changes()
+    ):
         error_message = (
             "THERE ARE UNCOMMITTED CHANGES (TIP: repo status). "
             "Use --ignore-repo-diff to skip this check."
@@ -231,7 +341,7 @@ def get_user_input() -> UserInput:
             sys.exit(1)
 
     log_dir = Path(options.log_dir).resolve()
-    if not options.append_csv and log_dir.exists():
+    if not options.append_csv and not options.resume and log_dir.exists():
         error_message = (
             f"{log_dir} already exists. "
             "Use --append-csv to skip this check."
@@ -266,6 +376,28 @@ def get_user_input() -> UserInput:
             )
             sys.exit(1)
 
+    worker_trees = tuple(t.resolve() for t in options.worker_trees)
+    for tree in worker_trees:
+        if not tree.joinpath(util.INDICATOR_FILE).is_file():
+            logging.critical(f"{tree} is not a source tree")
+            sys.exit(1)
+        if log_dir.is_relative_to(tree):
+            logging.critical(f"choose a log_dir outside the worker tree {tree}")
+            sys.exit(1)
+    if worker_trees and options.ci_mode:
+        logging.critical("--ci-mode can't be used with --worker-trees")
+        sys.exit(1)
+    if worker_trees and options.resume:
+        logging.critical("--resume can't be used with --worker-trees")
+        sys.exit(1)
+    if options.jobs is not None and options.jobs < 1:
+        logging.critical("--jobs should be at least 1")
+        sys.exit(1)
+
+    if options.ci_target is not None and not 0 < options.ci_target < 1:
+        logging.critical("--ci-target should be a fraction between 0 and 1")
+        sys.exit(1)
+
     if options.no_warmup:
         logging.warning(
             "WARMUP runs will be skipped. Note this is not advised "
@@ -279,4 +411,16 @@ def get_user_input() -> UserInput:
         no_warmup=options.no_warmup,
         targets=options.targets,
         ci_mode=options.ci_mode,
+        sample_interval=options.sample_interval,
+        ci_target=options.ci_target,
+        time_budget=datetime.timedelta(minutes=options.time_budget),
+        max_repeats=options.max_repeats,
+        ninja_fingerprint=options.ninja_fingerprint,
+        ninja_sections=options.ninja_sections,
+        worker_trees=worker_trees,
+        jobs=options.jobs or len(worker_trees),
+        worker_id=options.worker_id,
+        resume=options.resume,
+        cache_mode=options.cache_mode,
+        ignore_repo_diff=options.ignore_repo_diff,
     )
@@ -36,6 +36,7 @@ INDICATOR_FILE: Final[str] = "build/soong/soong_ui.bash"
 # builds to be analyzed by other external tools.
 METRICS_TABLE: Final[str] = "metrics.csv"
 RUN_DIR_PREFIX: Final[str] = "run"
+WORKER_DIR_PREFIX: Final[str] = "worker"
 BUILD_INFO_JSON: Final[str] = "build_info.json"
 
 
@@ -100,6 +101,12 @@ class BuildType(enum.Enum):
 CURRENT_BUILD_TYPE: BuildType
 """global state capturing what the current build type is"""
 
+RESUMING: bool = False
+"""
+whether an interrupted session is being resumed, i.e. the source tree may
+have the changes of an interrupted CUJ until they are reverted
+"""
+
 
 @dataclasses.dataclass
 class BuildInfo:
@@ -118,6 +125,24 @@ class BuildInfo:
     tag: str = None
     rebuild: bool = False
     warmup: bool = False
+    repeat: int = None
+    """index of the repetition of the CUJ group when benchmarking"""
+    # resource usage of the build's process tree, see resource_sampler.py
+    cpu_mean: int = None  # percentage of a core
+    cpu_peak: int = None
+    rss_mean: int = None  # MiB
+    rss_peak: int = None
+    io_read: int = None  # MiB
+    io_write: int = None
+    ctx_switches: int = None
+    bp_count: int = None
+    bz_count: int = None
+    worker: int = None
+    """the worker that ran the build when running CUJs concurrently"""
+    cache_mode: str = None
+    """the page cache state the build started with, see page_cache.py"""
+    cache_resident: int = None
+    """percentage of the pages of the ninja files cached as the build started"""
 
 
 class CustomEncoder(json.JSONEncoder):
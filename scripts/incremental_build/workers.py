@@ -0,0 +1,179 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Runs CUJ groups concurrently, each in a worker with its own source tree and
+out dir so that applying the changes of one CUJ can't affect another.
+Each worker runs CUJ groups one at a time, as separate invocations of
+incremental_build into its own log dir within the session's.
+"""
+import concurrent.futures
+import dataclasses
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Final
+
+import ui
+import util
+
+WORKER_LOG: Final[str] = "worker.log"
+
+
+@dataclasses.dataclass(frozen=True)
+class Worker:
+    id: int
+    top_dir: Path
+
+    @property
+    def out_dir(self) -> Path:
+        return self.top_dir.joinpath("out")
+
+    def log_dir(self, session_log_dir: Path) -> Path:
+        return session_log_dir.joinpath(f"{util.WORKER_DIR_PREFIX}-{self.id}")
+
+
+def worker_args(
+    user_input: ui.UserInput, worker: Worker, cujgroup: int, warmup: bool
+) -> list[str]:
+    """:return: the incremental_build arguments to run `cujgroup` on `worker`"""
+    args = [
+        *user_input.targets,
+        "--cujs",
+        str(cujgroup),
+        "--log-dir",
+        str(worker.log_dir(user_input.log_dir)),
+        "--append-csv",
+        "--worker-id",
+        str(worker.id),
+        "--build-types",
+        *(b.to_flag() for b in user_input.build_types),
+        "--verbosity",
+        logging.getLevelName(logging.root.level),
+        "--sample-interval",
+        str(user_input.sample_interval),
+        "--time-budget",
+        str(user_input.time_budget.total_seconds() / 60),
+        "--max-repeats",
+        str(user_input.max_repeats),
+        "--ninja-fingerprint",
+        user_input.ninja_fingerprint.value,
+    ]
+    if user_input.tag:
+        args.extend(["--tag", user_input.tag])
+    if user_input.ci_target is not None:
+        args.extend(["--ci-target", str(user_input.ci_target)])
+    if user_input.ninja_sections:
+        args.append("--ninja-sections")
+    if user_input.cache_mode is not None:
+        args.extend(["--cache-mode", user_input.cache_mode.value])
+    if user_input.ignore_repo_diff:
+        # workers aren't interactive, so they would fail the check otherwise
+        args.append("--ignore-repo-diff")
+    if not warmup:
+        args.append("--no-warmup")
+    return args
+
+
+def schedule(
+    cujgroups: tuple[int, ...],
+    workers: tuple[Worker, ...],
+    jobs: int,
+    run: Callable[[Worker, int, bool], bool],
+) -> list[int]:
+    """
+    Runs each CUJ group on the next idle worker, with at most `jobs` running
+    at a time. Only the first CUJ group of each worker is preceded by a warmup
+    and, as when running serially, no more CUJ groups are started once one
+    fails.
+    :param run: runs a CUJ group on a worker, optionally with a warmup,
+    and returns whether it succeeded
+    :return: the CUJ groups that failed
+    """
+    idle: queue.SimpleQueue[Worker] = queue.SimpleQueue()
+    for w in workers:
+        idle.put(w)
+    warmed: set[int] = set()
+    failed: list[int] = []
+    lock = threading.Lock()
+
+    def run_on_idle_worker(cujgroup: int):
+        worker = idle.get()
+        try:
+            with lock:
+                if failed:
+                    logging.warning("SKIPPING CUJ group %d", cujgroup)
+                    return
+                warmup = worker.id not in warmed
+                warmed.add(worker.id)
+            if not run(worker, cujgroup, warmup):
+                with lock:
+                    failed.append(cujgroup)
+        finally:
+            idle.put(worker)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        min(jobs, len(workers)), thread_name_prefix="worker"
+    ) as pool:
+        for f in [pool.submit(run_on_idle_worker, i) for i in cujgroups]:
+            f.result()
+    return failed
+
+
+def run_cujgroup(
+    user_input: ui.UserInput, worker: Worker, cujgroup: int, warmup: bool
+) -> bool:
+    import incremental_build
+
+    log_dir = worker.log_dir(user_input.log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    env = os.environ.copy()
+    env["ANDROID_BUILD_TOP"] = str(worker.top_dir)
+    env["OUT_DIR"] = str(worker.out_dir)
+    warmup = warmup and not user_input.no_warmup
+    cmd = [
+        sys.executable,
+        incremental_build.__file__,
+        *worker_args(user_input, worker, cujgroup, warmup),
+    ]
+    logging.info("worker %d: CUJ group %d in %s", worker.id, cujgroup, log_dir)
+    with open(log_dir.joinpath(WORKER_LOG), "a") as f:
+        p = subprocess.run(
+            cmd, cwd=worker.top_dir, env=env, stdout=f, stderr=f, check=False
+        )
+    if p.returncode:
+        logging.critical(
+            "worker %d: CUJ group %d failed, see %s",
+            worker.id,
+            cujgroup,
+            log_dir.joinpath(WORKER_LOG),
+        )
+    return p.returncode == 0
+
+
+def run(user_input: ui.UserInput) -> bool:
+    """:return: whether all the chosen CUJ groups succeeded"""
+    workers = tuple(
+        Worker(i, tree) for i, tree in enumerate(user_input.worker_trees, start=1)
+    )
+    failed = schedule(
+        user_input.chosen_cujgroups,
+        workers,
+        user_input.jobs,
+        lambda w, cujgroup, warmup: run_cujgroup(user_input, w, cujgroup, warmup),
+    )
+    return not failed
@@ -0,0 +1,111 @@
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import dataclasses
+import datetime
+import threading
+import time
+import unittest
+from pathlib import Path
+
+import ninja_fingerprint
+import page_cache
+import workers
+from ui import UserInput
+from util import BuildType
+from workers import Worker
+
+
+class WorkersTest(unittest.TestCase):
+    def setUp(self):
+        self.workers = tuple(Worker(i, Path(f"/src/{i}")) for i in (1, 2, 3))
+
+    def test_schedule(self):
+        lock = threading.Lock()
+        running = 0
+        max_running = 0
+        runs: list[tuple[int, int, bool]] = []
+
+        def run(w: Worker, cujgroup: int, warmup: bool) -> bool:
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+                runs.append((w.id, cujgroup, warmup))
+            time.sleep(0.01)
+            with lock:
+                running -= 1
+            return True
+
+        failed = workers.schedule(tuple(range(8)), self.workers, 2, run)
+        self.assertEqual(failed, [])
+        self.assertEqual(max_running, 2)
+        self.assertEqual(sorted(c for _, c, _ in runs), list(range(8)))
+        # a warmup only for the first CUJ group of each worker used
+        warmed = [w for w, _, warmup in runs if warmup]
+        self.assertEqual(len(warmed), len(set(warmed)))
+        self.assertEqual(set(warmed), {w for w, _, _ in runs})
+
+    def test_schedule_stops_after_failure(self):
+        started = []
+
+        def run(w: Worker, cujgroup: int, warmup: bool) -> bool:
+            started.append(cujgroup)
+            return cujgroup != 1
+
+        failed = workers.schedule(tuple(range(5)), self.workers, 1, run)
+        self.assertEqual(failed, [1])
+        self.assertEqual(started, [0, 1])
+
+    def test_worker_args(self):
+        user_input = UserInput(
+            build_types=(BuildType.SOONG_ONLY, BuildType.MIXED_PROD),
+            chosen_cujgroups=(3, 4),
+            tag="t",
+            log_dir=Path("/logs"),
+            no_warmup=False,
+            targets=("nothing",),
+            ci_mode=False,
+            sample_interval=1.0,
+            ci_target=None,
+            time_budget=datetime.timedelta(minutes=60),
+            max_repeats=20,
+            ninja_fingerprint=ninja_fingerprint.Mode.FULL,
+            ninja_sections=True,
+            worker_trees=(Path("/src/1"),),
+            jobs=1,
+            worker_id=None,
+            resume=False,
+            cache_mode=page_cache.CacheMode.COLD,
+            ignore_repo_diff=False,
+        )
+        args = workers.worker_args(user_input, self.workers[1], 4, warmup=False)
+        self.assertEqual(args[0], "nothing")
+        self.assertEqual(args[args.index("--cujs") + 1], "4")
+        self.assertEqual(args[args.index("--log-dir") + 1], "/logs/worker-2")
+        self.assertEqual(args[args.index("--worker-id") + 1], "2")
+        i = args.index("--build-types")
+        self.assertEqual(args[i + 1 : i + 3], ["soong_only", "mixed_prod"])
+        self.assertIn("--ninja-sections", args)
+        self.assertIn("--no-warmup", args)
+        self.assertEqual(args[args.index("--cache-mode") + 1], "cold")
+        self.assertNotIn("--ci-target", args)
+        self.assertNotIn("--ignore-repo-diff", args)
+
+        user_input = dataclasses.replace(user_input, ignore_repo_diff=True)
+        args = workers.worker_args(user_input, self.workers[1], 4, warmup=False)
+        self.assertIn("--ignore-repo-diff", args)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,10 +27,8 @@ import subprocess
 import sys
 import tarfile
 
-from bazel_metrics_proto.bazel_metrics_pb2 import BazelMetrics
-from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics, UnconvertedReasonType
-from google.protobuf import json_format
-from metrics_proto.metrics_pb2 import MetricsBase, SoongBuildMetrics
+# The metrics protos and the protobuf runtime are imported by the functions
+# that need them, as importing them dominates the startup time of this tool.
 
 
 class Event(object):
@@ -126,6 +124,8 @@ def _read_data(filepath, proto):
 def _maybe_save_data(proto, filename, args):
   if args.skip_metrics:
     return
+  from google.protobuf import json_format
+
   json_out = json_format.MessageToJson(proto)
   output_filepath = _get_output_file(args.output_dir, filename)
   _save_file(json_out, output_filepath)
@@ -153,6 +153,10 @@ def _handle_missing_metrics(args, filename):
 
 
 def process_timing_mode(args):
+  from bazel_metrics_proto.bazel_metrics_pb2 import BazelMetrics
+  from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics
+  from metrics_proto.metrics_pb2 import MetricsBase, SoongBuildMetrics
+
   metrics_files_dir = args.metrics_files_dir
   if not args.skip_metrics:
     os.makedirs(args.output_dir, exist_ok=True)
@@ -217,6 +221,8 @@ def process_build_files_mode(args):
 
 
 def process_bp2build_mode(args):
+  from bp2build_metrics_proto.bp2build_metrics_pb2 import Bp2BuildMetrics, UnconvertedReasonType
+
   metrics_files_dir = args.metrics_files_dir
   if not args.skip_metrics:
     os.makedirs(args.output_dir, exist_ok=True)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures the import time of the python entry points under build/bazel/scripts.
+
+Each entry point is imported in a fresh interpreter run with `-X importtime`,
+so the numbers reflect what a user pays before main() even starts.
+"""
+
+import argparse
+import dataclasses
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List
+
+_SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# entry point module name -> directory containing it
+ENTRY_POINTS = {
+    "bp2build_progress": os.path.join(_SCRIPTS_DIR, "bp2build_progress"),
+    "print_analysis_metrics": _SCRIPTS_DIR,
+    "incremental_build": os.path.join(_SCRIPTS_DIR, "incremental_build"),
+}
+
+_IMPORT_TIME_LINE = re.compile(
+    r"^import time:\s+(?P<self>\d+) \|\s+(?P<cumulative>\d+) \|(?P<name>.*)$"
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class ImportTimes:
+  module: str
+  # cumulative import time of the module in microseconds
+  total_us: int
+  # cumulative import time of every module imported, keyed by module name
+  modules_us: Dict[str, int]
+
+  def slowest(self, count: int) -> List[str]:
+    return sorted(self.modules_us, key=self.modules_us.get, reverse=True)[
+        :count
+    ]
+
+
+def parse_import_time(module: str, stderr: str) -> ImportTimes:
+  modules_us = {}
+  for line in stderr.splitlines():
+    match = _IMPORT_TIME_LINE.match(line)
+    if match:
+      modules_us[match.group("name").strip()] = int(match.group("cumulative"))
+  if module not in modules_us:
+    raise ValueError(f"no import time recorded for {module}:\n{stderr}")
+  return ImportTimes(module, modules_us[module], modules_us)
+
+
+def measure_import_time(
+    module: str, path: List[str], cwd: str = None
+) -> ImportTimes:
+  """Imports module in a new interpreter and returns its import times."""
+  env = os.environ.copy()
+  env["PYTHONPATH"] = os.pathsep.join(path)
+  # compile once first so the measurement excludes writing .pyc files
+  for _ in range(2):
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if p.returncode:
+      raise RuntimeError(f"failed to import {module}:\n{p.stderr}")
+  return parse_import_time(module, p.stderr)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument(
+      "--top",
+      type=int,
+      default=10,
+      help="number of slowest imported modules to list for each entry point",
+  )
+  args = parser.parse_args()
+
+  path = [*ENTRY_POINTS.values(), *sys.path]
+  for module in ENTRY_POINTS:
+    times = measure_import_time(module, path)
+    print(f"{module}: {times.total_us / 1000:.1f}ms")
+    for name in times.slowest(args.top):
+      print(f"  {times.modules_us[name] / 1000:8.1f}ms  {name}")
+
+
+if __name__ == "__main__":
+  main()
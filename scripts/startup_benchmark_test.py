@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+#
+# Copyright (C) 2023 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Checks the import time budget of the python entry points."""
+
+import sys
+import tempfile
+import unittest
+
+import startup_benchmark
+
+# Generous enough to not be flaky on loaded machines, while still catching
+# heavyweight imports (e.g. protos) creeping back into module scope.
+_BUDGET_US = 500_000
+
+
+class StartupBenchmarkTest(unittest.TestCase):
+
+  def test_parse_import_time(self):
+    stderr = """import time: self [us] | cumulative | imported package
+import time:       100 |        100 |   json.decoder
+import time:       250 |        350 | json
+"""
+    times = startup_benchmark.parse_import_time("json", stderr)
+    self.assertEqual(times.total_us, 350)
+    self.assertEqual(times.slowest(1), ["json"])
+
+  def test_import_time_budget(self):
+    path = [*startup_benchmark.ENTRY_POINTS.values(), *sys.path]
+    # run outside a source tree, importing must not require one
+    with tempfile.TemporaryDirectory() as cwd:
+      for module in startup_benchmark.ENTRY_POINTS:
+        with self.subTest(module=module):
+          times = startup_benchmark.measure_import_time(module, path, cwd)
+          protos = [m for m in times.modules_us if m.endswith("_pb2")]
+          self.assertEqual(protos, [], "protos should be imported lazily")
+          self.assertLess(
+              times.total_us,
+              _BUDGET_US,
+              f"slowest imports: {times.slowest(5)}",
+          )
+
+
+if __name__ == "__main__":
+  unittest.main()